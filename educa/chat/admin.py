@@ -1,12 +1,14 @@
 from django.contrib import admin
 
 # Импортирование модели сообщения из модуля chat.models
-from chat.models import Message
+from chat.models import ArchivedMessage, Message
+# Импортирование полнотекстового поиска с ранжированием
+from courses.search import FullTextSearchAdminMixin
 
 
 # Регистрация административного интерфейса для модели сообщения
 @admin.register(Message)
-class MessageAdmin(admin.ModelAdmin):
+class MessageAdmin(FullTextSearchAdminMixin, admin.ModelAdmin):
     """
     Класс для настройки административного интерфейса модели сообщения.
 
@@ -23,8 +25,26 @@ class MessageAdmin(admin.ModelAdmin):
     # Фильтрация по полям в списке сообщений
     list_filter = ['sent_on', 'course']
 
-    # Поиск по содержимому сообщения
+    # Поиск по содержимому сообщения (по индексу search_vector в PostgreSQL)
     search_fields = ['content']
 
     # Отображение ID-номера пользователей и курсов в списке сообщений
     raw_id_fields = ['user', 'course']
+
+
+# Регистрация административного интерфейса для архива сообщений
+@admin.register(ArchivedMessage)
+class ArchivedMessageAdmin(MessageAdmin):
+    """
+    Класс для просмотра архива сообщений (только чтение).
+    """
+
+    # Фильтрация архива по дате через иерархию дат, без списка всех значений
+    list_filter = ['course']
+    date_hierarchy = 'sent_on'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
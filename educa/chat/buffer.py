@@ -0,0 +1,165 @@
+"""
+Модуль отложенной (write-behind) записи сообщений чата.
+
+Сообщения всех консумеров процесса собираются в общем буфере и
+записываются в базу данных одним `abulk_create` при достижении размера
+пакета или по истечении интервала, вместо отдельного INSERT на каждое
+сообщение. Метрики буфера (`stats()`) периодически записываются в журнал
+`chat.buffer` с уровнем INFO.
+"""
+
+import asyncio
+import atexit
+import logging
+import time
+
+from django.conf import settings
+
+from chat.models import Message
+
+logger = logging.getLogger(__name__)
+
+
+class MessageBuffer:
+    """
+    Буфер сообщений чата с пакетной записью в базу данных.
+
+    Атрибуты:
+        max_size (int): Количество сообщений, при котором буфер сбрасывается сразу.
+        interval (float): Максимальное время (в секундах) ожидания сообщения в буфере.
+        max_pending (int): Предел буфера при ошибках записи; более старые сообщения отбрасываются.
+        stats_interval (float): Интервал (в секундах) записи метрик в журнал.
+    """
+
+    def __init__(self, max_size, interval, max_pending, stats_interval=60):
+        self.max_size = max_size
+        self.interval = interval
+        self.max_pending = max_pending
+        self.stats_interval = stats_interval
+        self._reported = time.monotonic()
+        self._pending = []
+        self._lock = asyncio.Lock()
+        self._timer = None
+        # Счетчики для мониторинга
+        self.max_depth = 0
+        self.flushed = 0
+        self.flushes = 0
+
+    @property
+    def depth(self):
+        """
+        Текущее количество сообщений, ожидающих записи.
+        """
+        return len(self._pending)
+
+    def stats(self):
+        """
+        Возвращает метрики буфера.
+
+        Returns:
+            dict: Текущая и максимальная глубина, число записанных сообщений и сбросов.
+        """
+        return {
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'flushed': self.flushed,
+            'flushes': self.flushes,
+        }
+
+    async def add(self, owner=None, **fields):
+        """
+        Добавляет сообщение в буфер.
+
+        Аргументы:
+            owner: Отправитель (имя канала консумера) для выборочного сброса.
+            fields: Поля модели Message.
+        """
+        message = Message(**fields)
+        message._buffer_owner = owner
+        self._pending.append(message)
+        self.max_depth = max(self.max_depth, self.depth)
+        if self.depth >= self.max_size:
+            await self.flush()
+        elif self._timer is None or self._timer.done():
+            # Сброс по времени для редких сообщений
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.interval)
+        await self.flush()
+
+    async def flush(self, owner=None, course_id=None):
+        """
+        Записывает сообщения из буфера одним пакетным запросом.
+
+        Аргументы:
+            owner: Записать только сообщения этого отправителя.
+            course_id: Записать только сообщения этого курса.
+            Без аргументов записываются все сообщения.
+
+        Returns:
+            int: Количество записанных сообщений.
+        """
+        def selected(message):
+            # Консумер передает id курса из URL строкой: сравниваются числа
+            return (owner is None or message._buffer_owner == owner) and (
+                course_id is None or int(message.course_id) == int(course_id)
+            )
+
+        async with self._lock:
+            if owner is None and course_id is None:
+                batch, self._pending = self._pending, []
+            else:
+                # Порядок остальных сообщений в буфере сохраняется
+                batch = [m for m in self._pending if selected(m)]
+                self._pending = [m for m in self._pending if not selected(m)]
+            if not batch:
+                return 0
+            try:
+                await Message.objects.abulk_create(batch)
+            except Exception:
+                logger.exception('Failed to flush %d chat messages', len(batch))
+                # Возврат сообщений в буфер для повторной попытки (в исходном порядке)
+                self._pending[:0] = batch
+                self._pending.sort(key=lambda message: message.sent_on)
+                dropped = self.depth - self.max_pending
+                if dropped > 0:
+                    logger.error('Dropping %d chat messages', dropped)
+                    del self._pending[:dropped]
+                return 0
+            self.flushed += len(batch)
+            self.flushes += 1
+            logger.debug('Flushed %d chat messages (depth %d)', len(batch), self.depth)
+            self.report_stats()
+            return len(batch)
+
+    def report_stats(self):
+        """
+        Записывает метрики буфера в журнал не чаще раза в stats_interval секунд.
+        """
+        now = time.monotonic()
+        if now - self._reported >= self.stats_interval:
+            self._reported = now
+            logger.info('Chat message buffer: %s', self.stats())
+
+    def flush_sync(self):
+        """
+        Синхронно записывает оставшиеся сообщения (при завершении процесса).
+        """
+        batch, self._pending = self._pending, []
+        if batch:
+            Message.objects.bulk_create(batch)
+            self.flushed += len(batch)
+            self.flushes += 1
+
+
+# Общий буфер сообщений процесса
+message_buffer = MessageBuffer(
+    settings.CHAT_BUFFER_SIZE,
+    settings.CHAT_BUFFER_INTERVAL,
+    settings.CHAT_BUFFER_MAX_PENDING,
+    settings.CHAT_BUFFER_STATS_INTERVAL,
+)
+
+# Запись оставшихся сообщений при остановке процесса
+atexit.register(message_buffer.flush_sync)
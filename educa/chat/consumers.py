@@ -1,11 +1,24 @@
-import json
+import asyncio
+import logging
 
 # Импорт асинхронного вебсокета-консумера из Channels
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
 # Импорт функции для работы с временем из Django
 from django.utils import timezone
+from redis.exceptions import RedisError
 
-from chat.models import Message  # Импорт модели сообщения из приложения чата
+from chat.buffer import message_buffer  # Импорт буфера отложенной записи сообщений
+from chat.history import aget_history  # Импорт чтения истории сообщений
+from chat.presence import get_presence  # Импорт присутствия участников комнат
+# Импорт ограничения частоты кадров пользователя и сообщений комнаты
+from chat.ratelimit import get_rate_limiter
+# Импорт кодирования кадров (JSON или MessagePack)
+from chat.wire import MSGPACK_SUBPROTOCOL, decode, encode
+# Импорт кэшированной проверки записи на курс
+from courses.cache import aget_enrolled_course_ids
+
+logger = logging.getLogger(__name__)
 
 
 class ChatConsumer(AsyncWebsocketConsumer):
@@ -16,23 +29,81 @@ class ChatConsumer(AsyncWebsocketConsumer):
         user (User): Текущий пользователь.
         id (int): Идентификатор курса, обсуждаемого в чате.
         room_group_name (str): Имя группы для широковещания сообщений клиентам.
+        presence (RoomPresence): Присутствие и набор текста в комнатах.
+        binary (bool): Клиент выбрал подпротокол `msgpack` (бинарные кадры).
+        outbox (asyncio.Queue): Очередь исходящих кадров.
+        sent_frames (int): Количество кадров, поставленных в отправку клиенту.
+        acked_frames (int): Количество кадров, получение которых подтвердил клиент.
     """
 
+    # Коды закрытия: превышение частоты и переполнение окна отправки
+    RATE_LIMIT_CLOSE_CODE = 4429
+    SLOW_CONSUMER_CLOSE_CODE = 4008
+
+    heartbeat_task = None  # Задача продления присутствия участника
+    writer_task = None  # Задача отправки кадров из очереди
+    binary = False  # По умолчанию текстовые JSON-кадры
+    closing = False  # Соединение закрывается, новые кадры не принимаются
+    throttled = False  # Клиент уже уведомлен о превышении частоты
+    sent_frames = 0
+    acked_frames = 0
+
     async def connect(self):
         """
         Вызывается при подключении клиента к этому WebSocket-консуму.
 
         Обрабатывает добавление клиента в соответствующую группу чата и принятие соединения.
+        Соединение отклоняется, если пользователь не записан на курс.
         """
         self.user = self.scope['user']  # Получение текущего пользователя из scope
         # Получение идентификатора курса из scope
         self.id = self.scope['url_route']['kwargs']['course_id']
         # Составление имени группы для широковещания
         self.room_group_name = f'chat_{self.id}'
+        # Проверка записи на курс по кэшированному множеству курсов пользователя
+        user_id = self.user.id if self.user.is_authenticated else None
+        if int(self.id) not in await aget_enrolled_course_ids(user_id):
+            await self.close()
+            return
         await self.channel_layer.group_add(  # Добавление клиента в группу
             self.room_group_name, self.channel_name
         )
-        await self.accept()  # Принятие соединения
+        # Согласование формата: подпротокол msgpack включает бинарные кадры
+        if MSGPACK_SUBPROTOCOL in self.scope.get('subprotocols', []):
+            self.binary = True
+            await self.accept(subprotocol=MSGPACK_SUBPROTOCOL)
+        else:
+            await self.accept()  # Принятие соединения
+        # Исходящие кадры отправляются отдельной задачей из очереди; ее длина
+        # не превышает окна неподтвержденных кадров (CHAT_SEND_WINDOW)
+        self.outbox = asyncio.Queue(maxsize=settings.CHAT_SEND_WINDOW)
+        self.writer_task = asyncio.create_task(self.write_frames())
+        self.rate_limiter = get_rate_limiter(self.channel_layer)
+        # Отметка присутствия и периодическое продление записи участника
+        self.presence = get_presence(self.channel_layer)
+        try:
+            await self.presence.join(self.room_group_name, self.user.username, self.channel_name)
+        except (RedisError, OSError):
+            # Чат работает и без присутствия; запись появится со следующим сигналом
+            logger.exception('Presence join failed for %s', self.channel_name)
+        self.heartbeat_task = asyncio.create_task(self.heartbeat())
+
+    async def heartbeat(self):
+        """
+        Периодически продлевает присутствие участника в комнате.
+
+        Если процесс завершится без disconnect, запись исчезнет по истечении TTL.
+        Ошибки соединения с Redis записываются в журнал, и продление повторяется
+        со следующим сигналом; прочие ошибки завершают задачу.
+        """
+        while True:
+            await asyncio.sleep(settings.CHAT_PRESENCE_HEARTBEAT)
+            try:
+                await self.presence.heartbeat(
+                    self.room_group_name, self.user.username, self.channel_name
+                )
+            except (RedisError, OSError):
+                logger.exception('Presence heartbeat failed for %s', self.channel_name)
 
     async def disconnect(self, close_code):
         """
@@ -40,47 +111,204 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
         Обрабатывает удаление клиента из соответствующей группы чата.
         """
+        # Запись накопленных сообщений этого клиента при отключении
+        # (до обращений к Redis, ошибка которых не должна ее отменить)
+        await message_buffer.flush(owner=self.channel_name)
         await self.channel_layer.group_discard(  # Удаление клиента из группы
             self.room_group_name, self.channel_name
         )
+        if self.writer_task is not None:
+            self.writer_task.cancel()
+        if self.heartbeat_task is not None:
+            # Участник покидает комнату: прекращаем продление и рассылаем состояние
+            self.heartbeat_task.cancel()
+            try:
+                await self.presence.leave(
+                    self.room_group_name, self.user.username, self.channel_name
+                )
+            except (RedisError, OSError):
+                # Запись участника исчезнет сама по истечении TTL
+                logger.exception('Presence leave failed for %s', self.channel_name)
 
-    async def persist_message(self, message):
+    async def persist_message(self, message, sent_on):
         """
         Сохраняет сообщение в базе данных при его отправке.
 
+        Сообщение помещается в общий буфер процесса и записывается пакетом.
+
         Аргументы:
             message (str): Текстовое содержание сообщения.
+            sent_on (datetime): Время отправки сообщения.
         """
-        await Message.objects.acreate(  # Создание записи в модели сообщений с указанными атрибутами
-            user=self.user, course_id=self.id, content=message
+        await message_buffer.add(  # Добавление записи в буфер сообщений с указанными атрибутами
+            owner=self.channel_name,
+            user_id=self.user.id,
+            course_id=self.id,
+            content=message,
+            sent_on=sent_on,
         )
 
-    async def receive(self, text_data):
+    async def send_frame(self, frames):
         """
-        Вызывается при получении текстовых данных от клиента.
+        Ставит готовый кадр в очередь отправки в согласованном формате.
+
+        Daphne не применяет управление потоком к `websocket.send`: кадры
+        копятся в буфере сервера, даже если клиент их не читает. Поэтому
+        отставание измеряется по подтверждениям клиента (кадры `ack` с
+        количеством полученных кадров): если без подтверждения осталось
+        CHAT_SEND_WINDOW кадров, соединение закрывается, а не накапливает
+        кадры без ограничения.
+
+        Аргументы:
+            frames (dict): Кадры из `chat.wire.encode` (`text` и `bytes`).
+        """
+        if self.closing:
+            return
+        if self.sent_frames - self.acked_frames >= settings.CHAT_SEND_WINDOW:
+            logger.warning(
+                'Closing slow chat consumer %s (%d unacknowledged frames)',
+                self.channel_name, self.sent_frames - self.acked_frames,
+            )
+            await self.close_connection(self.SLOW_CONSUMER_CLOSE_CODE)
+            return
+        frame = {'bytes_data': frames['bytes']} if self.binary else {'text_data': frames['text']}
+        self.sent_frames += 1
+        self.outbox.put_nowait(frame)
+
+    def acknowledge(self, request):
+        """
+        Учитывает подтверждение клиента о полученных кадрах.
+
+        Аргументы:
+            request (dict): Кадр `ack` с количеством полученных кадров `received`.
+        """
+        received = request.get('received')
+        if isinstance(received, int) and not isinstance(received, bool):
+            # Подтверждение не может превышать количество отправленных кадров
+            self.acked_frames = max(self.acked_frames, min(received, self.sent_frames))
+
+    async def write_frames(self):
+        """
+        Отправляет кадры из очереди клиенту по одному.
+        """
+        while True:
+            frame = await self.outbox.get()
+            await self.send(**frame)
+
+    async def close_connection(self, code):
+        """
+        Закрывает соединение, прекращая отправку оставшихся кадров.
+        """
+        self.closing = True
+        if self.writer_task is not None:
+            self.writer_task.cancel()
+        await self.close(code=code)
+
+    async def check_rate(self, room=False):
+        """
+        Проверяет частоту кадров пользователя (и сообщений комнаты).
+
+        Сверх лимита кадр отбрасывается с однократным уведомлением клиента
+        или соединение закрывается (CHAT_RATE_LIMIT_POLICY).
+
+        Аргументы:
+            room (bool): Проверять также лимит сообщений комнаты.
+
+        Returns:
+            bool: True, если кадр можно обработать.
+        """
+        allowed = await self.rate_limiter.allow_user(self.user.id)
+        if allowed and room:
+            allowed = await self.rate_limiter.allow_room(self.room_group_name)
+        if allowed:
+            self.throttled = False
+            return True
+        if settings.CHAT_RATE_LIMIT_POLICY == 'close':
+            await self.close_connection(self.RATE_LIMIT_CLOSE_CODE)
+        elif not self.throttled:
+            # Уведомление один раз, пока клиент не вернется в пределы лимита
+            self.throttled = True
+            await self.send_frame(encode({'type': 'rate_limited'}))
+        return False
+
+    async def receive(self, text_data=None, bytes_data=None):
+        """
+        Вызывается при получении данных от клиента (JSON или MessagePack).
 
         Обрабатывает отправку сообщения в соответствующую группу и сохранение его в базе данных.
         """
-        text_data_json = json.loads(
-            text_data)  # Получение JSON-объекта из текстовых данных
-        message = text_data_json['message']  # Извлечение содержания сообщения
+        if self.closing:
+            return
+        text_data_json = decode(text_data, bytes_data)  # Разбор кадра клиента
+        if text_data_json is None:
+            return  # Поврежденный кадр игнорируется
+        if text_data_json.get('type') == 'ack':
+            # Подтверждения не расходуют лимит: без них клиент был бы отключен
+            self.acknowledge(text_data_json)
+            return
+        # Сообщения рассылаются всем участникам и учитываются и в лимите комнаты
+        is_message = text_data_json.get('type') not in ('history', 'typing')
+        if not await self.check_rate(room=is_message):
+            return
+        if text_data_json.get('type') == 'history':
+            # Запрос страницы истории отправляется только этому клиенту
+            await self.send_history(text_data_json)
+            return
+        if text_data_json.get('type') == 'typing':
+            # Отметка набора текста рассылается объединенно, не на каждое нажатие
+            await self.presence.typing(self.room_group_name, self.user.username)
+            return
+        message = text_data_json.get('message')  # Извлечение содержания сообщения
+        if not isinstance(message, str) or not message:
+            return
         now = timezone.now()  # Получение текущего времени
+        # Сообщение ставится на запись до рассылки: клиенты не увидят сообщение,
+        # которое не попало в буфер записи
+        await self.persist_message(message, now)
+        # Кадры кодируются один раз на отправку в группу, а не в каждом консумере
+        frames = encode({
+            'message': message,  # Содержание сообщения
+            'user': self.user.username,  # Имя пользователя отправителя
+            'datetime': now.isoformat(),  # Время отправки в формате ISO
+        })
         await self.channel_layer.group_send(  # Отправка сообщения в соответствующую группу
             self.room_group_name,
-            {
-                'type': 'chat_message',  # Тип события (сообщения чата)
-                'message': message,  # Содержание сообщения
-                'user': self.user.username,  # Имя пользователя отправителя
-                'datetime': now.isoformat(),  # Время отправки в формате ISO
-            },
+            {'type': 'chat_message', **frames},  # Тип события (сообщения чата)
         )
-        # Сохранение сообщения в базе данных
-        await self.persist_message(message)
+        # Сообщение отправлено: участник больше не набирает текст
+        await self.presence.stop_typing(self.room_group_name, self.user.username)
+
+    async def send_history(self, request):
+        """
+        Отправляет клиенту страницу истории сообщений чата.
+
+        Аргументы:
+            request (dict): Запрос клиента с необязательными ключами
+                `before` (курсор — id сообщения) и `limit` (размер страницы).
+        """
+        try:
+            before = int(request.get('before') or 0) or None
+            limit = int(request.get('limit') or 0) or None
+        except (TypeError, ValueError):
+            before = limit = None
+        # Запись буферизованных сообщений этого курса, чтобы история была полной;
+        # сообщения других комнат остаются в буфере до пакетной записи
+        await message_buffer.flush(course_id=self.id)
+        history = await aget_history(self.id, before=before, limit=limit)
+        await self.send_frame(encode({'type': 'history', **history}))
 
     async def chat_message(self, event):
         """
         Вызывается при получении события чата.
 
-        Обрабатывает отправку сообщения клиентам.
+        Пересылает клиенту готовый кадр сообщения.
+        """
+        await self.send_frame(event)  # Отправка сообщения в клиенты
+
+    async def chat_presence(self, event):
+        """
+        Вызывается при получении состояния присутствия комнаты.
+
+        Пересылает клиенту готовый кадр со списком участников в сети и набирающих сообщение.
         """
-        await self.send(text_data=json.dumps(event))  # Отправка сообщения в клиенты
+        await self.send_frame(event)
@@ -0,0 +1,110 @@
+"""
+Модуль для постраничного чтения истории сообщений чата.
+
+История читается «назад» с ключевым курсором по паре (course_id, id):
+каждая страница начинается с сообщений, чей id меньше курсора, поэтому
+стоимость запроса не зависит от глубины прокрутки (без OFFSET).
+
+Старые сообщения хранятся в архивной таблице с теми же id, и все id
+архива меньше id основной таблицы (см. команду `archive_messages`).
+Поэтому страница сначала читается из основной таблицы, а архив
+запрашивается, только если в ней не хватило строк.
+"""
+
+from django.conf import settings
+from django.db.models import F
+
+from chat.models import ArchivedMessage, Message
+
+
+def _page_size(limit):
+    """
+    Приводит запрошенный размер страницы к допустимому диапазону.
+
+    Параметры:
+        `limit`: Запрошенный размер страницы или None.
+
+    Возвращает размер страницы.
+    """
+    if not limit:
+        return settings.CHAT_HISTORY_PAGE_SIZE
+    return max(1, min(int(limit), settings.CHAT_HISTORY_MAX_PAGE_SIZE))
+
+
+def _history_queryset(course_id, before, limit, model=Message):
+    """
+    Возвращает запрос для одной страницы истории (на одну строку больше страницы).
+
+    Параметры:
+        `model`: Message (основная таблица) или ArchivedMessage (архив).
+    """
+    qs = model.objects.filter(course_id=course_id)
+    if before:
+        qs = qs.filter(id__lt=before)
+    return qs.order_by('-id').values(
+        'id',
+        'content',
+        'sent_on',
+        username=F('user__username'),
+    )[:limit + 1]
+
+
+def _build_page(rows, limit):
+    """
+    Формирует страницу истории из строк запроса.
+
+    Возвращает словарь с сообщениями (от старых к новым) и курсором
+    `next` для следующей (более ранней) страницы или None.
+    """
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'messages': [
+            {
+                'id': row['id'],
+                'message': row['content'],
+                'user': row['username'],
+                'datetime': row['sent_on'].isoformat(),
+            }
+            for row in reversed(rows)
+        ],
+        'next': rows[-1]['id'] if has_more else None,
+    }
+
+
+def get_history(course_id, before=None, limit=None):
+    """
+    Возвращает страницу истории сообщений курса.
+
+    Параметры:
+        `course_id`: Идентификатор курса.
+        `before`: Курсор — id сообщения, до которого читать историю.
+        `limit`: Размер страницы.
+
+    Возвращает словарь со списком сообщений и курсором следующей страницы.
+    """
+    limit = _page_size(limit)
+    rows = list(_history_queryset(course_id, before, limit))
+    if len(rows) <= limit:
+        # Основная таблица исчерпана: продолжение страницы читается из архива
+        cursor = rows[-1]['id'] if rows else before
+        rows += _history_queryset(
+            course_id, cursor, limit - len(rows), model=ArchivedMessage
+        )
+    return _build_page(rows, limit)
+
+
+async def aget_history(course_id, before=None, limit=None):
+    """
+    Асинхронная версия `get_history` для WebSocket-консумера.
+    """
+    limit = _page_size(limit)
+    rows = [row async for row in _history_queryset(course_id, before, limit)]
+    if len(rows) <= limit:
+        cursor = rows[-1]['id'] if rows else before
+        rows += [
+            row async for row in _history_queryset(
+                course_id, cursor, limit - len(rows), model=ArchivedMessage
+            )
+        ]
+    return _build_page(rows, limit)
@@ -0,0 +1,111 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from chat.models import ArchivedMessage, Message
+
+# Поля, копируемые из основной таблицы в архив (вместе с поисковым вектором)
+ARCHIVE_FIELDS = ('id', 'user_id', 'course_id', 'content', 'sent_on', 'search_vector')
+
+
+class Command(BaseCommand):
+    """
+    Команда для переноса старых сообщений чата в архивную таблицу.
+
+    Переносятся сообщения старше `--days` дней (по умолчанию
+    CHAT_ARCHIVE_AFTER_DAYS) пакетами по `--batch-size` строк: каждый пакет
+    копируется в архив и удаляется из основной таблицы в одной транзакции,
+    поэтому блокировки короткие, а прерванный запуск можно просто повторить.
+
+    Граница переноса задается по id: переносятся все сообщения с id меньше
+    id первого сообщения, отправленного после отсечки. Так все id архива
+    остаются меньше id основной таблицы, и история читается по одному
+    курсору сначала из основной таблицы, затем из архива.
+    """
+    help = 'Переносит сообщения чата старше N дней в архивную таблицу'
+
+    def add_arguments(self, parser):
+        """
+        Добавляет аргументы командной строки в парсер.
+
+        :param parser: Экземпляр парсера аргументов.
+        """
+        # Возраст сообщений (в днях), после которого они переносятся в архив
+        parser.add_argument(
+            '--days', dest='days', type=int, default=settings.CHAT_ARCHIVE_AFTER_DAYS
+        )
+        # Количество сообщений, переносимых одной транзакцией
+        parser.add_argument('--batch-size', dest='batch_size', type=int, default=1000)
+
+    def boundary(self, cutoff):
+        """
+        Возвращает id, до которого (не включая) сообщения переносятся в архив.
+
+        :param cutoff: Время отсечки.
+        :return: id первого сообщения после отсечки или None, если таблица пуста.
+        """
+        # Обход по первичному ключу останавливается на первом новом сообщении
+        first_recent = (
+            Message.objects.filter(sent_on__gte=cutoff)
+            .order_by('id')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if first_recent is not None:
+            return first_recent
+        last = Message.objects.order_by('-id').values_list('id', flat=True).first()
+        return last + 1 if last is not None else None
+
+    def move_batch(self, boundary, after, batch_size):
+        """
+        Переносит в архив один пакет сообщений.
+
+        :param boundary: Верхняя граница id (не включая).
+        :param after: id последнего перенесенного сообщения.
+        :param batch_size: Размер пакета.
+        :return: Список id перенесенных сообщений.
+        """
+        with transaction.atomic():
+            rows = list(
+                Message.objects.filter(id__gt=after, id__lt=boundary)
+                .order_by('id')
+                .values(*ARCHIVE_FIELDS)[:batch_size]
+            )
+            if not rows:
+                return []
+            # ignore_conflicts: строки, уже скопированные прерванным запуском
+            ArchivedMessage.objects.bulk_create(
+                [ArchivedMessage(**row) for row in rows], ignore_conflicts=True
+            )
+            ids = [row['id'] for row in rows]
+            Message.objects.filter(id__in=ids).delete()
+        return ids
+
+    def handle(self, *args, **options):
+        """
+        Основной метод, выполняемый при вызове команды.
+        """
+        cutoff = timezone.now() - datetime.timedelta(days=options['days'])
+        boundary = self.boundary(cutoff)
+        moved = 0
+        started = time.monotonic()
+        if boundary is not None:
+            after = 0
+            while True:
+                ids = self.move_batch(boundary, after, options['batch_size'])
+                if not ids:
+                    break
+                moved += len(ids)
+                after = ids[-1]
+                if options['verbosity'] >= 2:
+                    self.stdout.write(f'Перенесено {moved} сообщений (до id {after})')
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Перенесено в архив {moved} сообщений старше {cutoff:%Y-%m-%d %H:%M} '
+            f'за {elapsed:.1f} с'
+        )
@@ -0,0 +1,47 @@
+# Generated by Django 5.0.14 on 2026-10-18 01:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_alter_message_sent_on'),
+        ('courses', '0006_course_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMessage',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('content', models.TextField()),
+                ('sent_on', models.DateTimeField(editable=False)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['course', 'sent_on'], name='chat_message_course_sent_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedmessage',
+            name='course',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_chat_messages', to='courses.course'),
+        ),
+        migrations.AddField(
+            model_name='archivedmessage',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_chat_messages', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedmessage',
+            index=models.Index(fields=['course', '-id'], name='chat_archive_course_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedmessage',
+            index=models.Index(fields=['course', 'sent_on'], name='chat_archive_course_sent_idx'),
+        ),
+    ]
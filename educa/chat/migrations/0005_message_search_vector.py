@@ -0,0 +1,127 @@
+# Generated by Django 5.0.14 on 2026-10-18 01:54
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Общая функция триггера для основной таблицы и архива. Вектор, переданный
+# при вставке (перенос в архив), сохраняется, иначе вычисляется заново.
+CREATE_FUNCTION_SQL = """
+CREATE FUNCTION chat_message_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' OR NEW.search_vector IS NULL THEN
+        NEW.search_vector := to_tsvector('russian', coalesce(NEW.content, ''));
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+CREATE_TRIGGER_SQL = """
+CREATE TRIGGER {table}_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF content ON {table}
+    FOR EACH ROW EXECUTE FUNCTION chat_message_search_vector_update();
+"""
+
+# Заполнение векторов существующих строк одним диапазоном id
+BACKFILL_SQL = """
+UPDATE {table} SET search_vector = to_tsvector('russian', coalesce(content, ''))
+WHERE id > %s AND id <= %s AND search_vector IS NULL;
+"""
+
+# Индекс строится без блокировки записи в таблицу
+CREATE_INDEX_SQL = 'CREATE INDEX CONCURRENTLY IF NOT EXISTS {index} ON {table} USING gin (search_vector);'
+
+DROP_INDEX_SQL = 'DROP INDEX CONCURRENTLY IF EXISTS {index};'
+
+DROP_TRIGGER_SQL = 'DROP TRIGGER IF EXISTS {table}_search_vector_trigger ON {table};'
+
+# Количество строк, обновляемых одной транзакцией при заполнении векторов
+BACKFILL_BATCH_SIZE = 5000
+
+# Таблицы сообщений и имена их GIN-индексов
+TABLES = [
+    ('chat_message', 'chat_message_search_idx'),
+    ('chat_archivedmessage', 'chat_archive_search_idx'),
+]
+
+
+def create_search_triggers(apps, schema_editor):
+    """
+    Создает триггеры (только PostgreSQL): новые сообщения получают вектор сразу.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(CREATE_FUNCTION_SQL)
+    for table, _ in TABLES:
+        schema_editor.execute(CREATE_TRIGGER_SQL.format(table=table))
+
+
+def backfill_search_vectors(apps, schema_editor):
+    """
+    Заполняет векторы существующих сообщений пакетами по диапазонам id.
+
+    Миграция не атомарна: каждый пакет фиксируется отдельно, поэтому
+    блокировки строк короткие и запись в чат не останавливается.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table, _ in TABLES:
+            cursor.execute(f'SELECT min(id), max(id) FROM {table}')
+            low, high = cursor.fetchone()
+            if low is None:
+                continue
+            for start in range(low - 1, high, BACKFILL_BATCH_SIZE):
+                cursor.execute(
+                    BACKFILL_SQL.format(table=table), [start, start + BACKFILL_BATCH_SIZE]
+                )
+
+
+def create_search_indexes(apps, schema_editor):
+    """
+    Создает GIN-индексы без блокировки записи (CREATE INDEX CONCURRENTLY).
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, index in TABLES:
+        schema_editor.execute(CREATE_INDEX_SQL.format(table=table, index=index))
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for _, index in TABLES:
+        schema_editor.execute(DROP_INDEX_SQL.format(index=index))
+
+
+def drop_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, _ in TABLES:
+        schema_editor.execute(DROP_TRIGGER_SQL.format(table=table))
+    schema_editor.execute('DROP FUNCTION IF EXISTS chat_message_search_vector_update();')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY и пакетное заполнение выполняются вне общей транзакции
+    atomic = False
+
+    dependencies = [
+        ('chat', '0004_message_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedmessage',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_triggers, drop_search_triggers),
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -1,5 +1,8 @@
 from django.conf import settings  # Импорт настроек Django из файла settings.py
+# Импорт tsvector-поля для полнотекстового поиска (PostgreSQL)
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models  # Импорт моделей базы данных из пакета django.db
+from django.utils import timezone  # Импорт функции для работы с временем
 
 
 class Message(models.Model):
@@ -25,8 +28,19 @@ class Message(models.Model):
     )
     content = models.TextField()  # Поле для хранения содержания сообщения
     sent_on = models.DateTimeField(  # Поле для хранения времени отправки сообщения
-        auto_now_add=True,  # Установка времени создания записи при ее добавлении
+        default=timezone.now,  # Время отправки (задается консумером при буферизованной записи)
+        editable=False,
     )
+    # Поисковый вектор содержания (заполняется триггером PostgreSQL)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Составной индекс для постраничного чтения истории курса по курсору (course_id, id)
+            models.Index(fields=['course', '-id'], name='chat_message_course_id_idx'),
+            # Индекс для выборок сообщений курса за период и переноса в архив
+            models.Index(fields=['course', 'sent_on'], name='chat_message_course_sent_idx'),
+        ]
 
     def __str__(self):
         """
@@ -36,3 +50,45 @@ class Message(models.Model):
             str: Строковое представление объекта модели.
         """
         return f'{self.user} on {self.course} at {self.sent_on}'  # Возвращение строки в формате user на course в time
+
+
+class ArchivedMessage(models.Model):
+    """
+    Модель архива старых сообщений чата.
+
+    Сообщения старше CHAT_ARCHIVE_AFTER_DAYS переносятся сюда командой
+    `archive_messages` с сохранением исходного id, поэтому курсор истории
+    продолжает работать, а основная таблица остается небольшой.
+
+    Атрибуты:
+        id (int): Идентификатор исходного сообщения.
+        user (User): Пользователь, отправивший сообщение.
+        course (Course): Курс, на котором происходило обсуждение.
+        content (str): Содержание сообщения.
+        sent_on (datetime): Время отправки сообщения.
+    """
+
+    id = models.BigIntegerField(primary_key=True)  # id из таблицы Message
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.PROTECT,
+        related_name='archived_chat_messages',
+    )
+    course = models.ForeignKey(
+        'courses.Course',
+        on_delete=models.PROTECT,
+        related_name='archived_chat_messages',
+    )
+    content = models.TextField()
+    sent_on = models.DateTimeField(editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Постраничное чтение архива истории курса по курсору (course_id, id)
+            models.Index(fields=['course', '-id'], name='chat_archive_course_id_idx'),
+            models.Index(fields=['course', 'sent_on'], name='chat_archive_course_sent_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} on {self.course} at {self.sent_on}'
@@ -0,0 +1,213 @@
+"""
+Модуль присутствия и индикации набора текста в комнатах чата.
+
+Участники комнаты хранятся в упорядоченных множествах Redis канального
+слоя (оценка — время последнего сигнала), поэтому записи отключившихся
+или упавших процессов исчезают сами по истечении TTL. Изменения
+присутствия и набора текста не рассылаются по одному: для комнаты
+планируется не более одной рассылки полного состояния за интервал,
+а блокировка в Redis не дает нескольким процессам Daphne рассылать
+одно и то же состояние одновременно.
+"""
+
+import asyncio
+import logging
+import time
+
+from django.conf import settings
+from redis.exceptions import RedisError
+
+from chat.wire import encode
+
+logger = logging.getLogger(__name__)
+
+
+class LocalPresenceStore:
+    """
+    Хранилище присутствия внутри процесса (для InMemoryChannelLayer).
+    """
+
+    def __init__(self):
+        self._sets = {}
+        self._locks = {}
+
+    async def touch(self, key, member, ttl):
+        self._sets.setdefault(key, {})[member] = time.time()
+
+    async def remove(self, key, member):
+        return self._sets.get(key, {}).pop(member, None) is not None
+
+    async def members(self, key, ttl):
+        entries = self._sets.get(key, {})
+        deadline = time.time() - ttl
+        for member in [m for m, score in entries.items() if score < deadline]:
+            del entries[member]
+        return list(entries)
+
+    async def try_lock(self, key, ttl):
+        now = time.monotonic()
+        if self._locks.get(key, 0) > now:
+            return False
+        self._locks[key] = now + ttl
+        return True
+
+
+class RedisPresenceStore:
+    """
+    Хранилище присутствия в Redis канального слоя (channels_redis).
+
+    Используются соединения самого канального слоя: ключ комнаты
+    направляется на тот же сервер Redis, что и ее группа.
+    """
+
+    def __init__(self, channel_layer):
+        self.channel_layer = channel_layer
+
+    def _connection(self, key):
+        layer = self.channel_layer
+        return layer.connection(layer.consistent_hash(key))
+
+    async def touch(self, key, member, ttl):
+        async with self._connection(key).pipeline(transaction=False) as pipe:
+            pipe.zadd(key, {member: time.time()})
+            pipe.expire(key, int(ttl * 2))
+            await pipe.execute()
+
+    async def remove(self, key, member):
+        return bool(await self._connection(key).zrem(key, member))
+
+    async def members(self, key, ttl):
+        async with self._connection(key).pipeline(transaction=False) as pipe:
+            pipe.zremrangebyscore(key, '-inf', time.time() - ttl)
+            pipe.zrange(key, 0, -1)
+            _, members = await pipe.execute()
+        return [m.decode() if isinstance(m, bytes) else m for m in members]
+
+    async def try_lock(self, key, ttl):
+        return bool(
+            await self._connection(key).set(key, 1, nx=True, px=int(ttl * 1000))
+        )
+
+
+class RoomPresence:
+    """
+    Присутствие и набор текста в комнатах с объединенной рассылкой.
+
+    Атрибуты:
+        channel_layer: Канальный слой.
+        store: Хранилище (Redis или внутри процесса).
+        interval (float): Минимальный интервал между рассылками состояния комнаты.
+    """
+
+    def __init__(self, channel_layer, store):
+        self.channel_layer = channel_layer
+        self.store = store
+        self.interval = settings.CHAT_PRESENCE_INTERVAL
+        self._scheduled = {}
+
+    def _key(self, room, kind):
+        prefix = getattr(self.channel_layer, 'prefix', 'asgi')
+        return f'{prefix}:presence:{room}:{kind}'
+
+    @staticmethod
+    def _member(username, channel_name):
+        # В именах пользователей Django не бывает двоеточия
+        return f'{username}:{channel_name}'
+
+    async def join(self, room, username, channel_name):
+        """
+        Отмечает подключение участника и планирует рассылку состояния.
+        """
+        await self.heartbeat(room, username, channel_name)
+        self.schedule(room)
+
+    async def heartbeat(self, room, username, channel_name):
+        """
+        Продлевает присутствие участника в комнате.
+        """
+        await self.store.touch(
+            self._key(room, 'online'),
+            self._member(username, channel_name),
+            settings.CHAT_PRESENCE_TTL,
+        )
+
+    async def leave(self, room, username, channel_name):
+        """
+        Удаляет участника из комнаты и планирует рассылку состояния.
+        """
+        member = self._member(username, channel_name)
+        await self.store.remove(self._key(room, 'online'), member)
+        await self.store.remove(self._key(room, 'typing'), username)
+        self.schedule(room)
+
+    async def typing(self, room, username):
+        """
+        Отмечает, что участник набирает сообщение.
+        """
+        await self.store.touch(self._key(room, 'typing'), username, settings.CHAT_TYPING_TTL)
+        self.schedule(room)
+
+    async def stop_typing(self, room, username):
+        """
+        Снимает отметку набора текста (после отправки сообщения).
+        """
+        if await self.store.remove(self._key(room, 'typing'), username):
+            self.schedule(room)
+
+    async def state(self, room):
+        """
+        Возвращает текущее состояние комнаты.
+
+        Returns:
+            dict: Количество участников в сети, их имена (не более
+            CHAT_PRESENCE_MAX_LIST) и имена набирающих сообщение.
+        """
+        members = await self.store.members(self._key(room, 'online'), settings.CHAT_PRESENCE_TTL)
+        online = sorted({member.split(':', 1)[0] for member in members})
+        typing = await self.store.members(self._key(room, 'typing'), settings.CHAT_TYPING_TTL)
+        return {
+            'online_count': len(online),
+            'online': online[:settings.CHAT_PRESENCE_MAX_LIST],
+            'typing': sorted(typing)[:settings.CHAT_PRESENCE_MAX_LIST],
+        }
+
+    def schedule(self, room):
+        """
+        Планирует рассылку состояния комнаты, если она еще не запланирована.
+        """
+        task = self._scheduled.get(room)
+        if task is None or task.done():
+            self._scheduled[room] = asyncio.create_task(self._broadcast_later(room))
+
+    async def _broadcast_later(self, room):
+        # Все изменения за интервал уходят одной рассылкой
+        await asyncio.sleep(self.interval)
+        # Блокировка на интервал: комнату рассылает один процесс; если рассылка
+        # уже была, повторяем после интервала, чтобы передать свежее состояние
+        try:
+            while not await self.store.try_lock(self._key(room, 'lock'), self.interval):
+                await asyncio.sleep(self.interval)
+            state = await self.state(room)
+        except (RedisError, OSError):
+            # Состояние будет разослано при следующем изменении присутствия
+            logger.exception('Failed to read presence of room %s', room)
+            return
+        frames = encode({'type': 'presence', **state})
+        await self.channel_layer.group_send(room, {'type': 'chat_presence', **frames})
+
+
+_presence = {}
+
+
+def get_presence(channel_layer):
+    """
+    Возвращает объект присутствия для канального слоя (один на процесс).
+    """
+    presence = _presence.get(id(channel_layer))
+    if presence is None:
+        if hasattr(channel_layer, 'consistent_hash'):
+            store = RedisPresenceStore(channel_layer)
+        else:
+            store = LocalPresenceStore()
+        presence = _presence[id(channel_layer)] = RoomPresence(channel_layer, store)
+    return presence
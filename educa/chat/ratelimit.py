@@ -0,0 +1,145 @@
+"""
+Модуль ограничения частоты сообщений чата (token bucket).
+
+У каждого пользователя и каждой комнаты есть «ведро» из `burst` токенов,
+которое пополняется со скоростью `rate` токенов в секунду; кадр
+принимается, только если в ведре есть токен. Состояние ведер хранится
+в Redis канального слоя (общее для всех процессов Daphne) или внутри
+процесса для InMemoryChannelLayer. При недоступности Redis проверка
+выполняется по ведрам процесса, поэтому чат продолжает работать.
+Проверка не обращается к базе данных.
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+# Атомарное пополнение и списание токена в Redis; время берется у сервера
+# Redis, чтобы часы разных процессов не влияли на результат
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return allowed
+"""
+
+
+class LocalBucketStore:
+    """
+    Ведра токенов внутри процесса.
+    """
+
+    def __init__(self):
+        self._buckets = {}
+
+    async def take(self, key, rate, burst):
+        now = time.monotonic()
+        tokens, ts = self._buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - ts) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        if tokens >= burst:
+            # Полное ведро не отличается от отсутствующего
+            self._buckets.pop(key, None)
+        else:
+            self._buckets[key] = (tokens, now)
+        return allowed
+
+
+class RedisBucketStore:
+    """
+    Ведра токенов в Redis канального слоя (channels_redis).
+
+    Ключ ведра направляется на сервер Redis по тому же хешу, что и группы
+    канального слоя. При ошибке Redis используется хранилище процесса.
+    """
+
+    def __init__(self, channel_layer):
+        self.channel_layer = channel_layer
+        self.fallback = LocalBucketStore()
+        self._script = None
+
+    async def take(self, key, rate, burst):
+        layer = self.channel_layer
+        # Соединения канального слоя свои для каждого цикла событий
+        connection = layer.connection(layer.consistent_hash(key))
+        if self._script is None:
+            # Скрипт вызывается по SHA и загружается заново, если его нет на сервере
+            self._script = connection.register_script(TOKEN_BUCKET_SCRIPT)
+        try:
+            return bool(await self._script(keys=[key], args=[rate, burst], client=connection))
+        except (RedisError, OSError):
+            logger.warning('Rate limit store unavailable, using in-process buckets')
+            return await self.fallback.take(key, rate, burst)
+
+
+class RateLimiter:
+    """
+    Ограничение частоты кадров пользователя и сообщений комнаты.
+
+    Атрибуты:
+        channel_layer: Канальный слой.
+        store: Хранилище ведер (Redis или внутри процесса).
+    """
+
+    def __init__(self, channel_layer, store):
+        self.channel_layer = channel_layer
+        self.store = store
+
+    def _key(self, kind, ident):
+        prefix = getattr(self.channel_layer, 'prefix', 'asgi')
+        return f'{prefix}:ratelimit:{kind}:{ident}'
+
+    async def allow_user(self, user_id):
+        """
+        Списывает токен пользователя (любой входящий кадр).
+
+        Returns:
+            bool: True, если кадр можно обработать.
+        """
+        rate, burst = settings.CHAT_RATE_LIMIT_USER
+        return await self.store.take(self._key('user', user_id), rate, burst)
+
+    async def allow_room(self, room):
+        """
+        Списывает токен комнаты (сообщение, рассылаемое всем участникам).
+
+        Returns:
+            bool: True, если сообщение можно разослать.
+        """
+        rate, burst = settings.CHAT_RATE_LIMIT_ROOM
+        return await self.store.take(self._key('room', room), rate, burst)
+
+
+_limiters = {}
+
+
+def get_rate_limiter(channel_layer):
+    """
+    Возвращает ограничитель частоты для канального слоя (один на процесс).
+    """
+    limiter = _limiters.get(id(channel_layer))
+    if limiter is None:
+        if hasattr(channel_layer, 'consistent_hash'):
+            store = RedisBucketStore(channel_layer)
+        else:
+            store = LocalBucketStore()
+        limiter = _limiters[id(channel_layer)] = RateLimiter(channel_layer, store)
+    return limiter
@@ -10,11 +10,9 @@ from . import consumers
 
 
 websocket_urlpatterns = [
-    """
-    URL-шаблон для подключения к вебсокету в чате.
-
-    Параметр `course_id` — идентификатор курса.
-    """
+    # URL-шаблон для подключения к вебсокету в чате.
+    #
+    # Параметр `course_id` — идентификатор курса.
     re_path(
         r'ws/chat/room/(?P<course_id>\d+)/$',
         consumers.ChatConsumer.as_asgi(),
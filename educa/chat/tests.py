@@ -1,2 +1,339 @@
+import asyncio
+import datetime
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import msgpack
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from chat.buffer import MessageBuffer
+from chat.consumers import ChatConsumer
+from chat.history import get_history
+from chat.models import ArchivedMessage, Message
+from chat.routing import websocket_urlpatterns
+from courses.models import Course, Subject
+from courses.tests import TEST_SETTINGS
+
+
+@override_settings(**TEST_SETTINGS)
+class MessageBufferTests(TestCase):
+    """
+    Отложенная запись сообщений чата.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('student')
+        subject = Subject.objects.create(title='Programming', slug='programming')
+        self.course = Course.objects.create(
+            owner=self.user, subject=subject, title='Python', slug='python', overview='...'
+        )
+        self.started = timezone.now()
+
+    def buffer(self, max_size=10, interval=60, max_pending=100):
+        return MessageBuffer(max_size, interval, max_pending)
+
+    async def add(self, buffer, content, owner='a'):
+        # Время отправки растет вместе с номером сообщения
+        await buffer.add(
+            owner=owner,
+            user_id=self.user.id,
+            course_id=self.course.id,
+            content=content,
+            sent_on=self.started + datetime.timedelta(seconds=int(content)),
+        )
+
+    async def stored(self):
+        return [m async for m in Message.objects.order_by('id').values_list('content', flat=True)]
+
+    async def test_flush_on_size(self):
+        buffer = self.buffer(max_size=3)
+        for i in range(2):
+            await self.add(buffer, str(i))
+        self.assertEqual(await self.stored(), [])
+        await self.add(buffer, '2')
+        self.assertEqual(await self.stored(), ['0', '1', '2'])
+        self.assertEqual(buffer.stats()['flushes'], 1)
+
+    async def test_flush_on_interval(self):
+        buffer = self.buffer(interval=0.01)
+        await self.add(buffer, '0')
+        await buffer._timer
+        self.assertEqual(await self.stored(), ['0'])
+        self.assertEqual(buffer.depth, 0)
+
+    async def test_flush_by_owner(self):
+        buffer = self.buffer()
+        for i, owner in enumerate('abab'):
+            await self.add(buffer, str(i), owner)
+        self.assertEqual(await buffer.flush(owner='a'), 2)
+        self.assertEqual(await self.stored(), ['0', '2'])
+        # Сообщения другого клиента остаются в буфере в прежнем порядке
+        self.assertEqual([m.content for m in buffer._pending], ['1', '3'])
+
+    async def test_flush_by_course(self):
+        other = await Course.objects.acreate(
+            owner=self.user, subject_id=self.course.subject_id,
+            title='Django', slug='django', overview='...',
+        )
+        buffer = self.buffer()
+        await self.add(buffer, '0')
+        # Консумер передает id курса из URL строкой
+        await buffer.add(
+            user_id=self.user.id, course_id=str(other.id), content='1', sent_on=self.started
+        )
+        self.assertEqual(await buffer.flush(course_id=str(self.course.id)), 1)
+        self.assertEqual([m.content for m in buffer._pending], ['1'])
+        self.assertEqual(await buffer.flush(course_id=other.id), 1)
+
+    async def test_stats_are_logged(self):
+        buffer = MessageBuffer(10, 60, 100, stats_interval=0)
+        await self.add(buffer, '0')
+        with self.assertLogs('chat.buffer', 'INFO') as logs:
+            await buffer.flush()
+        self.assertIn("'flushed': 1", logs.output[0])
+
+    async def test_failed_flush_keeps_order(self):
+        buffer = self.buffer(max_pending=3)
+        for i, owner in enumerate('abab'):
+            await self.add(buffer, str(i), owner)
+        with mock.patch.object(
+            Message.objects, 'abulk_create', side_effect=ConnectionError
+        ), self.assertLogs('chat.buffer', 'ERROR'):
+            self.assertEqual(await buffer.flush(owner='a'), 0)
+        # Самое старое сообщение сверх предела отбрасывается
+        self.assertEqual([m.content for m in buffer._pending], ['1', '2', '3'])
+        self.assertEqual(await buffer.flush(), 3)
+        self.assertEqual(await self.stored(), ['1', '2', '3'])
+
+
+class FailingPresence:
+    """
+    Присутствие, продление которого завершается заданными ошибками.
+    """
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def heartbeat(self, room, username, channel_name):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+
+    leave = heartbeat
+
+
+@override_settings(CHAT_PRESENCE_HEARTBEAT=0, **TEST_SETTINGS)
+class HeartbeatTests(TestCase):
+    """
+    Продление присутствия участника при ошибках хранилища.
+    """
+
+    def consumer(self, presence):
+        consumer = ChatConsumer()
+        consumer.room_group_name = 'chat_1'
+        consumer.user = User(username='student')
+        consumer.channel_name = 'channel'
+        consumer.presence = presence
+        consumer.channel_layer = get_channel_layer()
+        return consumer
+
+    async def test_connection_error_is_logged_and_retried(self):
+        presence = FailingPresence(ConnectionError(), RedisError())
+        task = asyncio.create_task(self.consumer(presence).heartbeat())
+        with self.assertLogs('chat.consumers', 'ERROR') as logs:
+            while presence.calls < 3:
+                await asyncio.sleep(0)
+        task.cancel()
+        self.assertEqual(len(logs.records), 2)
+
+    async def test_unexpected_error_stops_heartbeat(self):
+        presence = FailingPresence(ValueError())
+        with self.assertRaises(ValueError):
+            await self.consumer(presence).heartbeat()
+
+    async def test_disconnect_survives_presence_error(self):
+        consumer = self.consumer(FailingPresence(ConnectionError()))
+        consumer.heartbeat_task = asyncio.create_task(asyncio.sleep(60))
+        with mock.patch('chat.consumers.message_buffer') as buffer, \
+                self.assertLogs('chat.consumers', 'ERROR'):
+            buffer.flush = mock.AsyncMock()
+            await consumer.disconnect(1000)
+        buffer.flush.assert_awaited_once_with(owner='channel')
+        with self.assertRaises(asyncio.CancelledError):
+            await consumer.heartbeat_task
+
+
+@override_settings(CHAT_PRESENCE_INTERVAL=60, **TEST_SETTINGS)
+class ChatConsumerTests(TestCase):
+    """
+    Обмен кадрами с консумером чата.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('student')
+        subject = Subject.objects.create(title='Programming', slug='programming')
+        self.course = Course.objects.create(
+            owner=self.user, subject=subject, title='Python', slug='python', overview='...'
+        )
+        self.course.students.add(self.user)
+        # Ведра частоты кадров общие для процесса: каждый тест начинает с полных
+        limiters = mock.patch.dict('chat.ratelimit._limiters', clear=True)
+        limiters.start()
+        self.addCleanup(limiters.stop)
+
+    async def connect(self, subprotocols=None):
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns),
+            f'/ws/chat/room/{self.course.pk}/',
+            subprotocols=subprotocols,
+        )
+        communicator.scope['user'] = self.user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_history_frame(self):
+        for i in range(3):
+            await Message.objects.acreate(user=self.user, course=self.course, content=str(i))
+        communicator = await self.connect()
+        await communicator.send_json_to({'type': 'history', 'limit': 2})
+        page = await communicator.receive_json_from()
+        self.assertEqual([m['message'] for m in page['messages']], ['1', '2'])
+        await communicator.send_json_to({'type': 'history', 'before': page['next']})
+        page = await communicator.receive_json_from()
+        self.assertEqual(([m['message'] for m in page['messages']], page['next']), (['0'], None))
+        await communicator.disconnect()
+
+    @override_settings(CHAT_SEND_WINDOW=3)
+    async def test_unacknowledged_frames_close_connection(self):
+        communicator = await self.connect()
+        with self.assertLogs('chat.consumers', 'WARNING'):
+            for _ in range(4):
+                await communicator.send_json_to({'type': 'history'})
+            for _ in range(3):
+                self.assertEqual((await communicator.receive_json_from())['type'], 'history')
+            output = await communicator.receive_output()
+        self.assertEqual(output, {'type': 'websocket.close', 'code': 4008})
+        await communicator.disconnect()
+
+    @override_settings(CHAT_SEND_WINDOW=3)
+    async def test_acknowledged_frames_keep_connection(self):
+        communicator = await self.connect()
+        for received in range(1, 6):
+            await communicator.send_json_to({'type': 'history'})
+            self.assertEqual((await communicator.receive_json_from())['type'], 'history')
+            await communicator.send_json_to({'type': 'ack', 'received': received})
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+
+    @override_settings(CHAT_RATE_LIMIT_USER=(0.001, 2), CHAT_RATE_LIMIT_POLICY='drop')
+    async def test_rate_limit_drop(self):
+        communicator = await self.connect()
+        for _ in range(5):
+            await communicator.send_json_to({'type': 'history'})
+        frames = [(await communicator.receive_json_from())['type'] for _ in range(3)]
+        # Кадры сверх лимита отброшены, уведомление отправлено один раз
+        self.assertEqual(frames, ['history', 'history', 'rate_limited'])
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    @override_settings(CHAT_RATE_LIMIT_USER=(0.001, 2), CHAT_RATE_LIMIT_POLICY='close')
+    async def test_rate_limit_close(self):
+        communicator = await self.connect()
+        for _ in range(2):
+            await communicator.send_json_to({'type': 'history'})
+            self.assertEqual((await communicator.receive_json_from())['type'], 'history')
+        await communicator.send_json_to({'message': 'spam'})
+        output = await communicator.receive_output()
+        self.assertEqual(output, {'type': 'websocket.close', 'code': 4429})
+        await communicator.disconnect()
+        # Отброшенное сообщение не записано
+        self.assertFalse(await Message.objects.aexists())
+
+    async def test_msgpack_round_trip(self):
+        communicator = await self.connect(subprotocols=['msgpack'])
+        listener = await self.connect()
+        await communicator.send_to(bytes_data=msgpack.packb({'message': 'привет'}))
+        frame = msgpack.unpackb(await communicator.receive_from(), raw=False)
+        self.assertEqual((frame['message'], frame['user']), ('привет', 'student'))
+        # Клиент без подпротокола получает то же сообщение текстовым JSON-кадром
+        self.assertEqual((await listener.receive_json_from())['message'], 'привет')
+        await communicator.send_to(bytes_data=msgpack.packb({'type': 'history'}))
+        page = msgpack.unpackb(await communicator.receive_from(), raw=False)
+        self.assertEqual([m['message'] for m in page['messages']], ['привет'])
+        # Поврежденный кадр игнорируется, соединение остается открытым
+        await communicator.send_to(bytes_data=b'\xc1')
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+        await listener.disconnect()
+
+
+@override_settings(**TEST_SETTINGS)
+class HistoryTests(TestCase):
+    """
+    Постраничное чтение истории чата по курсору.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('student', password='x')
+        subject = Subject.objects.create(title='Programming', slug='programming')
+        self.course = Course.objects.create(
+            owner=self.user, subject=subject, title='Python', slug='python', overview='...'
+        )
+        self.course.students.add(self.user)
+        self.messages = Message.objects.bulk_create(
+            Message(user=self.user, course=self.course, content=str(i)) for i in range(7)
+        )
+
+    def walk(self, limit):
+        """
+        Проходит историю от новых сообщений к старым и возвращает страницы.
+        """
+        pages, before = [], None
+        while True:
+            page = get_history(self.course.pk, before=before, limit=limit)
+            pages.append([m['message'] for m in page['messages']])
+            before = page['next']
+            if before is None:
+                return pages
+
+    def test_pages_have_no_gaps_or_duplicates(self):
+        pages = self.walk(limit=3)
+        self.assertEqual(pages, [['4', '5', '6'], ['1', '2', '3'], ['0']])
+
+    def test_http_history(self):
+        url = reverse('chat:course_chat_history', args=[self.course.pk])
+        self.client.force_login(self.user)
+        page = self.client.get(url, {'limit': 5}).json()
+        self.assertEqual([m['message'] for m in page['messages']], ['2', '3', '4', '5', '6'])
+        page = self.client.get(url, {'before': page['next'], 'limit': 5}).json()
+        self.assertEqual(([m['message'] for m in page['messages']], page['next']), (['0', '1'], None))
+        self.assertEqual(self.client.get(url, {'before': 'x'}).status_code, 400)
+        self.client.force_login(User.objects.create_user('other'))
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_history_spans_archive(self):
+        old = timezone.now() - datetime.timedelta(days=100)
+        Message.objects.filter(pk__in=[m.pk for m in self.messages[:4]]).update(sent_on=old)
+        call_command('archive_messages', days=90, batch_size=3, stdout=StringIO())
+        self.assertEqual(Message.objects.count(), 3)
+        self.assertEqual(ArchivedMessage.objects.count(), 4)
+        # Страницы переходят из основной таблицы в архив без пропусков и повторов
+        self.assertEqual(self.walk(limit=3), [['4', '5', '6'], ['1', '2', '3'], ['0']])
+        self.assertEqual(self.walk(limit=5), [['2', '3', '4', '5', '6'], ['0', '1']])
+        # Повторный запуск ничего не переносит
+        call_command('archive_messages', days=90, stdout=StringIO())
+        self.assertEqual(ArchivedMessage.objects.count(), 4)
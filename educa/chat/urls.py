@@ -13,16 +13,22 @@ from . import views
 app_name = 'chat'  # Имя приложения «Чат»
 
 urlpatterns = [
-    """
-    URL-шаблон для доступа к странице чата в конкретном курсе.
-
-    Параметр `course_id` — идентификатор курса.
-    
-    URL: /room/<int:course_id>/
-    """
+    # URL-шаблон для доступа к странице чата в конкретном курсе.
+    #
+    # Параметр `course_id` — идентификатор курса.
+    #
+    # URL: /room/<int:course_id>/
     path(
         'room/<int:course_id>/',
         views.course_chat_room,
         name='course_chat_room',  # Имя URL-шаблона
     ),
+    # URL-шаблон для постраничного чтения истории чата курса.
+    #
+    # URL: /room/<int:course_id>/history/?before=<id>&limit=<n>
+    path(
+        'room/<int:course_id>/history/',
+        views.course_chat_history,
+        name='course_chat_history',
+    ),
 ]
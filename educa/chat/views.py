@@ -1,13 +1,16 @@
 """
 Модуль для регистрации функций представления приложения «Чат».
 
-В этом модуле содержится функция `course_chat_room` для доступа к странице чата в конкретном курсе.
+В этом модуле содержится функция `course_chat_room` для доступа к странице чата в конкретном курсе
+и функция `course_chat_history` для постраничного чтения истории сообщений.
 """
 
 from django.contrib.auth.decorators import login_required  # noqa: F401 (используется только один раз)
-from django.http import HttpResponseForbidden
+from django.http import HttpResponseBadRequest, HttpResponseForbidden, JsonResponse
 from django.shortcuts import render
 
+from chat.history import get_history
+from courses.cache import is_enrolled
 from courses.models import Course  # noqa: F401 (используется только один раз)
 
 
@@ -22,9 +25,12 @@ def course_chat_room(request, course_id):
 
     Возвращает HTML-страницу с последними сообщениями в чате.
     """
+    if not is_enrolled(request.user, course_id):
+        # Возврат запрещенного доступа, если пользователь не записан на курс
+        return HttpResponseForbidden()
     try:
         # Получение курса по идентификатору
-        course = request.user.courses_joined.get(id=course_id)
+        course = Course.objects.get(id=course_id)
     except Course.DoesNotExist:
         # Возврат запрещенного доступа, если курс не существует
         return HttpResponseForbidden()
@@ -42,3 +48,28 @@ def course_chat_room(request, course_id):
         'chat/room.html',
         {'course': course, 'latest_messages': latest_messages},
     )
+
+
+@login_required
+def course_chat_history(request, course_id):
+    """
+    Функция для постраничного чтения истории чата курса в формате JSON.
+
+    Параметры:
+        `request`: Объект запроса. Необязательные GET-параметры: `before` —
+            курсор (id сообщения), `limit` — размер страницы.
+        `course_id`: Идентификатор курса.
+
+    Возвращает JSON со списком сообщений и курсором `next` для более ранней страницы.
+    """
+    if not is_enrolled(request.user, course_id):
+        # Возврат запрещенного доступа, если пользователь не записан на курс
+        return HttpResponseForbidden()
+
+    try:
+        before = int(request.GET.get('before') or 0) or None
+        limit = int(request.GET.get('limit') or 0) or None
+    except ValueError:
+        return HttpResponseBadRequest()
+
+    return JsonResponse(get_history(course_id, before=before, limit=limit))
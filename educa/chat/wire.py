@@ -0,0 +1,56 @@
+"""
+Модуль формата передачи сообщений чата по WebSocket.
+
+Клиент выбирает формат при подключении через подпротокол WebSocket:
+без подпротокола используются текстовые JSON-кадры, с подпротоколом
+`msgpack` — бинарные кадры MessagePack. События группы кодируются один
+раз при отправке в группу сразу в оба формата, а консумеры пересылают
+готовые кадры без повторной сериализации.
+
+Клиент периодически подтверждает прием кадром
+`{"type": "ack", "received": N}`, где N — количество полученных кадров с
+начала соединения. Клиент, отставший от сервера более чем на
+CHAT_SEND_WINDOW кадров, отключается с кодом 4008.
+"""
+
+import json
+
+import msgpack
+
+# Подпротокол WebSocket для бинарного формата MessagePack.
+MSGPACK_SUBPROTOCOL = 'msgpack'
+
+
+def encode(payload):
+    """
+    Кодирует данные для всех форматов передачи.
+
+    Параметры:
+        `payload`: Данные для клиента (словарь).
+
+    Возвращает словарь с готовыми кадрами: `text` (JSON) и `bytes` (MessagePack).
+    """
+    return {
+        'text': json.dumps(payload, separators=(',', ':')),
+        'bytes': msgpack.packb(payload),
+    }
+
+
+def decode(text_data=None, bytes_data=None):
+    """
+    Декодирует кадр клиента.
+
+    Параметры:
+        `text_data`: Текстовый кадр (JSON).
+        `bytes_data`: Бинарный кадр (MessagePack).
+
+    Возвращает словарь или None, если кадр поврежден.
+    """
+    try:
+        if bytes_data is not None:
+            data = msgpack.unpackb(bytes_data, raw=False)
+        else:
+            data = json.loads(text_data)
+    except (ValueError, TypeError, msgpack.UnpackException):
+        return None
+    return data if isinstance(data, dict) else None
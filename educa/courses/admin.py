@@ -3,6 +3,8 @@ from django.contrib import admin  # Для работы с админ-панел
 
 # Импортируем модели предметов, курсов и модулей из других файлов.
 from .models import Course, Module, Subject
+# Полнотекстовый поиск с ранжированием вместо ILIKE по полям.
+from .search import FullTextSearchAdminMixin
 
 
 # Регистрация админ-виджета для предмета с настройками по умолчанию.
@@ -38,7 +40,7 @@ class ModuleInline(admin.StackedInline):
 
 # Регистрация админ-виджета для курса с настройками по умолчанию.
 @admin.register(Course)
-class CourseAdmin(admin.ModelAdmin):
+class CourseAdmin(FullTextSearchAdminMixin, admin.ModelAdmin):
     """
     Админ-виджет для курса.
 
@@ -56,7 +58,7 @@ class CourseAdmin(admin.ModelAdmin):
     # Настройка полей для фильтрации данных.
     list_filter = ['created', 'subject']
 
-    # Настройка полей для поиска данных.
+    # Настройка полей для поиска данных (по индексу search_vector в PostgreSQL).
     search_fields = ['title', 'overview']
 
     # Настройка полей с предустановленными значениями.
@@ -2,7 +2,16 @@
 Модуль для регистрации классов пагинации данных.
 """
 
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class StandardPagination(PageNumberPagination):
@@ -27,3 +36,152 @@ class StandardPagination(PageNumberPagination):
 
     max_page_size = 50
     """Максимальное количество элементов на странице."""
+
+
+class KeysetPagination(BasePagination):
+    """
+    Класс для пагинации по ключевому курсору (keyset).
+
+    Страница начинается строго после последней строки предыдущей страницы
+    по составному ключу сортировки (по умолчанию `(created, id)` по убыванию),
+    поэтому глубокие страницы не используют OFFSET, а запрос COUNT(*) не выполняется.
+    Пагинация однонаправленная: клиент проходит коллекцию по ссылке `next`.
+
+    Атрибуты:
+        `ordering`: Составной ключ сортировки; последним полем должен быть уникальный `id`.
+        `page_size`, `page_size_query_param`, `max_page_size`: Как в `StandardPagination`.
+        `cursor_query_param`: Параметр запроса с курсором.
+    """
+
+    ordering = ('-created', '-id')
+    """Составной ключ сортировки."""
+
+    page_size = StandardPagination.page_size
+    page_size_query_param = StandardPagination.page_size_query_param
+    max_page_size = StandardPagination.max_page_size
+
+    cursor_query_param = 'cursor'
+    """Параметр запроса с курсором."""
+
+    def get_ordering(self, view):
+        """
+        Возвращает ключ сортировки: атрибут `keyset_ordering` представления или `ordering`.
+        """
+        return getattr(view, 'keyset_ordering', self.ordering)
+
+    def get_page_size(self, request):
+        """
+        Возвращает размер страницы с учетом параметра запроса.
+        """
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, values):
+        """
+        Кодирует значения ключа последней строки в непрозрачный курсор.
+        """
+        # isoformat сохраняет микросекунды, которые DjangoJSONEncoder отбрасывает
+        raw = json.dumps(values, default=lambda value: value.isoformat()).encode()
+        return base64.urlsafe_b64encode(raw).decode()
+
+    def decode_cursor(self, cursor, fields):
+        """
+        Декодирует курсор и приводит значения к типам полей модели.
+        """
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if len(values) != len(fields):
+                raise ValueError
+            return [field.to_python(value) for field, value in zip(fields, values)]
+        except (TypeError, ValueError, ValidationError, binascii.Error):
+            raise NotFound('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Возвращает одну страницу коллекции после переданного курсора.
+        """
+        self.request = request
+        ordering = self.get_ordering(view)
+        names = [name.lstrip('-') for name in ordering]
+        fields = [queryset.model._meta.get_field(name) for name in names]
+        self.names = names
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*ordering)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            values = self.decode_cursor(cursor, fields)
+            # (a, b) после (x, y): a < x ИЛИ (a = x И b < y) — для убывания
+            condition = Q()
+            equal = {}
+            for name, value in zip(ordering, values):
+                lookup = 'lt' if name.startswith('-') else 'gt'
+                field = name.lstrip('-')
+                condition |= Q(**equal, **{f'{field}__{lookup}': value})
+                equal[field] = value
+            queryset = queryset.filter(condition)
+
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        return self.page
+
+    def get_next_link(self):
+        """
+        Возвращает ссылку на следующую страницу или None.
+        """
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        # Страница может состоять из объектов модели или строк `.values()`
+        if isinstance(last, dict):
+            values = [last[name] for name in self.names]
+        else:
+            values = [getattr(last, name) for name in self.names]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(values))
+
+    def get_paginated_response(self, data):
+        """
+        Возвращает ответ со ссылкой на следующую страницу и результатами.
+        """
+        return Response({
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        })
+
+
+class SelectablePagination(StandardPagination):
+    """
+    Класс пагинации с выбором способа на уровне запроса.
+
+    По умолчанию (в том числе в browsable API) используется пагинация по номерам
+    страниц. Если в запросе передан `cursor` или `pagination=cursor`,
+    используется `KeysetPagination`.
+    """
+
+    keyset_pagination_class = KeysetPagination
+    """Класс пагинации по курсору."""
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Выбирает способ пагинации по параметрам запроса и возвращает страницу.
+        """
+        params = request.query_params
+        if 'cursor' in params or params.get('pagination') == 'cursor':
+            self.delegate = self.keyset_pagination_class()
+            return self.delegate.paginate_queryset(queryset, request, view)
+        self.delegate = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        """
+        Возвращает ответ выбранного способа пагинации.
+        """
+        if self.delegate is not None:
+            return self.delegate.get_paginated_response(data)
+        return super().get_paginated_response(data)
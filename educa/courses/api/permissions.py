@@ -4,6 +4,8 @@
 
 from rest_framework.permissions import BasePermission
 
+from courses.cache import is_enrolled
+
 
 class IsEnrolled(BasePermission):
     """
@@ -34,5 +36,5 @@ class IsEnrolled(BasePermission):
             `False` - пользователь не причастен к курсу.
         """
 
-        # Проверка причастности пользователя к курсу
-        return obj.students.filter(id=request.user.id).exists()
+        # Проверка причастности пользователя к курсу по кэшированному множеству курсов
+        return is_enrolled(request.user, obj.id)
@@ -1,15 +1,31 @@
-from django.db.models import Count
+from django.conf import settings
 from rest_framework import serializers
 
 from courses.models import Content, Course, Module, Subject
 
 
+class SubjectListSerializer(serializers.ListSerializer):
+    """
+    Serializer для списка предметов.
+
+    Перед сериализацией загружает популярные курсы для всех предметов
+    страницы одним запросом вместо отдельного запроса на каждый предмет.
+    """
+
+    def to_representation(self, data):
+        subjects = list(data.all() if hasattr(data, 'all') else data)
+        popular = Course.objects.popular_by_subject([s.id for s in subjects])
+        for subject in subjects:
+            subject.popular_courses = popular[subject.id]
+        return super().to_representation(subjects)
+
+
 class SubjectSerializer(serializers.ModelSerializer):
     """
     Serializer для модели Subject.
 
     Поля:
-        - total_courses: общее количество курсов для этого предмета.
+        - total_courses: общее количество курсов для этого предмета (счетчик).
         - popular_courses: три самых популярных курса по этому предмету.
 
     Файлдс:
@@ -29,15 +45,17 @@ class SubjectSerializer(serializers.ModelSerializer):
         :param obj: экземпляр модели Subject.
         :return: список строк формата "Название курса (Количество студентов)".
         """
-        courses = obj.courses.annotate(
-            total_students=Count('students')
-        ).order_by('-total_students')[:3]
+        courses = getattr(obj, 'popular_courses', None)
+        if courses is None:
+            # Одиночный предмет: курсы не были загружены списочным сериализатором
+            courses = Course.objects.popular_by_subject([obj.id])[obj.id]
         return [
             f'{c.title} ({c.total_students} students)' for c in courses
         ]
 
     class Meta:
         model = Subject
+        list_serializer_class = SubjectListSerializer
         fields = [
             'id',
             'title',
@@ -165,3 +183,179 @@ class CourseWithContentsSerializer(serializers.ModelSerializer):
             'owner',
             'modules',
         ]
+
+
+class BulkEnrollmentSerializer(serializers.Serializer):
+    """
+    Serializer для запроса массовой записи на курсы.
+
+    Поля:
+        - users: идентификаторы пользователей.
+        - courses: идентификаторы курсов.
+
+    Каждый пользователь записывается на каждый курс. Запрос выполняется
+    в одной транзакции, поэтому количество пар ограничено
+    BULK_ENROLL_MAX_PAIRS; большие наборы записываются командой bulk_enroll.
+    """
+    users = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_ENROLL_MAX_PAIRS,
+    )
+    courses = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_ENROLL_MAX_PAIRS,
+    )
+
+    def validate(self, attrs):
+        pairs = len(set(attrs['users'])) * len(set(attrs['courses']))
+        if pairs > settings.BULK_ENROLL_MAX_PAIRS:
+            raise serializers.ValidationError(
+                f'Too many enrollments requested ({pairs}, at most '
+                f'{settings.BULK_ENROLL_MAX_PAIRS}); use the bulk_enroll '
+                f'management command for large cohorts.'
+            )
+        return attrs
+
+
+class ValuesSerializer:
+    """
+    Быстрый сериализатор только для чтения, работающий со строками `.values()`.
+
+    Схема вывода компилируется один раз при объявлении класса из полей
+    соответствующего `ModelSerializer` (`Meta.serializer`), поэтому JSON
+    совпадает с JSON обычного сериализатора, но для каждого объекта не
+    создаются экземпляры полей и не выполняется интроспекция модели.
+
+    Атрибуты Meta:
+        serializer: Класс ModelSerializer, вывод которого воспроизводится.
+        nested: Словарь {поле: (класс ValuesSerializer, поле связи с родителем)}
+            для вложенных списков.
+    Поля SerializerMethodField вычисляются методами `get_<поле>(row)`.
+    """
+
+    # Поля, значения которых из `.values()` уже совпадают с выводом DRF.
+    passthrough_fields = (
+        serializers.CharField,
+        serializers.IntegerField,
+        serializers.BooleanField,
+        serializers.RelatedField,
+    )
+
+    class Meta:
+        serializer = None
+        nested = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        serializer = cls.Meta.serializer
+        nested = getattr(cls.Meta, 'nested', {})
+        cls.model = serializer.Meta.model
+        # Список (имя, источник, преобразование) в порядке полей сериализатора
+        cls.plan = []
+        cls.sources = ['pk']
+        for name, field in serializer().fields.items():
+            if name in nested:
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                continue
+            if isinstance(field, cls.passthrough_fields):
+                convert = None
+            else:
+                convert = field.to_representation
+            cls.plan.append((name, field.source, convert))
+            cls.sources.append(field.source)
+        cls.field_names = list(serializer().fields)
+        cls.nested = nested
+
+    def __init__(self, instance=None, many=False, context=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    @classmethod
+    def values(cls, queryset):
+        """
+        Возвращает запрос, выбирающий только нужные сериализатору колонки.
+        """
+        # Вложенные списки загружаются в prepare, prefetch_related не нужен
+        return queryset.prefetch_related(None).values(*cls.sources)
+
+    def prepare(self, rows):
+        """
+        Загружает данные, общие для всех строк (вложенные списки и т.п.).
+        """
+        pks = [row['pk'] for row in rows]
+        self.children = {}
+        for name, (child, parent_field) in self.nested.items():
+            grouped = {pk: [] for pk in pks}
+            queryset = child.model.objects.filter(**{f'{parent_field}__in': pks})
+            child_rows = list(queryset.values(parent_field, *child.sources))
+            child_serializer = child(child_rows, many=True, context=self.context)
+            child_serializer.prepare(child_rows)
+            for row in child_rows:
+                grouped[row[parent_field]].append(child_serializer.to_representation(row))
+            self.children[name] = grouped
+
+    def to_representation(self, row):
+        """
+        Преобразует одну строку `.values()` в словарь вывода.
+        """
+        data = {}
+        for name, source, convert in self.plan:
+            value = row[source]
+            data[name] = value if convert is None or value is None else convert(value)
+        for name in self.nested:
+            data[name] = self.children[name][row['pk']]
+        for name in self.field_names:
+            if name not in data:
+                data[name] = getattr(self, f'get_{name}')(row)
+        # Порядок ключей совпадает с порядком полей ModelSerializer
+        return {name: data[name] for name in self.field_names}
+
+    @property
+    def data(self):
+        rows = list(self.instance) if self.many else [self.instance]
+        self.prepare(rows)
+        result = [self.to_representation(row) for row in rows]
+        return result if self.many else result[0]
+
+
+class ModuleValuesSerializer(ValuesSerializer):
+    """
+    Быстрый сериализатор модулей (вывод как у ModuleSerializer).
+    """
+
+    class Meta:
+        serializer = ModuleSerializer
+
+
+class CourseValuesSerializer(ValuesSerializer):
+    """
+    Быстрый сериализатор курсов (вывод как у CourseSerializer).
+    """
+
+    class Meta:
+        serializer = CourseSerializer
+        nested = {'modules': (ModuleValuesSerializer, 'course_id')}
+
+
+class SubjectValuesSerializer(ValuesSerializer):
+    """
+    Быстрый сериализатор предметов (вывод как у SubjectSerializer).
+    """
+
+    class Meta:
+        serializer = SubjectSerializer
+
+    def prepare(self, rows):
+        super().prepare(rows)
+        # Популярные курсы всех предметов страницы одним запросом
+        self.popular = Course.objects.popular_by_subject([row['pk'] for row in rows])
+
+    def get_popular_courses(self, row):
+        return [
+            f'{c.title} ({c.total_students} students)'
+            for c in self.popular[row['pk']]
+        ]
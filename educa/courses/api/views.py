@@ -1,59 +1,126 @@
 # Импортируем необходимые библиотеки и модели из других файлов.
-# Для подсчета количества курсов по предмету.
-from django.db.models import Count
+from django.conf import settings
+from django.core.cache import cache  # Для кэширования ответов.
+# Для предварительной загрузки модулей с содержимым.
+from django.db.models import Prefetch
+from django.http import Http404
+from django.utils.cache import get_conditional_response  # Для ответов 304.
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date
+from django.views.decorators.http import condition  # Для условных ответов по ETag.
 from rest_framework import viewsets  # Для создания API-виджетов.
+# Для ответа 400 на запрос без поисковой строки.
+from rest_framework.exceptions import ValidationError
 # Для авторизации пользователя.
 from rest_framework.authentication import BasicAuthentication
 # Для добавления действий к API-виджету.
 from rest_framework.decorators import action
 # Для проверки авторизации пользователя.
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response  # Для возвращения ответа клиенту.
 
 # Импортируем настройки пагинации и разрешения для API-виджетов.
-from courses.api.pagination import StandardPagination
+from courses.api.pagination import SelectablePagination, StandardPagination
 from courses.api.permissions import IsEnrolled
 
 # Импортируем сериализаторы данных для предметов и курсов.
 from courses.api.serializers import (
+    BulkEnrollmentSerializer,  # Для проверки запроса массовой записи.
     CourseSerializer,  # Для сериализации данных по курсу.
+    # Быстрая сериализация списка курсов из строк .values().
+    CourseValuesSerializer,
     # Для сериализации данных по курсу с содержимым.
     CourseWithContentsSerializer,
     SubjectSerializer,  # Для сериализации данных по предмету.
+    # Быстрая сериализация списка предметов из строк .values().
+    SubjectValuesSerializer,
 )
 
+# Импортируем версии содержимого курсов и хранилище отрендеренных фрагментов.
+from courses.cache import course_contents_key, get_course_state
+from courses.conditional import (
+    catalog_etag,
+    course_etag,
+    course_last_modified,
+    subject_list_etag,
+)
+from courses.enrollment import bulk_enroll
+from courses.fragments import preload_fragments
+from courses.search import search as full_text_search
+
 # Импортируем модели предметов и курсов из других файлов.
-from courses.models import Course, Subject
+from courses.models import Course, Module, Subject
+
+
+class ValuesListMixin:
+    """
+    Примесь для быстрой сериализации списков из строк `.values()`.
+
+    Если у представления задан `values_serializer_class`, действие list
+    выбирает только нужные колонки и сериализует их без ModelSerializer;
+    остальные действия используют обычный `serializer_class`.
+    """
+
+    # Быстрый сериализатор списка (None отключает быстрый режим).
+    values_serializer_class = None
 
+    def list(self, request, *args, **kwargs):
+        if self.values_serializer_class is None:
+            return super().list(request, *args, **kwargs)
+        serializer_class = self.values_serializer_class
+        queryset = serializer_class.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        context = self.get_serializer_context()
+        if page is not None:
+            serializer = serializer_class(page, many=True, context=context)
+            return self.get_paginated_response(serializer.data)
+        serializer = serializer_class(queryset, many=True, context=context)
+        return Response(serializer.data)
 
-class SubjectViewSet(viewsets.ReadOnlyModelViewSet):
+
+class SubjectViewSet(ValuesListMixin, viewsets.ReadOnlyModelViewSet):
     """
     API-виджет для работы с предметами.
 
     Поля:
         queryset (QuerySet): Коллекция объектов по умолчанию.
         serializer_class (Serializer): Класс сериализации данных.
+        values_serializer_class (ValuesSerializer): Быстрый сериализатор списка.
         pagination_class (Pagination): Класс пагинации данных.
+        keyset_ordering (tuple): Ключ сортировки для пагинации по курсору.
     """
 
-    # Установка коллекции объектов по умолчанию с подсчетом количества курсов по предмету.
-    queryset = Subject.objects.annotate(total_courses=Count('courses'))
+    # Установка коллекции объектов по умолчанию (количество курсов хранится в счетчике).
+    queryset = Subject.objects.all()
 
     # Установка класса сериализации данных для предмета.
     serializer_class = SubjectSerializer
 
-    # Установка класса пагинации данных.
-    pagination_class = StandardPagination
+    # Быстрая сериализация списка предметов.
+    values_serializer_class = SubjectValuesSerializer
+
+    # Установка класса пагинации данных (номера страниц или курсор по запросу).
+    pagination_class = SelectablePagination
+
+    # Составной ключ сортировки для пагинации по курсору.
+    keyset_ordering = ('title', 'id')
+
+    @method_decorator(condition(etag_func=subject_list_etag))
+    def list(self, request, *args, **kwargs):
+        # Список не изменился, пока не изменились каталог и популярность курсов.
+        return super().list(request, *args, **kwargs)
 
 
-class CourseViewSet(viewsets.ReadOnlyModelViewSet):
+class CourseViewSet(ValuesListMixin, viewsets.ReadOnlyModelViewSet):
     """
     API-виджет для работы с курсами.
 
     Поля:
         queryset (QuerySet): Коллекция объектов по умолчанию.
         serializer_class (Serializer): Класс сериализации данных.
+        values_serializer_class (ValuesSerializer): Быстрый сериализатор списка.
         pagination_class (Pagination): Класс пагинации данных.
+        keyset_ordering (tuple): Ключ сортировки для пагинации по курсору.
     """
 
     # Установка коллекции объектов по умолчанию с предварительной загрузкой модулей для каждого курса.
@@ -62,8 +129,60 @@ class CourseViewSet(viewsets.ReadOnlyModelViewSet):
     # Установка класса сериализации данных для курса.
     serializer_class = CourseSerializer
 
-    # Установка класса пагинации данных.
-    pagination_class = StandardPagination
+    # Быстрая сериализация списка курсов.
+    values_serializer_class = CourseValuesSerializer
+
+    # Установка класса пагинации данных (номера страниц или курсор по запросу).
+    pagination_class = SelectablePagination
+
+    # Составной ключ сортировки для пагинации по курсору.
+    keyset_ordering = ('-created', '-id')
+
+    @method_decorator(condition(etag_func=catalog_etag))
+    def list(self, request, *args, **kwargs):
+        # Список не изменился, пока не изменилось поколение каталога.
+        return super().list(request, *args, **kwargs)
+
+    @method_decorator(condition(
+        etag_func=course_etag, last_modified_func=course_last_modified))
+    def retrieve(self, request, *args, **kwargs):
+        # Курс не изменился, пока не изменилась версия его содержимого.
+        return super().retrieve(request, *args, **kwargs)
+
+    def get_queryset(self):
+        """
+        Возвращает коллекцию курсов для текущего действия.
+
+        Для действия contents модули загружаются вместе с содержимым,
+        а элементы — одним запросом на каждый тип содержимого.
+        """
+        if self.action == 'contents':
+            return Course.objects.prefetch_related(
+                Prefetch('modules', queryset=Module.objects.with_contents())
+            )
+        return super().get_queryset()
+
+    @action(
+        detail=False,
+        methods=['get'],
+        pagination_class=StandardPagination,
+    )
+    # Действие для полнотекстового поиска курсов по названию и описанию.
+    # Поля:
+    # request (Request): Объект запроса с параметром q (поисковая строка).
+    # Возвращаемые данные:
+    # Response: Страница курсов, отсортированных по релевантности.
+    def search(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': 'This query parameter is required.'})
+        serializer_class = self.values_serializer_class
+        queryset = serializer_class.values(
+            full_text_search(Course.objects.all(), query, ['title', 'overview'])
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = serializer_class(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
 
     @action(
         detail=True,
@@ -88,6 +207,27 @@ class CourseViewSet(viewsets.ReadOnlyModelViewSet):
         # Возвращение ответа клиенту с информацией о регистрации.
         return Response({'enrolled': True})
 
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='bulk-enroll',
+        serializer_class=BulkEnrollmentSerializer,
+        permission_classes=[IsAdminUser],
+    )
+    # Действие для массовой записи пользователей на курсы.
+    # Каждый пользователь из users записывается на каждый курс из courses;
+    # повторный запрос с теми же данными ничего не меняет.
+    # Возвращаемые данные:
+    # Response: Счетчики созданных и уже существующих записей.
+    def bulk_enroll(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = bulk_enroll(
+            serializer.validated_data['users'],
+            serializer.validated_data['courses'],
+        )
+        return Response(result)
+
     @action(
         detail=True,
         methods=['get'],
@@ -103,5 +243,44 @@ class CourseViewSet(viewsets.ReadOnlyModelViewSet):
     # Возвращаемые данные:
     # Response: Ответ клиенту.
     def contents(self, request, *args, **kwargs):
+        try:
+            course_id = int(self.kwargs[self.lookup_field])
+        except ValueError:
+            raise Http404
+
+        # Проверка записи на курс по кэшированному множеству курсов, без запроса курса.
+        self.check_object_permissions(request, Course(id=course_id))
+
+        # Версия содержимого курса определяет ETag и ключ кэша ответа.
+        state = get_course_state(course_id)
+        if state is None:
+            raise Http404
+        version, updated = state
+        headers = {
+            'ETag': f'"course-{course_id}-{version}"',
+            'Last-Modified': http_date(updated.timestamp()),
+        }
+        not_modified = get_conditional_response(
+            request,
+            etag=headers['ETag'],
+            last_modified=int(updated.timestamp()),
+        )
+        if not_modified is not None:
+            for header, value in headers.items():
+                not_modified[header] = value
+            return not_modified
+
+        key = course_contents_key(course_id, version)
+        data = cache.get(key)
+        if data is None:
+            course = self.get_object()
+            # Загрузка отрендеренных элементов курса одним обращением к кэшу.
+            preload_fragments(
+                content.item
+                for module in course.modules.all()
+                for content in module.contents.all()
+            )
+            data = self.get_serializer(course).data
+            cache.set(key, data, settings.COURSE_CONTENTS_CACHE_TIMEOUT)
         # Возвращение содержимого курса в виде ответа клиенту.
-        return self.retrieve(request, *args, **kwargs)
+        return Response(data, headers=headers)
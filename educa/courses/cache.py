@@ -0,0 +1,563 @@
+"""
+Модуль кэширования каталога курсов.
+
+Каталог (список предметов и курсов) хранится в кэше в виде компактных
+словарей, а не ленивых queryset'ов. Ключи содержат номер поколения
+каталога, который увеличивается сигналами при любом изменении курсов,
+модулей и предметов, поэтому устаревшие данные никогда не читаются.
+
+Здесь же находятся версии содержимого курсов (для ETag и Last-Modified), кэш соответствия поддомена
+курса и URL страницы курса, кэш множеств курсов, на которые записаны
+пользователи, и списки курсов студентов.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Course, Module, Subject
+
+# Ключ счетчика поколений каталога.
+CATALOG_VERSION_KEY = 'catalog:version'
+# Ключ версии популярности курсов (меняется при записи студентов).
+POPULARITY_VERSION_KEY = 'catalog:popularity:version'
+
+
+def _initial_version():
+    # Начальное значение счетчика берется из текущего времени, чтобы после
+    # вытеснения счетчика из кэша не повторить номер уже использованного поколения.
+    return time.time_ns() // 1000
+
+
+def get_version(key):
+    """
+    Возвращает текущее значение счетчика версий.
+
+    :param key: Ключ счетчика.
+    :return: Номер версии (int).
+    """
+    # Счетчик хранится без срока жизни, add не перезапишет существующее значение.
+    cache.add(key, _initial_version(), None)
+    return cache.get(key) or _initial_version()
+
+
+def bump_version(key):
+    """
+    Увеличивает счетчик версий, делая недействительными все ключи с прежней версией.
+
+    :param key: Ключ счетчика.
+    """
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Счетчик был вытеснен из кэша: начинаем новое поколение.
+        cache.set(key, _initial_version(), None)
+
+
+def get_catalog_version():
+    """
+    Возвращает текущее поколение каталога.
+
+    :return: Номер поколения (int).
+    """
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    """
+    Увеличивает поколение каталога, делая недействительными все его ключи.
+    """
+    bump_version(CATALOG_VERSION_KEY)
+
+
+def get_popularity_version():
+    """
+    Возвращает текущую версию популярности курсов.
+
+    От нее зависят только популярные курсы предметов в API; страницы
+    каталога не показывают количество студентов и от записей не зависят.
+
+    :return: Номер версии (int).
+    """
+    return get_version(POPULARITY_VERSION_KEY)
+
+
+def bump_popularity_version():
+    """
+    Увеличивает версию популярности курсов.
+    """
+    bump_version(POPULARITY_VERSION_KEY)
+
+
+def _subjects_key(version):
+    return f'catalog:{version}:subjects'
+
+
+def _courses_key(version, subject_slug):
+    return f'catalog:{version}:courses:{subject_slug or "all"}'
+
+
+def _build_subjects():
+    """
+    Строит список предметов с количеством курсов.
+
+    :return: Список словарей с полями id, title, slug и total_courses.
+    """
+    return list(Subject.objects.values('id', 'title', 'slug', 'total_courses'))
+
+
+def _build_courses(subject_id=None):
+    """
+    Строит список курсов с количеством модулей.
+
+    :param subject_id: Идентификатор предмета для фильтрации (необязательно).
+    :return: Список словарей с данными курса, предмета и преподавателя.
+    """
+    qs = Course.objects.all()
+    if subject_id is not None:
+        qs = qs.filter(subject_id=subject_id)
+    rows = qs.values(
+        'id',
+        'title',
+        'slug',
+        'total_modules',
+        'subject__title',
+        'subject__slug',
+        'owner__first_name',
+        'owner__last_name',
+    )
+    return [
+        {
+            'id': row['id'],
+            'title': row['title'],
+            'slug': row['slug'],
+            'total_modules': row['total_modules'],
+            'subject_title': row['subject__title'],
+            'subject_slug': row['subject__slug'],
+            'owner_name': (
+                f"{row['owner__first_name']} {row['owner__last_name']}"
+            ).strip(),
+        }
+        for row in rows
+    ]
+
+
+def get_catalog(subject_slug=None):
+    """
+    Возвращает данные каталога для страницы списка курсов.
+
+    При теплом кэше данные читаются без обращений к базе данных.
+
+    :param subject_slug: Слаг предмета для фильтрации (необязательно).
+    :return: Кортеж (subjects, subject, courses); subject равен None, если
+        фильтр не задан. Если предмет не найден, поднимается Subject.DoesNotExist.
+    """
+    version = get_catalog_version()
+    subjects_key = _subjects_key(version)
+    courses_key = _courses_key(version, subject_slug)
+    cached = cache.get_many([subjects_key, courses_key])
+
+    subjects = cached.get(subjects_key)
+    if subjects is None:
+        subjects = _build_subjects()
+        cache.set(subjects_key, subjects, settings.CATALOG_CACHE_TIMEOUT)
+
+    subject = None
+    if subject_slug:
+        subject = next(
+            (s for s in subjects if s['slug'] == subject_slug), None
+        )
+        if subject is None:
+            raise Subject.DoesNotExist(subject_slug)
+
+    courses = cached.get(courses_key)
+    if courses is None:
+        courses = _build_courses(subject['id'] if subject else None)
+        cache.set(courses_key, courses, settings.CATALOG_CACHE_TIMEOUT)
+
+    return subjects, subject, courses
+
+
+def _content_version_key(course_id):
+    return f'course:{course_id}:content_version'
+
+
+def get_content_version(course_id):
+    """
+    Возвращает версию содержимого курса (модули, содержимое и элементы).
+
+    :param course_id: Идентификатор курса.
+    :return: Номер версии (int).
+    """
+    return get_version(_content_version_key(course_id))
+
+
+def bump_content_version(*course_ids):
+    """
+    Увеличивает версию содержимого переданных курсов.
+
+    :param course_ids: Идентификаторы курсов.
+    """
+    for course_id in set(course_ids):
+        if course_id is not None:
+            bump_version(_content_version_key(course_id))
+
+
+def get_course_modules(course_id):
+    """
+    Возвращает список модулей курса для боковой панели страницы курса.
+
+    Список кэшируется под текущей версией содержимого курса, поэтому
+    изменение, удаление или перестановка модулей сразу видны студентам.
+
+    :param course_id: Идентификатор курса.
+    :return: Список словарей с полями id, order и title в порядке модулей.
+    """
+    key = f'course:{course_id}:modules:{get_content_version(course_id)}'
+    modules = cache.get(key)
+    if modules is None:
+        modules = list(
+            Module.objects.filter(course_id=course_id).values('id', 'order', 'title')
+        )
+        cache.set(key, modules, settings.COURSE_CONTENTS_CACHE_TIMEOUT)
+    return modules
+
+
+def touch_course_content(*course_ids):
+    """
+    Отмечает изменение содержимого курсов: сдвигает Course.updated
+    и увеличивает версию содержимого.
+
+    Вызывается при изменении модулей, содержимого и элементов курса,
+    включая массовые обновления, не вызывающие сигналов.
+
+    :param course_ids: Идентификаторы курсов.
+    """
+    course_ids = {course_id for course_id in course_ids if course_id is not None}
+    if not course_ids:
+        return
+    Course.objects.filter(pk__in=course_ids).update(updated=timezone.now())
+    bump_content_version(*course_ids)
+
+
+def get_course_state(course_id):
+    """
+    Возвращает версию содержимого курса и время его последнего изменения.
+
+    Время изменения кэшируется под текущей версией, поэтому при теплом
+    кэше состояние определяется без обращений к базе данных.
+
+    :param course_id: Идентификатор курса.
+    :return: Кортеж (версия, datetime последнего изменения) или None,
+        если курс не найден.
+    """
+    version = get_content_version(course_id)
+    key = f'course:{course_id}:updated:{version}'
+    updated = cache.get(key)
+    if updated is None:
+        updated = (
+            Course.objects.filter(pk=course_id)
+            .values_list('updated', flat=True)
+            .first()
+        )
+        if updated is None:
+            return None
+        cache.set(key, updated, settings.COURSE_CONTENTS_CACHE_TIMEOUT)
+    return version, updated
+
+
+def _course_id_key(slug):
+    return f'course:slug:{slug}'
+
+
+def get_course_id(slug):
+    """
+    Возвращает идентификатор курса по слагу.
+
+    :param slug: Слаг курса.
+    :return: Идентификатор курса или None, если курс не найден.
+    """
+    key = _course_id_key(slug)
+    course_id = cache.get(key)
+    if course_id is None:
+        course_id = (
+            Course.objects.filter(slug=slug).values_list('id', flat=True).first()
+        )
+        if course_id is not None:
+            cache.set(key, course_id, settings.SUBDOMAIN_CACHE_TIMEOUT)
+    return course_id
+
+
+def _module_version_key(module_id):
+    return f'module:{module_id}:content_version'
+
+
+def get_module_version(module_id):
+    """
+    Возвращает версию содержимого модуля (содержимое и его элементы).
+
+    :param module_id: Идентификатор модуля.
+    :return: Номер версии (int).
+    """
+    return get_version(_module_version_key(module_id))
+
+
+def bump_module_version(*module_ids):
+    """
+    Увеличивает версию содержимого переданных модулей.
+
+    :param module_ids: Идентификаторы модулей.
+    """
+    for module_id in set(module_ids):
+        if module_id is not None:
+            bump_version(_module_version_key(module_id))
+
+
+def module_contents_key(module_id, version):
+    """
+    Возвращает ключ кэша для отрендеренного содержимого модуля.
+    """
+    return f'module:{module_id}:contents:{version}'
+
+
+def course_contents_key(course_id, version):
+    """
+    Возвращает ключ кэша для ответа с содержимым курса.
+    """
+    return f'course:{course_id}:contents:{version}'
+
+
+class LocalLRUCache:
+    """
+    Потокобезопасный LRU-кэш внутри процесса с ограниченным временем жизни записей.
+
+    Атрибуты:
+        maxsize (int): Максимальное количество записей.
+        timeout (int): Время жизни записи в секундах.
+    """
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Возвращает кортеж (найдено, значение).
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+            return True, value
+
+    def set(self, key, value):
+        """
+        Сохраняет значение, вытесняя самую старую запись при переполнении.
+        """
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.timeout)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        """
+        Удаляет запись, если она существует.
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """
+        Очищает кэш.
+        """
+        with self._lock:
+            self._data.clear()
+
+
+# Локальный кэш соответствия слага курса и URL (в пределах процесса).
+_subdomain_cache = LocalLRUCache(
+    settings.SUBDOMAIN_LOCAL_CACHE_SIZE, settings.SUBDOMAIN_LOCAL_CACHE_TIMEOUT
+)
+
+
+def _subdomain_key(slug):
+    return f'subdomain:{slug}'
+
+
+def resolve_course_url(slug):
+    """
+    Возвращает путь к странице курса по слагу поддомена.
+
+    Результат ищется в локальном LRU-кэше, затем в общем кэше и только
+    затем в базе данных. Неизвестные поддомены кэшируются как отрицательный
+    результат, чтобы перебор случайных поддоменов не нагружал базу данных.
+
+    :param slug: Слаг курса из поддомена.
+    :return: Путь к странице курса или None, если курс не найден.
+    """
+    found, url = _subdomain_cache.get(slug)
+    if found:
+        return url or None
+
+    key = _subdomain_key(slug)
+    url = cache.get(key)
+    if url is None:
+        if Course.objects.filter(slug=slug).exists():
+            url = reverse('course_detail', args=[slug])
+            cache.set(key, url, settings.SUBDOMAIN_CACHE_TIMEOUT)
+        else:
+            # Отрицательный результат хранится пустой строкой.
+            url = ''
+            cache.set(key, url, settings.SUBDOMAIN_NEGATIVE_CACHE_TIMEOUT)
+
+    _subdomain_cache.set(slug, url)
+    return url or None
+
+
+def invalidate_course_url(*slugs):
+    """
+    Удаляет закэшированные соответствия для переданных слагов.
+
+    Записи в локальных кэшах других процессов истекают по времени жизни.
+
+    :param slugs: Слаги курсов.
+    """
+    slugs = [slug for slug in slugs if slug]
+    cache.delete_many(
+        [_subdomain_key(slug) for slug in slugs]
+        + [_course_id_key(slug) for slug in slugs]
+    )
+    for slug in slugs:
+        _subdomain_cache.delete(slug)
+
+
+def _enrollment_key(user_id):
+    return f'enrollment:{user_id}'
+
+
+def _enrolled_queryset(user_id):
+    return Course.students.through.objects.filter(user_id=user_id).values_list(
+        'course_id', flat=True
+    )
+
+
+def get_enrolled_course_ids(user_id):
+    """
+    Возвращает множество идентификаторов курсов, на которые записан пользователь.
+
+    Множество кэшируется и сбрасывается сигналом m2m_changed на Course.students.
+
+    :param user_id: Идентификатор пользователя (None для анонимного).
+    :return: frozenset идентификаторов курсов.
+    """
+    if user_id is None:
+        return frozenset()
+    key = _enrollment_key(user_id)
+    course_ids = cache.get(key)
+    if course_ids is None:
+        course_ids = frozenset(_enrolled_queryset(user_id))
+        cache.set(key, course_ids, settings.ENROLLMENT_CACHE_TIMEOUT)
+    return course_ids
+
+
+async def aget_enrolled_course_ids(user_id):
+    """
+    Асинхронная версия get_enrolled_course_ids для WebSocket-консумеров.
+    """
+    if user_id is None:
+        return frozenset()
+    key = _enrollment_key(user_id)
+    course_ids = await cache.aget(key)
+    if course_ids is None:
+        course_ids = frozenset([pk async for pk in _enrolled_queryset(user_id)])
+        await cache.aset(key, course_ids, settings.ENROLLMENT_CACHE_TIMEOUT)
+    return course_ids
+
+
+def is_enrolled(user, course_id):
+    """
+    Проверяет, записан ли пользователь на курс.
+
+    :param user: Пользователь (может быть анонимным).
+    :param course_id: Идентификатор курса.
+    :return: True, если пользователь записан на курс.
+    """
+    if not user.is_authenticated:
+        return False
+    return int(course_id) in get_enrolled_course_ids(user.id)
+
+
+def invalidate_enrollment(*user_ids):
+    """
+    Сбрасывает кэш записей на курсы и списки курсов для переданных пользователей.
+
+    :param user_ids: Идентификаторы пользователей.
+    """
+    version = get_version(STUDENT_COURSES_VERSION_KEY)
+    cache.delete_many(
+        [_enrollment_key(user_id) for user_id in user_ids]
+        + [_student_courses_key(user_id, version) for user_id in user_ids]
+    )
+
+
+# Ключ счетчика поколений списков курсов студентов (изменения курсов, модулей и предметов).
+STUDENT_COURSES_VERSION_KEY = 'student_courses:version'
+
+
+def _student_courses_key(user_id, version):
+    return f'student_courses:{version}:{user_id}'
+
+
+def bump_student_courses_version():
+    """
+    Увеличивает поколение списков курсов студентов при изменении курсов,
+    модулей или предметов.
+    """
+    bump_version(STUDENT_COURSES_VERSION_KEY)
+
+
+def get_student_courses(user_id):
+    """
+    Возвращает краткие сведения о курсах, на которые записан пользователь.
+
+    Список кэшируется для каждого пользователя; он сбрасывается при изменении
+    записей пользователя (m2m_changed) и при изменении курсов, модулей
+    или предметов (поколение списков).
+
+    :param user_id: Идентификатор пользователя.
+    :return: Список словарей с полями id, title, slug, subject_title,
+        subject_slug и total_modules.
+    """
+    key = _student_courses_key(user_id, get_version(STUDENT_COURSES_VERSION_KEY))
+    courses = cache.get(key)
+    if courses is None:
+        rows = (
+            Course.objects.filter(id__in=get_enrolled_course_ids(user_id))
+            .values('id', 'title', 'slug', 'subject__title', 'subject__slug', 'total_modules')
+        )
+        courses = [
+            {
+                'id': row['id'],
+                'title': row['title'],
+                'slug': row['slug'],
+                'subject_title': row['subject__title'],
+                'subject_slug': row['subject__slug'],
+                'total_modules': row['total_modules'],
+            }
+            for row in rows
+        ]
+        cache.set(key, courses, settings.ENROLLMENT_CACHE_TIMEOUT)
+    return courses
@@ -0,0 +1,122 @@
+"""
+Модуль функций для условных ответов (ETag и Last-Modified) представлений курсов.
+
+Функции предназначены для декоратора `django.views.decorators.http.condition`:
+валидаторы вычисляются по счетчикам версий из кэша до выполнения
+представления, поэтому ответ 304 возвращается без сериализации данных
+и рендеринга шаблонов.
+"""
+
+import hashlib
+
+from .cache import (
+    get_catalog_version,
+    get_course_id,
+    get_course_state,
+    get_popularity_version,
+)
+
+
+def _course_state(request, course_id):
+    """
+    Возвращает состояние курса, запоминая его в запросе,
+    чтобы ETag и Last-Modified вычислялись одним обращением к кэшу.
+    """
+    states = request.__dict__.setdefault('_course_states', {})
+    if course_id not in states:
+        states[course_id] = get_course_state(course_id)
+    return states[course_id]
+
+
+def _user_tag(request):
+    """
+    Возвращает часть ETag HTML-страниц, привязанную к пользователю и сессии.
+
+    Страницы отличаются для анонимных и авторизованных пользователей и
+    содержат CSRF-токен, который меняется при входе. Поэтому учитываются
+    ключ сессии и секрет CSRF (в виде хеша): после входа или выхода
+    закэшированная браузером страница с устаревшим токеном не
+    подтверждается ответом 304.
+    """
+    session = getattr(request, 'session', None)
+    secret = '{}:{}'.format(
+        getattr(session, 'session_key', None) or '',
+        request.META.get('CSRF_COOKIE', ''),
+    )
+    digest = hashlib.sha256(secret.encode()).hexdigest()[:16]
+    return f'{request.user.pk or 0}-{digest}'
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def course_etag(request, pk=None, **kwargs):
+    """
+    Возвращает ETag курса в API по версии его содержимого.
+    """
+    course_id = _int_or_none(pk)
+    state = course_id and _course_state(request, course_id)
+    if not state:
+        return None
+    return f'course-{course_id}-{state[0]}'
+
+
+def course_last_modified(request, pk=None, **kwargs):
+    """
+    Возвращает время последнего изменения курса в API.
+    """
+    course_id = _int_or_none(pk)
+    state = course_id and _course_state(request, course_id)
+    return state[1] if state else None
+
+
+def course_page_etag(request, slug=None, **kwargs):
+    """
+    Возвращает ETag страницы курса.
+
+    Кроме содержимого курса учитывает поколение каталога (название предмета)
+    и пользователя (форма записи и CSRF-токен).
+    """
+    course_id = get_course_id(slug)
+    state = course_id and _course_state(request, course_id)
+    if not state:
+        return None
+    return f'course-{course_id}-{state[0]}-{get_catalog_version()}-{_user_tag(request)}'
+
+
+def course_page_last_modified(request, slug=None, **kwargs):
+    """
+    Возвращает время последнего изменения курса для страницы курса.
+    """
+    course_id = get_course_id(slug)
+    state = course_id and _course_state(request, course_id)
+    return state[1] if state else None
+
+
+def catalog_etag(request, *args, **kwargs):
+    """
+    Возвращает ETag списков API по поколению каталога и формату ответа.
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    return f'catalog-{get_catalog_version()}-{getattr(renderer, "format", "")}'
+
+
+def subject_list_etag(request, *args, **kwargs):
+    """
+    Возвращает ETag списка предметов в API.
+
+    Кроме поколения каталога учитывает версию популярности курсов,
+    так как список содержит популярные курсы каждого предмета.
+    """
+    return f'{catalog_etag(request)}-{get_popularity_version()}'
+
+
+def catalog_page_etag(request, *args, **kwargs):
+    """
+    Возвращает ETag страницы каталога по поколению каталога и пользователю.
+    """
+    return f'catalog-{get_catalog_version()}-{_user_tag(request)}'
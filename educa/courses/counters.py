@@ -0,0 +1,99 @@
+"""
+Модуль денормализованных счетчиков курсов и предметов.
+
+Счетчики `Course.total_modules`, `Course.total_students` и
+`Subject.total_courses` увеличиваются и уменьшаются выражениями F()
+в обработчиках сигналов. Там, где изменение нельзя выразить приращением
+(удаление студентов, очистка связей), счетчик пересчитывается одним
+UPDATE с коррелированным подзапросом. Те же выражения используются
+командой проверки и пересчета.
+"""
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Course, Module, Subject
+
+# (модель, счетчик, связанная модель, поле связи с моделью счетчика)
+COUNTERS = (
+    (Course, 'total_modules', Module, 'course'),
+    (Course, 'total_students', Course.students.through, 'course'),
+    (Subject, 'total_courses', Course, 'subject'),
+)
+
+
+def actual_count(related_model, related_field):
+    """
+    Возвращает выражение с фактическим количеством связанных строк.
+
+    :param related_model: Связанная модель (модули, записи, курсы).
+    :param related_field: Поле связанной модели, ссылающееся на объект.
+    """
+    return Coalesce(
+        Subquery(
+            related_model.objects.filter(**{related_field: OuterRef('pk')})
+            .order_by()
+            .values(related_field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+def _counter(model, field):
+    for counter in COUNTERS:
+        if counter[0] is model and counter[1] == field:
+            return counter
+    raise ValueError(f'Unknown counter {model.__name__}.{field}')
+
+
+def increment(model, field, pk, delta):
+    """
+    Изменяет счетчик объекта на delta одним UPDATE с выражением F().
+
+    :param model: Модель счетчика.
+    :param field: Имя счетчика.
+    :param pk: Идентификатор объекта.
+    :param delta: Приращение (может быть отрицательным).
+    """
+    if pk is None or not delta:
+        return
+    value = F(field) + delta
+    if delta < 0:
+        # Расхождение счетчика не должно мешать удалению (см. recompute_counters)
+        value = Greatest(value, 0)
+    model.objects.filter(pk=pk).update(**{field: value})
+
+
+def recompute(model, field, pks=None):
+    """
+    Пересчитывает счетчик по фактическим данным.
+
+    :param model: Модель счетчика.
+    :param field: Имя счетчика.
+    :param pks: Идентификаторы объектов (по умолчанию все объекты).
+    :return: Количество обновленных строк.
+    """
+    _, _, related_model, related_field = _counter(model, field)
+    qs = model.objects.all()
+    if pks is not None:
+        qs = qs.filter(pk__in=pks)
+    return qs.update(**{field: actual_count(related_model, related_field)})
+
+
+def find_mismatches():
+    """
+    Находит объекты, у которых счетчики расходятся с фактическими данными.
+
+    :return: Список кортежей (модель, счетчик, pk, сохраненное значение, фактическое значение).
+    """
+    mismatches = []
+    for model, field, related_model, related_field in COUNTERS:
+        rows = (
+            model.objects.annotate(actual=actual_count(related_model, related_field))
+            .exclude(**{field: F('actual')})
+            .values_list('pk', field, 'actual')
+        )
+        mismatches.extend((model, field, *row) for row in rows)
+    return mismatches
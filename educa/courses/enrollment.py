@@ -0,0 +1,96 @@
+"""
+Модуль массовой записи пользователей на курсы.
+
+Связи записываются напрямую в промежуточную таблицу Course.students
+пакетными INSERT с игнорированием конфликтов, поэтому повторный вызов
+с теми же данными безопасен. Сигнал m2m_changed отправляется один раз
+на курс с множеством действительно добавленных пользователей, и все
+обработчики (кэши записей, каталога и т.п.) срабатывают как при
+`course.students.add()`.
+"""
+
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.db import router, transaction
+from django.db.models.signals import m2m_changed
+
+from .models import Course
+
+# Количество связей в одном INSERT по умолчанию.
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def bulk_enroll(user_ids, course_ids, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Записывает всех переданных пользователей на все переданные курсы.
+
+    :param user_ids: Идентификаторы пользователей.
+    :param course_ids: Идентификаторы курсов.
+    :param chunk_size: Количество связей в одном INSERT.
+    :return: Словарь со счетчиками: requested (запрошено пар), created
+        (создано связей), existing (уже были записаны), missing_users и
+        missing_courses (неизвестные идентификаторы).
+    """
+    user_ids = set(user_ids)
+    course_ids = set(course_ids)
+    Enrollment = Course.students.through
+    using = router.db_for_write(Enrollment)
+
+    found_users = set(
+        User.objects.filter(id__in=user_ids).values_list('id', flat=True)
+    )
+    courses = Course.objects.in_bulk(course_ids)
+
+    with transaction.atomic(using=using):
+        # Уже существующие связи не вставляются и не попадают в сигнал
+        existing = set(
+            Enrollment.objects.using(using)
+            .filter(course_id__in=courses, user_id__in=found_users)
+            .values_list('course_id', 'user_id')
+        )
+        added = {course_id: set() for course_id in courses}
+        for course_id in courses:
+            for user_id in found_users:
+                if (course_id, user_id) not in existing:
+                    added[course_id].add(user_id)
+
+        rows = (
+            Enrollment(course_id=course_id, user_id=user_id)
+            for course_id, users in added.items()
+            for user_id in users
+        )
+        for chunk in _chunks(rows, chunk_size):
+            # Конфликты возможны только при параллельной записи тех же пар
+            Enrollment.objects.using(using).bulk_create(chunk, ignore_conflicts=True)
+
+        # Один сигнал на курс, как при course.students.add(*users)
+        for course_id, users in added.items():
+            if users:
+                transaction.on_commit(
+                    lambda course=courses[course_id], users=users: m2m_changed.send(
+                        sender=Enrollment,
+                        instance=course,
+                        action='post_add',
+                        reverse=False,
+                        model=User,
+                        pk_set=users,
+                        using=using,
+                    ),
+                    using=using,
+                )
+
+    created = sum(len(users) for users in added.values())
+    return {
+        'requested': len(user_ids) * len(course_ids),
+        'created': created,
+        'existing': len(existing),
+        'missing_users': sorted(user_ids - found_users),
+        'missing_courses': sorted(course_ids - set(courses)),
+    }
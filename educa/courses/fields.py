@@ -1,13 +1,25 @@
 # Импортируем необходимые библиотеки для работы с базой данных.
 # Для исключения объекта, если он не существует в базе данных.
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import models  # Для работы с моделями и полями.
+# Для работы с моделями, соединениями и маршрутизацией запросов.
+from django.db import connections, models, router
+# Для построения выражений, вычисляемых на стороне базы данных.
+from django.db.models import Max, Q, Subquery, Value
+from django.db.models.functions import Coalesce
 
 
 class OrderField(models.PositiveIntegerField):
     """
     Класс для создания полей заказа.
 
+    Следующий порядковый номер вычисляется прямо в запросе INSERT подзапросом,
+    а значение возвращается базой данных через RETURNING, поэтому вставка
+    занимает один запрос. Внутри транзакции строки родительских объектов
+    (for_fields) блокируются, чтобы параллельные вставки не получили
+    одинаковый номер (сохранение выполняется в транзакции, см.
+    OrderedModelMixin), а уникальное ограничение на область и номер
+    не допускает повторов.
+
     Поля:
         for_fields (list): Список полей для определения последнего порядкового номера.
     """
@@ -23,6 +35,110 @@ class OrderField(models.PositiveIntegerField):
         # Вызов метода инициализации родительского класса.
         super().__init__(*args, **kwargs)
 
+    @property
+    def db_returning(self):
+        """
+        Возвращать значение поля после INSERT, если база данных это поддерживает.
+        """
+        return connections[router.db_for_write(self.model)].features.can_return_columns_from_insert
+
+    def _scope(self, model_instance):
+        """
+        Возвращает словарь фильтрации по полям for_fields.
+
+        Для внешних ключей используется attname (например, course_id),
+        чтобы не загружать связанный объект.
+        """
+        scope = {}
+        for name in self.for_fields or []:
+            attname = self.model._meta.get_field(name).attname
+            scope[attname] = getattr(model_instance, attname)
+        return scope
+
+    def _lock_scope(self, scopes, using):
+        """
+        Блокирует строки родительских объектов для переданных областей нумерации.
+
+        Блокировка действует до конца транзакции, которую открывают
+        OrderedModelMixin.save и OrderedQuerySet.bulk_create, на базах
+        данных, поддерживающих SELECT ... FOR UPDATE.
+        """
+        connection = connections[using]
+        if not (connection.in_atomic_block and connection.features.has_select_for_update):
+            return
+        for name in self.for_fields or []:
+            field = self.model._meta.get_field(name)
+            if not field.is_relation:
+                continue
+            pks = {scope[field.attname] for scope in scopes}
+            # Выполнение запроса с блокировкой строк до конца транзакции.
+            list(
+                field.related_model._base_manager.using(using)
+                .select_for_update()
+                .filter(pk__in=pks)
+                .values_list('pk', flat=True)
+            )
+
+    def next_order_expression(self, model_instance):
+        """
+        Возвращает выражение, вычисляющее следующий порядковый номер в базе данных.
+
+        Возвращает:
+            Expression: COALESCE((SELECT order ... ORDER BY order DESC LIMIT 1) + 1, 0).
+        """
+        last = (
+            self.model._base_manager.filter(**self._scope(model_instance))
+            .order_by(f'-{self.attname}')
+            .values(self.attname)[:1]
+        )
+        return Coalesce(
+            Subquery(last) + Value(1),
+            Value(0),
+            output_field=models.PositiveIntegerField(),
+        )
+
+    def allocate(self, objs, using):
+        """
+        Назначает непрерывные порядковые номера пакету объектов перед bulk_create.
+
+        Последние номера всех затронутых областей читаются одним запросом.
+
+        Параметры:
+            objs (list): Объекты модели, ещё не сохранённые в базе данных.
+            using (str): Псевдоним базы данных.
+        """
+        pending = [obj for obj in objs if getattr(obj, self.attname) is None]
+        if not pending:
+            return
+        # Группировка объектов по области нумерации.
+        groups = {}
+        for obj in pending:
+            scope = self._scope(obj)
+            groups.setdefault(tuple(scope.items()), []).append(obj)
+        scopes = [dict(key) for key in groups]
+        self._lock_scope(scopes, using)
+
+        attnames = list(scopes[0])
+        condition = Q()
+        for scope in scopes:
+            condition |= Q(**scope)
+        rows = (
+            self.model._base_manager.using(using)
+            .filter(condition)
+            .order_by()
+            .values(*attnames)
+            .annotate(last=Max(self.attname))
+        )
+        last = {tuple((a, row[a]) for a in attnames): row['last'] for row in rows}
+
+        # Назначение номеров по порядку следования объектов в пакете.
+        for key, group in groups.items():
+            value = last.get(key)
+            value = 0 if value is None else value + 1
+            for obj in group:
+                setattr(obj, self.attname, value)
+                value += 1
+
     def pre_save(self, model_instance, add):
         """
         Метод для определения последнего порядкового номера перед сохранением модели.
@@ -33,18 +149,20 @@ class OrderField(models.PositiveIntegerField):
             self.for_fields (list): Список полей для определения последнего порядкового номера.
 
         Возвращает:
-            int: Последний порядковый номер + 1, если он существует. Иначе 0.
+            Expression | int: Выражение для вычисления номера в INSERT, либо
+            последний порядковый номер + 1, если он существует. Иначе 0.
         """
         if getattr(model_instance, self.attname) is None:
+            using = router.db_for_write(self.model, instance=model_instance)
+            self._lock_scope([self._scope(model_instance)], using)
+            if add and self.db_returning:
+                # Номер вычисляется в самом INSERT и возвращается через RETURNING.
+                return self.next_order_expression(model_instance)
             try:
-                # Получение всех объектов модели.
-                qs = self.model.objects.all()
-                if self.for_fields:
-                    query = {
-                        field: getattr(model_instance, field)
-                        for field in self.for_fields
-                    }  # Создание словаря для фильтрации по полям.
-                    qs = qs.filter(**query)  # Фильтрация объектов по полям.
+                # Получение объектов модели в области нумерации.
+                qs = self.model._base_manager.using(using).filter(
+                    **self._scope(model_instance)
+                )
                 # Получение последнего объекта в сортировке по полю.
                 last_item = qs.latest(self.attname)
                 # Подсчет последнего порядкового номера + 1.
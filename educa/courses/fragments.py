@@ -0,0 +1,90 @@
+"""
+Хранилище отрендеренных фрагментов содержимого.
+
+HTML каждого элемента (Text, File, Image, Video) хранится в кэше под ключом,
+содержащим модель, pk и время последнего обновления элемента. Любое
+изменение элемента меняет ключ, поэтому устаревший HTML не отдается,
+а показ содержимого модуля сводится к чтению из кэша.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+
+
+def fragment_key(item):
+    """
+    Возвращает ключ кэша для отрендеренного элемента.
+
+    :param item: Экземпляр модели, унаследованной от ItemBase.
+    :return: Строка ключа.
+    """
+    return (
+        f'fragment:{item._meta.model_name}:{item.pk}:'
+        f'{item.updated.timestamp()}'
+    )
+
+
+def store_fragment(item):
+    """
+    Рендерит элемент и сохраняет HTML в хранилище.
+
+    :param item: Экземпляр модели, унаследованной от ItemBase.
+    :return: Отрендеренный HTML.
+    """
+    html = item.render_template()
+    cache.set(fragment_key(item), str(html), settings.FRAGMENT_CACHE_TIMEOUT)
+    item._rendered_fragment = mark_safe(html)
+    return item._rendered_fragment
+
+
+def get_fragment(item):
+    """
+    Возвращает HTML элемента из хранилища, рендеря его при промахе.
+
+    :param item: Экземпляр модели, унаследованной от ItemBase.
+    :return: Отрендеренный HTML.
+    """
+    rendered = getattr(item, '_rendered_fragment', None)
+    if rendered is not None:
+        return rendered
+    html = cache.get(fragment_key(item))
+    if html is None:
+        return store_fragment(item)
+    item._rendered_fragment = mark_safe(html)
+    return item._rendered_fragment
+
+
+def preload_fragments(items):
+    """
+    Загружает HTML для набора элементов одним обращением к кэшу.
+
+    Отсутствующие фрагменты рендерятся и сохраняются одним пакетом.
+
+    :param items: Итерируемый набор элементов (None пропускаются).
+    """
+    items = [
+        item for item in items
+        if item is not None and getattr(item, '_rendered_fragment', None) is None
+    ]
+    if not items:
+        return
+    keys = {fragment_key(item): item for item in items}
+    found = cache.get_many(list(keys))
+    missing = {}
+    for key, item in keys.items():
+        html = found.get(key)
+        if html is None:
+            html = missing[key] = str(item.render_template())
+        item._rendered_fragment = mark_safe(html)
+    if missing:
+        cache.set_many(missing, settings.FRAGMENT_CACHE_TIMEOUT)
+
+
+def delete_fragment(item):
+    """
+    Удаляет HTML элемента из хранилища.
+
+    :param item: Экземпляр модели, унаследованной от ItemBase.
+    """
+    cache.delete(fragment_key(item))
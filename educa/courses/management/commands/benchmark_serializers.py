@@ -0,0 +1,96 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.utils.encoders import JSONEncoder
+
+from courses.api.serializers import (
+    CourseSerializer,
+    CourseValuesSerializer,
+    SubjectSerializer,
+    SubjectValuesSerializer,
+)
+from courses.models import Course, Subject
+
+
+class Command(BaseCommand):
+    """
+    Команда для сравнения скорости обычных и быстрых сериализаторов API.
+
+    Для страницы курсов и страницы предметов выполняет сериализацию
+    `ModelSerializer` и `ValuesSerializer` указанное число раз, проверяет,
+    что JSON совпадает, и выводит среднее время и количество запросов.
+    """
+    help = 'Сравнивает ModelSerializer и быстрые сериализаторы списков API'
+
+    def add_arguments(self, parser):
+        """
+        Добавляет аргументы командной строки в парсер.
+
+        :param parser: Экземпляр парсера аргументов.
+        """
+        # Количество объектов на странице
+        parser.add_argument('--page-size', dest='page_size', type=int, default=50)
+        # Количество повторов каждого замера
+        parser.add_argument('--repeat', dest='repeat', type=int, default=20)
+
+    def measure(self, serialize, repeat):
+        """
+        Выполняет сериализацию несколько раз.
+
+        :param serialize: Функция без аргументов, возвращающая данные.
+        :param repeat: Количество повторов.
+        :return: Кортеж (данные, среднее время в мс, количество запросов).
+        """
+        with CaptureQueriesContext(connection) as queries:
+            data = serialize()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            serialize()
+        elapsed = (time.perf_counter() - started) / repeat * 1000
+        return data, elapsed, len(queries)
+
+    def compare(self, label, model_serialize, values_serialize, repeat):
+        """
+        Сравнивает два способа сериализации и выводит результат.
+        """
+        model_data, model_ms, model_queries = self.measure(model_serialize, repeat)
+        values_data, values_ms, values_queries = self.measure(values_serialize, repeat)
+        # Сравнение итогового JSON, как его отдаст JSONRenderer
+        if json.dumps(model_data, cls=JSONEncoder) != json.dumps(values_data, cls=JSONEncoder):
+            raise CommandError(f'{label}: вывод сериализаторов различается')
+        speedup = model_ms / values_ms if values_ms else 0
+        self.stdout.write(
+            f'{label}: ModelSerializer {model_ms:.2f} мс ({model_queries} запросов), '
+            f'ValuesSerializer {values_ms:.2f} мс ({values_queries} запросов), '
+            f'ускорение x{speedup:.1f}'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Основной метод, выполняемый при вызове команды.
+        """
+        size = options['page_size']
+        repeat = options['repeat']
+
+        courses = Course.objects.prefetch_related('modules')
+        self.compare(
+            'Курсы',
+            lambda: CourseSerializer(courses.all()[:size], many=True).data,
+            lambda: CourseValuesSerializer(
+                CourseValuesSerializer.values(courses.all())[:size], many=True
+            ).data,
+            repeat,
+        )
+
+        subjects = Subject.objects.all()
+        self.compare(
+            'Предметы',
+            lambda: SubjectSerializer(subjects.all()[:size], many=True).data,
+            lambda: SubjectValuesSerializer(
+                SubjectValuesSerializer.values(subjects.all())[:size], many=True
+            ).data,
+            repeat,
+        )
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.counters import COUNTERS, find_mismatches, recompute
+
+
+class Command(BaseCommand):
+    """
+    Команда для проверки и пересчета денормализованных счетчиков.
+
+    Сравнивает `Course.total_modules`, `Course.total_students` и
+    `Subject.total_courses` с фактическими данными и исправляет расхождения.
+    С аргументом `--verify` только выводит расхождения и завершается
+    с ошибкой, если они найдены.
+    """
+    help = 'Проверяет и пересчитывает счетчики модулей, студентов и курсов'
+
+    def add_arguments(self, parser):
+        """
+        Добавляет аргументы командной строки в парсер.
+
+        :param parser: Экземпляр парсера аргументов.
+        """
+        # Только проверить счетчики, не изменяя данные
+        parser.add_argument('--verify', dest='verify', action='store_true')
+
+    def handle(self, *args, **options):
+        """
+        Основной метод, выполняемый при вызове команды.
+        """
+        mismatches = find_mismatches()
+        for model, field, pk, stored, actual in mismatches[:50]:
+            self.stdout.write(f'{model.__name__}#{pk}.{field}: {stored} != {actual}')
+
+        if options['verify']:
+            if mismatches:
+                raise CommandError(f'Найдено расхождений: {len(mismatches)}')
+            self.stdout.write('Счетчики совпадают с данными')
+            return
+
+        # Пересчитываем только объекты с расхождениями
+        for model, field, _, _ in COUNTERS:
+            pks = [pk for m, f, pk, _, _ in mismatches if m is model and f == field]
+            if pks:
+                recompute(model, field, pks)
+        self.stdout.write(f'Исправлено расхождений: {len(mismatches)}')
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+
+from courses.fragments import preload_fragments
+from courses.models import Content
+
+
+class Command(BaseCommand):
+    """
+    Команда для прогрева хранилища отрендеренных фрагментов содержимого.
+
+    Рендерит элементы (Text, File, Image, Video) всех курсов и сохраняет
+    HTML в кэш пакетами. Уже закэшированные фрагменты не перерисовываются.
+    Необязательный аргумент `--course` ограничивает прогрев одним курсом.
+    """
+    help = 'Прогревает кэш отрендеренных фрагментов содержимого для всех курсов'
+
+    def add_arguments(self, parser):
+        """
+        Добавляет аргументы командной строки в парсер.
+
+        :param parser: Экземпляр парсера аргументов.
+        """
+        # Идентификатор курса для прогрева (по умолчанию все курсы)
+        parser.add_argument('--course', dest='course', type=int)
+        # Размер пакета содержимого, обрабатываемого за один проход
+        parser.add_argument('--chunk-size', dest='chunk_size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        """
+        Основной метод, выполняемый при вызове команды.
+
+        Обходит содержимое модулей пакетами и сохраняет фрагменты элементов.
+        """
+        contents = Content.objects.with_items().order_by('pk')
+        if options['course']:
+            contents = contents.filter(module__course_id=options['course'])
+
+        total = 0
+        batch = []
+        for content in contents.iterator(chunk_size=options['chunk_size']):
+            batch.append(content.item)
+            if len(batch) >= options['chunk_size']:
+                # Одно обращение к кэшу на пакет элементов
+                preload_fragments(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            preload_fragments(batch)
+            total += len(batch)
+
+        # Выводим сообщение о количестве обработанных элементов
+        self.stdout.write(f'Обработано {total} элементов содержимого')
@@ -0,0 +1,168 @@
+"""
+Модуль с наборами запросов (QuerySet) и менеджерами моделей курсов.
+"""
+
+from collections import Counter
+
+from django.db import models, transaction
+from django.db.models.functions import RowNumber
+
+from .fields import OrderField
+
+
+class OrderedQuerySet(models.QuerySet):
+    """
+    QuerySet для моделей с полем OrderField.
+
+    При массовом создании объектов порядковые номера назначаются
+    непрерывным блоком для каждой области нумерации (например, курса),
+    а не отдельным запросом на каждую строку.
+
+    bulk_create не отправляет сигналов post_save, поэтому счетчики
+    и версии кэша обновляются в `after_bulk_create` той же транзакцией.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """
+        Создает объекты одним пакетом, предварительно назначив порядковые номера.
+
+        :param objs: Итерируемый набор объектов модели.
+        :return: Список созданных объектов.
+        """
+        objs = list(objs)
+        order_fields = [
+            field for field in self.model._meta.concrete_fields
+            if isinstance(field, OrderField)
+        ]
+        # Назначение номеров и вставка выполняются в одной транзакции,
+        # чтобы блокировка области нумерации действовала до конца вставки.
+        with transaction.atomic(using=self.db, savepoint=False):
+            for field in order_fields:
+                field.allocate(objs, using=self.db)
+            created = super().bulk_create(objs, *args, **kwargs)
+            # При ignore_conflicts и update_conflicts неизвестно, какие строки вставлены
+            exact = not (kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts'))
+            self.after_bulk_create(created, exact=exact)
+            return created
+
+    def after_bulk_create(self, objs, exact=True):
+        """
+        Обновляет счетчики и кэши после массового создания объектов.
+
+        :param objs: Созданные объекты.
+        :param exact: Все объекты вставлены (без ignore_conflicts), поэтому
+            счетчики можно увеличить, а не пересчитывать.
+        """
+
+
+class ContentQuerySet(OrderedQuerySet):
+    """
+    QuerySet для модели Content.
+    """
+
+    def after_bulk_create(self, objs, exact=True):
+        # Импорт внутри метода: модуль кэша импортирует модели
+        from .cache import bump_module_version, touch_course_content
+
+        module_ids = {obj.module_id for obj in objs}
+        if not module_ids:
+            return
+        module_model = self.model._meta.get_field('module').related_model
+        course_ids = (
+            module_model.objects.using(self.db)
+            .filter(pk__in=module_ids)
+            .values_list('course_id', flat=True)
+            .distinct()
+        )
+        bump_module_version(*module_ids)
+        touch_course_content(*course_ids)
+
+    def with_items(self):
+        """
+        Предварительно загружает связанные элементы (Text, File, Image, Video).
+
+        Элементы группируются по content_type, и каждая конкретная модель
+        загружается одним запросом вместо запроса на каждую строку.
+
+        :return: QuerySet с предварительной загрузкой элементов.
+        """
+        return self.prefetch_related('item')
+
+
+class ModuleQuerySet(OrderedQuerySet):
+    """
+    QuerySet для модели Module.
+    """
+
+    def after_bulk_create(self, objs, exact=True):
+        # Импорт внутри метода: модули кэша и счетчиков импортируют модели
+        from .cache import (
+            bump_catalog_version,
+            bump_student_courses_version,
+            touch_course_content,
+        )
+        from .counters import increment, recompute
+
+        course_model = self.model._meta.get_field('course').related_model
+        per_course = Counter(obj.course_id for obj in objs)
+        if not per_course:
+            return
+        if exact:
+            for course_id, count in per_course.items():
+                increment(course_model, 'total_modules', course_id, count)
+        else:
+            recompute(course_model, 'total_modules', list(per_course))
+        touch_course_content(*per_course)
+        # Каталог и списки курсов студентов показывают количество модулей
+        transaction.on_commit(bump_catalog_version, using=self.db)
+        transaction.on_commit(bump_student_courses_version, using=self.db)
+
+    def with_contents(self):
+        """
+        Предварительно загружает содержимое модулей вместе с элементами.
+
+        :return: QuerySet с предварительной загрузкой содержимого.
+        """
+        content_model = self.model._meta.get_field('contents').related_model
+        return self.prefetch_related(
+            models.Prefetch(
+                'contents', queryset=content_model.objects.with_items()
+            )
+        )
+
+
+class CourseQuerySet(models.QuerySet):
+    """
+    QuerySet для модели Course.
+    """
+
+    def popular_by_subject(self, subject_ids, limit=3):
+        """
+        Возвращает самые популярные курсы для набора предметов одним запросом.
+
+        Курсы ранжируются оконной функцией ROW_NUMBER() в пределах предмета
+        по счетчику студентов (без соединения с таблицей студентов).
+
+        :param subject_ids: Идентификаторы предметов.
+        :param limit: Количество курсов на предмет.
+        :return: Словарь {subject_id: [курсы]}.
+        """
+        ranked = (
+            self.filter(subject_id__in=subject_ids)
+            .annotate(
+                rank=models.Window(
+                    RowNumber(),
+                    partition_by=models.F('subject_id'),
+                    order_by=[
+                        models.F('total_students').desc(),
+                        models.F('created').desc(),
+                    ],
+                ),
+            )
+            .filter(rank__lte=limit)
+            .order_by('subject_id', 'rank')
+        )
+        result = {subject_id: [] for subject_id in subject_ids}
+        for course in ranked:
+            result[course.subject_id].append(course)
+        return result
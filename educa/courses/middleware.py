@@ -1,10 +1,10 @@
 # Импортируем необходимые библиотеки.
-# Для работы с объектами и перенаправлением страницы.
-from django.shortcuts import get_object_or_404, redirect
-from django.urls import reverse  # Для создания обратной ссылки.
+# Для ответа 404 и перенаправления страницы.
+from django.http import Http404
+from django.shortcuts import redirect
 
-# Импортируем модель курса из файла models.py.
-from .models import Course  # Модель курса.
+# Импортируем кэшированное разрешение поддомена курса из файла cache.py.
+from .cache import resolve_course_url
 
 
 # Функция-мидлвар для определения поддомена и перенаправления на страницу курса.
@@ -12,6 +12,9 @@ def subdomain_course_middleware(get_response):
     """
     Функция-мидлвар для определения поддомена и перенаправления на страницу курса.
 
+    Соответствие поддомена и URL курса берется из кэша (локального и общего),
+    поэтому перенаправления обрабатываются без обращения к базе данных.
+
     :param get_response: Функция, возвращающая HTTP-ответ.
     :return: Middleware функция.
     """
@@ -20,29 +23,20 @@ def subdomain_course_middleware(get_response):
     def middleware(request):
         host_parts = request.get_host().split('.')
 
-        # Если поддомен не равен 'www', то берем первый элемент как ID курса и получаем объект курса из базы данных.
-        if len(host_parts) > 2 and host_parts[0] != 'www':
-            course = get_object_or_404(Course, slug=host_parts[0])
-
-            # Создаем обратную ссылку на страницу курса.
-            course_url = reverse('course_detail', args=[course.slug])
-
-            # Создаем URL с поддоменом и перенаправляем на страницу курса.
-            url = '{}://{}{}'.format(
-                request.scheme, '.'.join(host_parts[1:]), course_url
-            )
-            return redirect(url)
-
-        # Если поддомен равен 'www', то берем вторые элемент как ID курса и получаем объект курса из базы данных.
-        elif len(host_parts) > 2 and host_parts[0] == 'www':
-            course = get_object_or_404(Course, slug=host_parts[1])
+        if len(host_parts) > 2:
+            # Если поддомен не равен 'www', то берем первый элемент как слаг курса,
+            # иначе берем второй элемент.
+            offset = 1 if host_parts[0] == 'www' else 0
+            slug = host_parts[offset]
 
-            # Создаем обратную ссылку на страницу курса.
-            course_url = reverse('course_detail', args=[course.slug])
+            # Получаем путь к странице курса из кэша.
+            course_url = resolve_course_url(slug)
+            if course_url is None:
+                raise Http404('No Course matches the given query.')
 
             # Создаем URL с поддоменом и перенаправляем на страницу курса.
             url = '{}://{}{}'.format(
-                request.scheme, '.'.join(host_parts[2:]), course_url
+                request.scheme, '.'.join(host_parts[offset + 1:]), course_url
             )
             return redirect(url)
 
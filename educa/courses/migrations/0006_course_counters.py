@@ -0,0 +1,62 @@
+# Generated by Django 5.0.14 on 2026-10-18 14:00
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+def fill_counters(apps, schema_editor):
+    """
+    Заполняет счетчики по существующим данным.
+    """
+    Course = apps.get_model('courses', 'Course')
+    Module = apps.get_model('courses', 'Module')
+    Subject = apps.get_model('courses', 'Subject')
+    Course.objects.update(
+        total_modules=_count(Module, 'course'),
+        total_students=_count(Course.students.through, 'course'),
+    )
+    Subject.objects.update(total_courses=_count(Course, 'subject'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_course_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='total_modules',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='total_students',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='total_courses',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['subject', '-total_students', '-created'], name='course_subject_popular_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 5.0.14 on 2026-10-18 01:54
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Триггер заполняет вектор при вставке и при изменении названия или описания;
+# название весит больше описания. Изменения счетчиков триггер не затрагивают.
+CREATE_SQL = """
+CREATE FUNCTION courses_course_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('russian', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(NEW.overview, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER courses_course_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, overview, search_vector ON courses_course
+    FOR EACH ROW EXECUTE FUNCTION courses_course_search_vector_update();
+"""
+
+# Заполнение векторов одного диапазона id (вектор вычисляет триггер)
+BACKFILL_SQL = """
+UPDATE courses_course SET search_vector = NULL
+WHERE id > %s AND id <= %s AND search_vector IS NULL;
+"""
+
+# Индекс строится без блокировки записи в таблицу
+CREATE_INDEX_SQL = (
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS courses_course_search_idx '
+    'ON courses_course USING gin (search_vector);'
+)
+
+DROP_INDEX_SQL = 'DROP INDEX CONCURRENTLY IF EXISTS courses_course_search_idx;'
+
+DROP_SQL = """
+DROP TRIGGER IF EXISTS courses_course_search_vector_trigger ON courses_course;
+DROP FUNCTION IF EXISTS courses_course_search_vector_update();
+"""
+
+# Количество строк, обновляемых одной транзакцией при заполнении векторов
+BACKFILL_BATCH_SIZE = 5000
+
+
+def create_search_trigger(apps, schema_editor):
+    """
+    Создает триггер (только PostgreSQL): новые курсы получают вектор сразу.
+    """
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_SQL)
+
+
+def backfill_search_vectors(apps, schema_editor):
+    """
+    Заполняет векторы существующих курсов пакетами по диапазонам id;
+    миграция не атомарна, каждый пакет фиксируется отдельно.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT min(id), max(id) FROM courses_course')
+        low, high = cursor.fetchone()
+        if low is None:
+            return
+        for start in range(low - 1, high, BACKFILL_BATCH_SIZE):
+            cursor.execute(BACKFILL_SQL, [start, start + BACKFILL_BATCH_SIZE])
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Создает GIN-индекс без блокировки записи (CREATE INDEX CONCURRENTLY).
+    """
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_INDEX_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_INDEX_SQL)
+
+
+def drop_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_SQL)
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY и пакетное заполнение выполняются вне общей транзакции
+    atomic = False
+
+    dependencies = [
+        ('courses', '0006_course_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_trigger, drop_search_trigger),
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.0.14 on 2026-10-18 02:04
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def _renumber(model, scope_field):
+    # Области нумерации, в которых параллельные вставки выдали одинаковые номера
+    scopes = (
+        model.objects.values(scope_field, 'order')
+        .annotate(total=Count('pk'))
+        .filter(total__gt=1)
+        .values_list(scope_field, flat=True)
+        .distinct()
+    )
+    for scope in list(scopes):
+        pks = model.objects.filter(**{scope_field: scope}).order_by('order', 'pk')
+        for order, pk in enumerate(pks.values_list('pk', flat=True)):
+            model.objects.filter(pk=pk).update(order=order)
+
+
+def renumber_duplicates(apps, schema_editor):
+    """
+    Перенумеровывает области с повторяющимися номерами перед созданием ограничений.
+    """
+    _renumber(apps.get_model('courses', 'Module'), 'course')
+    _renumber(apps.get_model('courses', 'Content'), 'module')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('courses', '0007_course_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(renumber_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='content',
+            constraint=models.UniqueConstraint(fields=('module', 'order'), name='content_module_order_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='module',
+            constraint=models.UniqueConstraint(fields=('course', 'order'), name='module_course_order_uniq'),
+        ),
+    ]
@@ -3,19 +3,72 @@ from django.contrib.auth.models import User  # Импортируем модел
 from django.contrib.contenttypes.fields import GenericForeignKey
 # Используем ContentType для определения модели контента
 from django.contrib.contenttypes.models import ContentType
+# Используем tsvector-поле для полнотекстового поиска (PostgreSQL)
+from django.contrib.postgres.search import SearchVectorField
 # Используем стандартные функции Django для работы с базой данных
-from django.db import models
+from django.db import models, router, transaction
 # Используем функцию render_to_string из template-loader для рендеринга шаблонов
 from django.template.loader import render_to_string
 
 # Импортируем поле OrderField из файла fields.py, которое определяет порядок элемента в модели
 from .fields import OrderField
+# Импортируем хранилище отрендеренных фрагментов содержимого
+from .fragments import get_fragment
+# Импортируем QuerySet'ы с пакетной нумерацией и предзагрузкой содержимого
+from .managers import ContentQuerySet, CourseQuerySet, ModuleQuerySet
+
+
+class CounterFieldsMixin:
+    """
+    Миксин для моделей с денормализованными счетчиками.
+
+    Счетчики изменяются только выражениями F() и пересчетом (см. counters.py),
+    поэтому обычное сохранение существующего объекта их не перезаписывает.
+    """
+    counter_fields = ()  # Имена полей-счетчиков
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
+
+class OrderedModelMixin:
+    """
+    Миксин для моделей с полем OrderField.
+
+    Назначение порядкового номера и INSERT выполняются в одной транзакции,
+    поэтому блокировка области нумерации (см. OrderField) действует
+    и при сохранении вне transaction.atomic.
+    """
+
+    def save(self, *args, **kwargs):
+        pending = any(
+            getattr(self, field.attname) is None
+            for field in self._meta.concrete_fields
+            if isinstance(field, OrderField)
+        )
+        if not pending:
+            return super().save(*args, **kwargs)
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            return super().save(*args, **kwargs)
 
 
-class Subject(models.Model):  # Класс для хранения информации о предметах
+class Subject(CounterFieldsMixin, models.Model):  # Класс для хранения информации о предметах
     title = models.CharField(max_length=200)  # Поле для названия предмета
     # Поле для слага предмета
     slug = models.SlugField(max_length=200, unique=True)
+    # Количество курсов по предмету (поддерживается сигналами)
+    total_courses = models.PositiveIntegerField(default=0, editable=False)
+
+    counter_fields = ('total_courses',)
 
     class Meta:  # Метакласс для настройки поведения модели
         ordering = ['title']  # Порядок вывода предметов в списке
@@ -24,7 +77,7 @@ class Subject(models.Model):  # Класс для хранения информ
         return self.title
 
 
-class Course(models.Model):  # Класс для хранения информации о курсах
+class Course(CounterFieldsMixin, models.Model):  # Класс для хранения информации о курсах
     owner = models.ForeignKey(  # Поле для связки с владельцем курса
         User, related_name='courses_created', on_delete=models.CASCADE
     )  # Владелец курса
@@ -35,18 +88,37 @@ class Course(models.Model):  # Класс для хранения информа
     slug = models.SlugField(max_length=200, unique=True)  # Слаг курса
     overview = models.TextField()  # Описание курса
     created = models.DateTimeField(auto_now_add=True)  # Дата создания курса
+    # Дата последнего изменения курса, его модулей, содержимого или элементов
+    updated = models.DateTimeField(auto_now=True)
     students = models.ManyToManyField(  # Поле для связи с участвующими студентами
         User, related_name='courses_joined', blank=True
     )  # Участвующие студенты
+    # Количество модулей и студентов курса (поддерживаются сигналами)
+    total_modules = models.PositiveIntegerField(default=0, editable=False)
+    total_students = models.PositiveIntegerField(default=0, editable=False)
+    # Поисковый вектор названия и описания (заполняется триггером PostgreSQL,
+    # GIN-индекс создается миграцией; см. courses/search.py)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    counter_fields = ('total_modules', 'total_students')
+
+    objects = CourseQuerySet.as_manager()  # Менеджер с выборкой популярных курсов
 
     class Meta:  # Метакласс для настройки поведения модели
         ordering = ['-created']  # Порядок вывода курсов по дате создания
+        indexes = [
+            # Выборка популярных курсов предмета без сортировки всей таблицы
+            models.Index(
+                fields=['subject', '-total_students', '-created'],
+                name='course_subject_popular_idx',
+            ),
+        ]
 
     def __str__(self):  # Функция для возвращения строки с названием курса
         return self.title
 
 
-class Module(models.Model):  # Класс для хранения информации о модулях курса
+class Module(OrderedModelMixin, models.Model):  # Класс для хранения информации о модулях курса
     course = models.ForeignKey(  # Поле для связи с курсом, которому принадлежит модуль
         Course, related_name='modules', on_delete=models.CASCADE
     )  # Курс, которому принадлежит модуль
@@ -55,24 +127,44 @@ class Module(models.Model):  # Класс для хранения информа
     # Порядок вывода модулей
     order = OrderField(blank=True, for_fields=['course'])
 
+    objects = ModuleQuerySet.as_manager()  # Менеджер с пакетной нумерацией
+
     class Meta:  # Метакласс для настройки поведения модели
         ordering = ['order']  # Порядок вывода модулей по порядку
+        constraints = [
+            # Один порядковый номер на модуль в пределах курса
+            models.UniqueConstraint(fields=['course', 'order'], name='module_course_order_uniq'),
+        ]
 
     def __str__(self):  # Функция для возвращения строки с названием модуля и порядковым номером
         return f"{self.title} (#{self.order})"
 
 
-class Content(models.Model):  # Класс для хранения информации о контенте модулей курса
+class Content(OrderedModelMixin, models.Model):  # Класс для хранения информации о контенте модулей курса
+    module = models.ForeignKey(  # Поле для связи с модулем, которому принадлежит контент
+        Module, related_name='contents', on_delete=models.CASCADE
+    )  # Модуль, которому принадлежит контент
     content_type = models.ForeignKey(  # Поле для связи с типом контента
-        ContentType, on_delete=models.CASCADE
+        ContentType,
+        on_delete=models.CASCADE,
+        limit_choices_to={'model__in': ('text', 'video', 'image', 'file')},
     )  # Тип контента
     # ID объекта, которому принадлежит контент
     object_id = models.PositiveIntegerField()
     # Контент, связанный с определенным типом и ID объекта
     item = GenericForeignKey('content_type', 'object_id')
+    # Порядок вывода контента внутри модуля
+    order = OrderField(blank=True, for_fields=['module'])
+
+    # Менеджер с пакетной нумерацией и предзагрузкой элементов
+    objects = ContentQuerySet.as_manager()
 
     class Meta:  # Метакласс для настройки поведения модели
         ordering = ['order']  # Порядок вывода контента по порядку
+        constraints = [
+            # Один порядковый номер на элемент в пределах модуля
+            models.UniqueConstraint(fields=['module', 'order'], name='content_module_order_uniq'),
+        ]
 
 
 # Базовый класс для хранения информации об элементах, связанных с определенным типом контента
@@ -91,7 +183,10 @@ class ItemBase(models.Model):
     def __str__(self):  # Функция для возвращения строки с названием элемента
         return self.title
 
-    def render(self):  # Функция для рендеринга шаблона элемента
+    def render(self):  # Функция для получения отрендеренного элемента из хранилища фрагментов
+        return get_fragment(self)
+
+    def render_template(self):  # Функция для рендеринга шаблона элемента
         return render_to_string(  # Используем функцию render_to_string из template-loader
             # Шаблон элемента, который нужно подставить в контент
             f'courses/content/{self._meta.model_name}.html',
@@ -0,0 +1,76 @@
+"""
+Модуль полнотекстового поиска по курсам и сообщениям чата.
+
+В PostgreSQL у моделей есть столбец `search_vector` (tsvector) с
+GIN-индексом; столбец заполняется триггерами базы данных (см. миграции),
+поэтому он актуален и при `bulk_create`/`update()`. Поиск выполняется по
+индексу и ранжируется `ts_rank`. В других СУБД (SQLite при разработке)
+используется поиск `icontains` по полям с простым ранжированием.
+"""
+
+from django.contrib.admin.views.main import ORDER_VAR
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import Case, F, FloatField, Q, Value, When
+
+# Конфигурация текстового поиска PostgreSQL (используется и в триггерах)
+SEARCH_CONFIG = 'russian'
+
+
+def is_supported(queryset):
+    """
+    Проверяет, поддерживает ли база данных запроса полнотекстовый поиск.
+    """
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def search(queryset, query, fields):
+    """
+    Фильтрует запрос по поисковой строке и сортирует по релевантности.
+
+    :param queryset: Запрос модели со столбцом `search_vector`.
+    :param query: Поисковая строка (синтаксис websearch: "фраза", -слово, or).
+    :param fields: Поля для поиска без полнотекстового индекса,
+        в порядке убывания важности.
+    :return: Запрос с аннотацией `rank`, отсортированный по ней.
+    """
+    if is_supported(queryset):
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+        queryset = queryset.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        )
+    else:
+        # Совпадение в более важном поле дает больший вес
+        weights = [
+            Case(
+                When(**{f'{field}__icontains': query}, then=Value(float(len(fields) - i))),
+                default=Value(0.0),
+                output_field=FloatField(),
+            )
+            for i, field in enumerate(fields)
+        ]
+        condition = Q()
+        for field in fields:
+            condition |= Q(**{f'{field}__icontains': query})
+        queryset = queryset.filter(condition).annotate(rank=sum(weights[1:], weights[0]))
+    return queryset.order_by('-rank', '-pk')
+
+
+class FullTextSearchAdminMixin:
+    """
+    Примесь для админки: поиск по `search_vector` вместо `ILIKE` по полям.
+
+    Результаты сортируются по релевантности, если пользователь не выбрал
+    сортировку по столбцу. Поля `search_fields` используются без
+    полнотекстового индекса и для отображения строки поиска.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return super().get_search_results(request, queryset, search_term)
+        results = search(queryset, search_term, self.search_fields)
+        if ORDER_VAR in request.GET:
+            # Сортировка, выбранная в заголовке таблицы, важнее релевантности
+            results = results.order_by(*queryset.query.order_by)
+        return results, False
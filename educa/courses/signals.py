@@ -0,0 +1,316 @@
+"""
+Обработчики сигналов приложения «Курсы».
+
+Поддерживают согласованность кэшей и денормализованных счетчиков
+при изменении моделей. Версии содержимого сдвигаются после фиксации
+транзакции (`transaction.on_commit`): иначе параллельный запрос может
+прочитать прежние строки и закэшировать их под новой версией.
+"""
+
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import F, QuerySet
+from django.dispatch import receiver
+
+from .cache import (
+    bump_catalog_version,
+    bump_content_version,
+    bump_module_version,
+    bump_popularity_version,
+    bump_student_courses_version,
+    invalidate_course_url,
+    invalidate_enrollment,
+    touch_course_content,
+)
+from .counters import increment, recompute
+from .fragments import delete_fragment, store_fragment
+from .models import Content, Course, File, Image, Module, Subject, Text, Video
+
+
+# Модели, при каскадном удалении которых удаляются курсы вместе с модулями
+COURSE_PARENTS = (Course, Subject, User)
+# Модели, при каскадном удалении которых удаляется содержимое модулей
+MODULE_PARENTS = (Module,) + COURSE_PARENTS
+
+
+def deleted_with_parent(origin, parents):
+    """
+    Проверяет, удаляется ли объект каскадно вместе с одним из родителей.
+
+    Обработчики строк, удаляемых вместе с родителем, ничего не делают:
+    счетчики и версии обновляются один раз обработчиками удаления родителя.
+
+    :param origin: Объект или QuerySet, с которого началось удаление (None при сохранении).
+    :param parents: Кортеж моделей-родителей.
+    """
+    if origin is None:
+        return False
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(model, parents)
+
+
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def invalidate_catalog(sender, origin=None, **kwargs):
+    """
+    Сбрасывает кэш каталога и списков курсов студентов при изменении
+    предметов, курсов или модулей.
+    """
+    if sender is Module and deleted_with_parent(origin, COURSE_PARENTS):
+        return
+    bump_catalog_version()
+    bump_student_courses_version()
+
+
+@receiver(m2m_changed, sender=Course.students.through)
+def invalidate_popularity_on_enrollment(sender, action, **kwargs):
+    """
+    Сбрасывает популярность курсов при изменении состава студентов курса.
+
+    Поколение каталога не меняется: страницы каталога не зависят от записей.
+    """
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_popularity_version()
+
+
+@receiver(m2m_changed, sender=Course.students.through)
+def invalidate_enrollment_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Сбрасывает кэш записей на курсы для затронутых пользователей.
+
+    При прямом изменении (course.students) затронуты пользователи из pk_set,
+    при обратном (user.courses_joined) — сам пользователь. Для очистки
+    множество студентов запоминается до удаления связей.
+    """
+    if reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_enrollment(instance.pk)
+        return
+    if action == 'pre_clear':
+        instance._cleared_student_ids = list(
+            instance.students.values_list('id', flat=True)
+        )
+    elif action in ('post_add', 'post_remove'):
+        invalidate_enrollment(*pk_set)
+    elif action == 'post_clear':
+        invalidate_enrollment(*getattr(instance, '_cleared_student_ids', []))
+
+
+@receiver(pre_save, sender=Course)
+def remember_course_slug(sender, instance, **kwargs):
+    """
+    Запоминает прежние слаг и предмет курса перед сохранением.
+    """
+    instance._previous_slug = None
+    instance._previous_subject_id = None
+    if instance.pk:
+        previous = (
+            Course.objects.filter(pk=instance.pk)
+            .values_list('slug', 'subject_id')
+            .first()
+        )
+        if previous:
+            instance._previous_slug, instance._previous_subject_id = previous
+
+
+@receiver(post_save, sender=Course)
+def invalidate_course_subdomain(sender, instance, **kwargs):
+    """
+    Сбрасывает кэш поддомена для прежнего и нового слага курса.
+    """
+    previous = getattr(instance, '_previous_slug', None)
+    if previous != instance.slug:
+        invalidate_course_url(previous, instance.slug)
+
+
+@receiver(post_delete, sender=Course)
+def invalidate_deleted_course_subdomain(sender, instance, **kwargs):
+    """
+    Сбрасывает кэш поддомена удаленного курса.
+    """
+    invalidate_course_url(instance.slug)
+
+
+@receiver(post_save, sender=Course)
+def count_saved_course(sender, instance, created, **kwargs):
+    """
+    Обновляет счетчики курсов предметов при создании курса или смене предмета.
+    """
+    previous = getattr(instance, '_previous_subject_id', None)
+    if created:
+        increment(Subject, 'total_courses', instance.subject_id, 1)
+    elif previous is not None and previous != instance.subject_id:
+        increment(Subject, 'total_courses', previous, -1)
+        increment(Subject, 'total_courses', instance.subject_id, 1)
+
+
+@receiver(post_delete, sender=Course)
+def count_deleted_course(sender, instance, **kwargs):
+    """
+    Уменьшает счетчик курсов предмета при удалении курса.
+    """
+    increment(Subject, 'total_courses', instance.subject_id, -1)
+
+
+@receiver(post_save, sender=Module)
+def count_saved_module(sender, instance, created, **kwargs):
+    """
+    Увеличивает счетчик модулей курса при создании модуля.
+    """
+    if created:
+        increment(Course, 'total_modules', instance.course_id, 1)
+
+
+@receiver(post_delete, sender=Module)
+def count_deleted_module(sender, instance, origin=None, **kwargs):
+    """
+    Уменьшает счетчик модулей курса при удалении модуля
+    (кроме удаления вместе с курсом).
+    """
+    if deleted_with_parent(origin, COURSE_PARENTS):
+        return
+    increment(Course, 'total_modules', instance.course_id, -1)
+
+
+@receiver(m2m_changed, sender=Course.students.through)
+def count_students(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Обновляет счетчики студентов курсов при изменении записей.
+
+    При добавлении pk_set содержит только новые связи, поэтому счетчик
+    увеличивается выражением F(). При удалении и очистке счетчик
+    пересчитывается по фактическим данным.
+    """
+    if not reverse:
+        if action == 'post_add':
+            increment(Course, 'total_students', instance.pk, len(pk_set))
+        elif action in ('post_remove', 'post_clear'):
+            recompute(Course, 'total_students', [instance.pk])
+        return
+    if action == 'pre_clear':
+        instance._cleared_course_ids = list(
+            instance.courses_joined.values_list('id', flat=True)
+        )
+    elif action == 'post_add':
+        Course.objects.filter(pk__in=pk_set).update(
+            total_students=F('total_students') + 1
+        )
+    elif action == 'post_remove':
+        recompute(Course, 'total_students', pk_set)
+    elif action == 'post_clear':
+        recompute(Course, 'total_students', getattr(instance, '_cleared_course_ids', []))
+
+
+@receiver(pre_delete, sender=User)
+def remember_user_courses(sender, instance, **kwargs):
+    """
+    Запоминает курсы пользователя перед удалением (связи удаляются без m2m_changed).
+    """
+    instance._enrolled_course_ids = list(
+        instance.courses_joined.values_list('id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=User)
+def count_deleted_user(sender, instance, **kwargs):
+    """
+    Пересчитывает счетчики студентов курсов удаленного пользователя.
+    """
+    course_ids = getattr(instance, '_enrolled_course_ids', None)
+    if course_ids:
+        recompute(Course, 'total_students', course_ids)
+        bump_popularity_version()
+
+
+@receiver(post_save, sender=Text)
+@receiver(post_save, sender=File)
+@receiver(post_save, sender=Image)
+@receiver(post_save, sender=Video)
+def refresh_fragment(sender, instance, **kwargs):
+    """
+    Перерисовывает фрагмент элемента содержимого после сохранения
+    и отмечает изменение содержимого модулей и курсов, в которых используется элемент.
+    """
+    store_fragment(instance)
+    rows = list(
+        Content.objects.filter(
+            content_type=ContentType.objects.get_for_model(sender),
+            object_id=instance.pk,
+        ).values_list('module_id', 'module__course_id')
+    )
+    module_ids = [module_id for module_id, _ in rows]
+    course_ids = [course_id for _, course_id in rows]
+    transaction.on_commit(lambda: bump_module_version(*module_ids))
+    transaction.on_commit(lambda: touch_course_content(*course_ids))
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_course_contents(sender, instance, **kwargs):
+    """
+    Увеличивает версию содержимого курса при изменении самого курса.
+    """
+    # После удаления у экземпляра сбрасывается pk, поэтому он запоминается сразу
+    course_id = instance.pk
+    transaction.on_commit(lambda: bump_content_version(course_id))
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def invalidate_module_contents(sender, instance, origin=None, **kwargs):
+    """
+    Отмечает изменение содержимого курса при изменении модуля
+    (кроме удаления вместе с курсом).
+    """
+    if deleted_with_parent(origin, COURSE_PARENTS):
+        return
+    course_id = instance.course_id
+    transaction.on_commit(lambda: touch_course_content(course_id))
+
+
+@receiver(post_save, sender=Content)
+@receiver(post_delete, sender=Content)
+def invalidate_content(sender, instance, origin=None, **kwargs):
+    """
+    Отмечает изменение содержимого модуля и курса при изменении содержимого модуля.
+
+    При каскадном удалении модуля или курса каждая строка не обрабатывается:
+    содержимое курса отмечается один раз обработчиками удаления модуля или курса.
+    """
+    if deleted_with_parent(origin, MODULE_PARENTS):
+        return
+    module_id = instance.module_id
+    transaction.on_commit(lambda: bump_module_version(module_id))
+    if Content.module.is_cached(instance):
+        # Модуль уже загружен (например, Content.objects.create(module=...))
+        course_id = instance.module.course_id
+    else:
+        course_id = (
+            Module.objects.filter(pk=instance.module_id)
+            .values_list('course_id', flat=True)
+            .first()
+        )
+    transaction.on_commit(lambda: touch_course_content(course_id))
+
+
+@receiver(post_delete, sender=Text)
+@receiver(post_delete, sender=File)
+@receiver(post_delete, sender=Image)
+@receiver(post_delete, sender=Video)
+def drop_fragment(sender, instance, **kwargs):
+    """
+    Удаляет фрагмент удаленного элемента содержимого.
+    """
+    delete_fragment(instance)
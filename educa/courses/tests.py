@@ -1,2 +1,688 @@
+import base64
+import json
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+
+from .api.serializers import (
+    CourseSerializer,
+    CourseValuesSerializer,
+    SubjectSerializer,
+    SubjectValuesSerializer,
+)
+from .cache import (
+    _subdomain_cache,
+    get_catalog_version,
+    get_content_version,
+    get_enrolled_course_ids,
+    get_module_version,
+    get_popularity_version,
+    is_enrolled,
+)
+from .counters import find_mismatches
+from .enrollment import bulk_enroll
+from .fragments import fragment_key, preload_fragments
+from .models import Content, Course, Module, Subject, Text, Video
+
+# Тесты не требуют Redis: кэш и канальный слой внутри процесса
+TEST_SETTINGS = {
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    'CHANNEL_LAYERS': {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+}
+
+
+class CourseTestCase(TestCase):
+    """
+    Общие данные тестов: преподаватель, предмет и курс.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('owner', password='x')
+        self.subject = Subject.objects.create(title='Programming', slug='programming')
+        self.course = self.create_course('python')
+
+    def create_course(self, slug, subject=None):
+        return Course.objects.create(
+            owner=self.owner,
+            subject=subject or self.subject,
+            title=slug.title(),
+            slug=slug,
+            overview='...',
+        )
+
+    def assertCounters(self, course=None, **expected):
+        """
+        Сверяет счетчики курса с ожидаемыми и со всеми фактическими данными.
+        """
+        course = course or self.course
+        course.refresh_from_db()
+        for field, value in expected.items():
+            self.assertEqual(getattr(course, field), value, field)
+        self.assertEqual(find_mismatches(), [])
+
+
+@override_settings(**TEST_SETTINGS)
+class CounterTests(CourseTestCase):
+    """
+    Денормализованные счетчики модулей, студентов и курсов.
+    """
+
+    def test_modules_created_and_deleted(self):
+        modules = [Module.objects.create(course=self.course, title=str(i)) for i in range(3)]
+        self.assertCounters(total_modules=3)
+        modules[0].delete()
+        self.assertCounters(total_modules=2)
+
+    def test_modules_bulk_created(self):
+        Module.objects.create(course=self.course, title='a')
+        Module.objects.create(course=self.course, title='b')
+        Module.objects.bulk_create(
+            [Module(course=self.course, title=str(i)) for i in range(3)]
+        )
+        self.assertCounters(total_modules=5)
+
+    def test_bulk_create_bumps_caches(self):
+        catalog = get_catalog_version()
+        content = get_content_version(self.course.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Module.objects.bulk_create([Module(course=self.course, title='a')])
+        self.assertGreater(get_catalog_version(), catalog)
+        self.assertGreater(get_content_version(self.course.pk), content)
+
+    def test_course_delete_does_not_query_per_module(self):
+        small, large = self.create_course('small'), self.create_course('large')
+        for course, count in ((small, 1), (large, 20)):
+            Module.objects.bulk_create(
+                [Module(course=course, title=str(i)) for i in range(count)]
+            )
+        with CaptureQueriesContext(connection) as expected:
+            with self.captureOnCommitCallbacks(execute=True):
+                small.delete()
+        catalog = get_catalog_version()
+        with self.assertNumQueries(len(expected)):
+            with self.captureOnCommitCallbacks(execute=True):
+                large.delete()
+        self.assertGreater(get_catalog_version(), catalog)
+        self.assertEqual(find_mismatches(), [])
+
+    def test_module_delete_keeps_counter(self):
+        modules = Module.objects.bulk_create(
+            [Module(course=self.course, title=str(i)) for i in range(3)]
+        )
+        Module.objects.filter(pk=modules[0].pk).delete()
+        self.assertCounters(total_modules=2)
+
+    def test_students_add_remove_clear(self):
+        users = [User.objects.create_user(f'u{i}') for i in range(4)]
+        self.course.students.add(*users)
+        self.assertCounters(total_students=4)
+        # Повторное добавление не создает связей и не меняет счетчик
+        self.course.students.add(users[0])
+        self.assertCounters(total_students=4)
+        self.course.students.remove(users[0])
+        self.assertCounters(total_students=3)
+        self.course.students.clear()
+        self.assertCounters(total_students=0)
+
+    def test_students_reverse_relation(self):
+        other = self.create_course('django')
+        user = User.objects.create_user('student')
+        user.courses_joined.add(self.course, other)
+        self.assertCounters(total_students=1)
+        self.assertCounters(other, total_students=1)
+        user.courses_joined.remove(other)
+        self.assertCounters(other, total_students=0)
+        user.courses_joined.clear()
+        self.assertCounters(total_students=0)
+
+    def test_user_deleted(self):
+        user = User.objects.create_user('student')
+        self.course.students.add(user)
+        user.delete()
+        self.assertCounters(total_students=0)
+
+    def test_courses_per_subject(self):
+        other = Subject.objects.create(title='Math', slug='math')
+        course = self.create_course('algebra')
+        self.subject.refresh_from_db()
+        self.assertEqual(self.subject.total_courses, 2)
+        course.subject = other
+        course.save()
+        other.refresh_from_db()
+        self.subject.refresh_from_db()
+        self.assertEqual((self.subject.total_courses, other.total_courses), (1, 1))
+        course.delete()
+        other.refresh_from_db()
+        self.assertEqual(other.total_courses, 0)
+        self.assertEqual(find_mismatches(), [])
+
+
+@override_settings(**TEST_SETTINGS)
+class CatalogVersionTests(CourseTestCase):
+    """
+    Поколение каталога и версия популярности курсов.
+    """
+
+    def test_enrollment_keeps_catalog(self):
+        catalog = get_catalog_version()
+        popularity = get_popularity_version()
+        self.course.students.add(User.objects.create_user('student'))
+        self.assertEqual(get_catalog_version(), catalog)
+        self.assertGreater(get_popularity_version(), popularity)
+
+    def test_subject_list_etag_follows_popularity(self):
+        url = '/api/subjects/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.course.students.add(User.objects.create_user('student'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Python (1 students)', response.json()['results'][0]['popular_courses'])
+
+
+    def test_page_etag_changes_on_login(self):
+        user = User.objects.create_user('student')
+        for url in ('/', reverse('course_detail', args=[self.course.slug])):
+            self.client.force_login(user)
+            self.client.get(url)  # Первый ответ устанавливает CSRF-cookie
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            # Новая сессия и CSRF-токен: страница с прежним токеном не подтверждается
+            self.client.logout()
+            self.client.force_login(user)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+    def test_warm_catalog_page_runs_no_queries(self):
+        subject_url = reverse('course_list_subject', args=[self.subject.slug])
+        for url in ('/', subject_url):
+            self.client.get(url)
+            with self.assertNumQueries(0):
+                response = self.client.get(url)
+            self.assertContains(response, 'Python')
+        # Новый курс меняет поколение каталога, и кэш строится заново
+        self.create_course('django')
+        self.assertContains(self.client.get('/'), 'Django')
+
+
+@override_settings(**TEST_SETTINGS)
+class ApiListTests(CourseTestCase):
+    """
+    Списки предметов и курсов в API.
+    """
+
+    def test_subject_list_query_count_is_flat(self):
+        students = [User.objects.create_user(f'u{i}') for i in range(4)]
+        self.course.students.add(*students)
+        for count in (2, 5):
+            while Subject.objects.count() < count:
+                subject = Subject.objects.create(
+                    title=f'Subject {count}', slug=f'subject-{Subject.objects.count()}')
+                for i in range(4):
+                    course = self.create_course(f'{subject.slug}-{i}', subject)
+                    course.students.add(*students[:i])
+            # COUNT, страница предметов и популярные курсы всех предметов страницы
+            with self.assertNumQueries(3):
+                results = self.client.get('/api/subjects/', {'page_size': 50}).json()['results']
+            self.assertEqual(len(results), count)
+        popular = {subject['slug']: subject['popular_courses'] for subject in results}
+        self.assertEqual(popular['programming'], ['Python (4 students)'])
+        self.assertEqual(popular['subject-1'], [
+            'Subject-1-3 (3 students)',
+            'Subject-1-2 (2 students)',
+            'Subject-1-1 (1 students)',
+        ])
+
+
+    def walk(self, url, **params):
+        """
+        Проходит список по ссылкам `next` и возвращает slug всех строк.
+        """
+        response = self.client.get(url, {'pagination': 'cursor', **params})
+        slugs = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            slugs += [row['slug'] for row in data['results']]
+            if data['next'] is None:
+                return slugs
+            response = self.client.get(data['next'])
+
+    def test_keyset_walk_has_no_duplicates_or_gaps(self):
+        for i in range(6):
+            self.create_course(f'course-{i}')
+        # Одинаковое время создания: порядок решает id
+        Course.objects.filter(slug__in=['course-1', 'course-2', 'course-3']).update(
+            created=Course.objects.get(slug='course-1').created)
+        expected = list(Course.objects.order_by('-created', '-id').values_list('slug', flat=True))
+        for page_size in (1, 2, 4, 50):
+            self.assertEqual(self.walk('/api/courses/', page_size=page_size), expected)
+        for i in range(3):
+            Subject.objects.create(title='Programming', slug=f'programming-{i}')
+        expected = list(Subject.objects.order_by('title', 'id').values_list('slug', flat=True))
+        self.assertEqual(self.walk('/api/subjects/', page_size=2), expected)
+
+    def test_keyset_page_skips_count(self):
+        self.create_course('django')
+        with self.assertNumQueries(2):  # Страница курсов и их модули
+            self.client.get('/api/courses/', {'pagination': 'cursor'})
+
+    def test_invalid_cursor_not_found(self):
+        cursors = ['???'] + [
+            base64.urlsafe_b64encode(raw).decode()
+            for raw in (b'[1]', b'[]', b'["yesterday", 1]', b'{"id": 1}')
+        ]
+        for cursor in cursors:
+            response = self.client.get('/api/courses/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 404)
+
+
+    def test_values_serializers_match_model_serializers(self):
+        other = Subject.objects.create(title='Математика', slug='math')
+        course = self.create_course('algebra', other)
+        Course.objects.filter(pk=course.pk).update(overview='«Кавычки» и \\ "экранирование"')
+        course.students.add(User.objects.create_user('student'))
+        Module.objects.create(course=self.course, title='Intro', description='')
+        Module.objects.create(course=self.course, title='Модуль', description='…')
+        self.create_course('empty')
+        render = JSONRenderer().render
+        pairs = (
+            (CourseValuesSerializer, CourseSerializer, Course.objects.prefetch_related('modules')),
+            (SubjectValuesSerializer, SubjectSerializer, Subject.objects.all()),
+        )
+        for values_serializer, serializer, queryset in pairs:
+            rows = values_serializer.values(queryset.order_by('id'))
+            self.assertEqual(
+                render(values_serializer(rows, many=True).data),
+                render(serializer(queryset.order_by('id'), many=True).data),
+            )
+
+
+    def test_search_ranks_title_above_overview(self):
+        both = self.create_course('django-rest')
+        self.create_course('django')
+        overview = self.create_course('flask')
+        Course.objects.filter(pk__in=[both.pk, overview.pk]).update(overview='Compared to Django')
+        url = '/api/courses/search/'
+        results = self.client.get(url, {'q': 'django'}).json()['results']
+        # Совпадение в названии и описании, затем в названии, затем только в описании
+        self.assertEqual([row['slug'] for row in results], ['django-rest', 'django', 'flask'])
+        self.assertEqual(self.client.get(url, {'q': 'ruby'}).json()['results'], [])
+        for params in ({}, {'q': ''}, {'q': '   '}):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('q', response.json())
+
+
+@override_settings(**TEST_SETTINGS)
+class OrderFieldTests(CourseTestCase):
+    """
+    Назначение порядковых номеров модулей и содержимого.
+    """
+
+    def orders(self, course=None):
+        return list(
+            Module.objects.filter(course=course or self.course)
+            .order_by('order')
+            .values_list('title', 'order')
+        )
+
+    def test_sequential_per_course(self):
+        other = self.create_course('django')
+        for title in 'ab':
+            Module.objects.create(course=self.course, title=title)
+        Module.objects.create(course=other, title='x')
+        self.assertEqual(self.orders(), [('a', 0), ('b', 1)])
+        self.assertEqual(self.orders(other), [('x', 0)])
+
+    def test_explicit_order_is_kept(self):
+        Module.objects.create(course=self.course, title='a', order=5)
+        Module.objects.create(course=self.course, title='b')
+        self.assertEqual(self.orders(), [('a', 5), ('b', 6)])
+
+    def test_bulk_create_continues_numbering(self):
+        other = self.create_course('django')
+        Module.objects.create(course=self.course, title='a')
+        Module.objects.bulk_create([
+            Module(course=self.course, title='b'),
+            Module(course=other, title='x'),
+            Module(course=self.course, title='c'),
+        ])
+        self.assertEqual(self.orders(), [('a', 0), ('b', 1), ('c', 2)])
+        self.assertEqual(self.orders(other), [('x', 0)])
+
+    def test_content_numbered_per_module(self):
+        module = Module.objects.create(course=self.course, title='a')
+        texts = [Text.objects.create(owner=self.owner, title=str(i), content='') for i in range(3)]
+        Content.objects.create(module=module, item=texts[0])
+        Content.objects.bulk_create([Content(module=module, item=t) for t in texts[1:]])
+        self.assertEqual(
+            list(module.contents.values_list('order', flat=True)), [0, 1, 2]
+        )
+
+    def test_duplicate_order_rejected(self):
+        Module.objects.create(course=self.course, title='a', order=0)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Module.objects.create(course=self.course, title='b', order=0)
+
+    def test_reorder_swaps_modules(self):
+        a = Module.objects.create(course=self.course, title='a')
+        b = Module.objects.create(course=self.course, title='b')
+        self.client.force_login(self.owner)
+        response = self.client.post(
+            reverse('module_order'),
+            json.dumps({a.pk: 1, b.pk: 0}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.json(), {'saved': 'OK', 'updated': 2})
+        self.assertEqual(self.orders(), [('b', 0), ('a', 1)])
+
+    def test_reorder_rejects_taken_order(self):
+        a = Module.objects.create(course=self.course, title='a')
+        Module.objects.create(course=self.course, title='b')
+        self.client.force_login(self.owner)
+        response = self.client.post(
+            reverse('module_order'),
+            json.dumps({a.pk: 1}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.orders(), [('a', 0), ('b', 1)])
+
+
+@override_settings(**TEST_SETTINGS)
+class ContentVersionTests(CourseTestCase):
+    """
+    Версии содержимого модулей и курсов.
+    """
+
+    def create_module(self, contents=0):
+        module = Module.objects.create(course=self.course, title='module')
+        for i in range(contents):
+            text = Text.objects.create(owner=self.owner, title=str(i), content='')
+            Content.objects.create(module=module, item=text)
+        return module
+
+    @staticmethod
+    def basic_auth(username, password='x'):
+        # Содержимое курса доступно только с базовой аутентификацией
+        credentials = base64.b64encode(f'{username}:{password}'.encode()).decode()
+        return f'Basic {credentials}'
+
+    def test_module_delete_does_not_query_per_content(self):
+        small, large = self.create_module(1), self.create_module(10)
+        with CaptureQueriesContext(connection) as expected:
+            with self.captureOnCommitCallbacks(execute=True):
+                small.delete()
+        version = get_content_version(self.course.pk)
+        with self.assertNumQueries(len(expected)):
+            with self.captureOnCommitCallbacks(execute=True):
+                large.delete()
+        self.assertGreater(get_content_version(self.course.pk), version)
+
+    def test_items_loaded_per_type(self):
+        def load(module):
+            with CaptureQueriesContext(connection) as queries:
+                modules = list(Module.objects.filter(pk=module.pk).with_contents())
+                items = [c.item for m in modules for c in m.contents.all()]
+            return items, len(queries)
+
+        small, large = self.create_module(), self.create_module()
+        for module, count in ((small, 1), (large, 10)):
+            for i in range(count):
+                for item in (
+                    Text.objects.create(owner=self.owner, title=str(i), content=''),
+                    Video.objects.create(owner=self.owner, title=str(i), url='https://x.org'),
+                ):
+                    Content.objects.create(module=module, item=item)
+        items, expected = load(small)
+        self.assertEqual(len(items), 2)
+        items, queries = load(large)
+        # Один запрос на модель элементов, независимо от количества строк
+        self.assertEqual((len(items), queries), (20, expected))
+        self.assertEqual({type(item) for item in items}, {Text, Video})
+
+    def test_versions_bumped_after_commit(self):
+        module = self.create_module(1)
+        course_version = get_content_version(self.course.pk)
+        module_version = get_module_version(module.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            module.title = 'changed'
+            module.save()
+            text = module.contents.get().item
+            text.save()
+        # Параллельный запрос до фиксации не должен видеть новую версию
+        self.assertEqual(get_content_version(self.course.pk), course_version)
+        self.assertEqual(get_module_version(module.pk), module_version)
+        for callback in callbacks:
+            callback()
+        self.assertGreater(get_content_version(self.course.pk), course_version)
+        self.assertGreater(get_module_version(module.pk), module_version)
+
+    def reorder_contents(self, new_order):
+        self.client.force_login(self.owner)
+        return self.client.post(
+            reverse('content_order'), json.dumps(new_order), content_type='application/json'
+        )
+
+    def test_reorder_bumps_versions(self):
+        module = self.create_module(2)
+        a, b = module.contents.all()
+        course_version = get_content_version(self.course.pk)
+        module_version = get_module_version(module.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.reorder_contents({a.pk: 1, b.pk: 0})
+        # До фиксации транзакции версии не меняются
+        self.assertEqual(get_content_version(self.course.pk), course_version)
+        for callback in callbacks:
+            callback()
+        self.assertGreater(get_content_version(self.course.pk), course_version)
+        self.assertGreater(get_module_version(module.pk), module_version)
+        # Перестановка без изменений не сбрасывает кэш
+        course_version = get_content_version(self.course.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reorder_contents({a.pk: 1, b.pk: 0})
+        self.assertEqual(get_content_version(self.course.pk), course_version)
+
+    def test_reorder_rejects_out_of_range_order(self):
+        module = self.create_module(1)
+        content = module.contents.get()
+        for order in (-1, 2_000_000_000, 2**40):
+            response = self.reorder_contents({content.pk: order})
+            self.assertEqual(response.status_code, 400)
+        content.refresh_from_db()
+        self.assertEqual(content.order, 0)
+
+    def test_contents_etag(self):
+        module = self.create_module(1)
+        self.course.students.add(User.objects.create_user('student', password='x'))
+        url = f'/api/courses/{self.course.pk}/contents/'
+        response = self.client.get(url, HTTP_AUTHORIZATION=self.basic_auth('student'))
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        response = self.client.get(
+            url, HTTP_AUTHORIZATION=self.basic_auth('student'), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+        # Изменение элемента содержимого меняет версию курса и ответ
+        text = module.contents.get().item
+        text.content = 'changed'
+        with self.captureOnCommitCallbacks(execute=True):
+            text.save()
+        response = self.client.get(
+            url, HTTP_AUTHORIZATION=self.basic_auth('student'), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('changed', json.dumps(response.json()))
+
+    def test_contents_requires_enrollment(self):
+        User.objects.create_user('student', password='x')
+        response = self.client.get(
+            f'/api/courses/{self.course.pk}/contents/',
+            HTTP_AUTHORIZATION=self.basic_auth('student'),
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(**TEST_SETTINGS)
+class EnrollmentCacheTests(CourseTestCase):
+    """
+    Кэшированное множество курсов студента.
+    """
+
+    def test_cache_follows_enrollment(self):
+        user = User.objects.create_user('student')
+        other = self.create_course('django')
+        self.assertEqual(get_enrolled_course_ids(user.pk), frozenset())
+        self.course.students.add(user)
+        self.assertEqual(get_enrolled_course_ids(user.pk), {self.course.pk})
+        user.courses_joined.add(other)
+        self.assertEqual(get_enrolled_course_ids(user.pk), {self.course.pk, other.pk})
+        self.course.students.clear()
+        self.assertEqual(get_enrolled_course_ids(user.pk), {other.pk})
+        user.courses_joined.remove(other)
+        self.assertEqual(get_enrolled_course_ids(user.pk), frozenset())
+
+    def test_cached_lookup_skips_database(self):
+        user = User.objects.create_user('student')
+        self.course.students.add(user)
+        get_enrolled_course_ids(user.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(is_enrolled(user, self.course.pk))
+
+
+@override_settings(**TEST_SETTINGS)
+class BulkEnrollTests(CourseTestCase):
+    """
+    Массовая запись пользователей на курсы.
+    """
+
+    def enroll(self, user_ids, course_ids):
+        with self.captureOnCommitCallbacks(execute=True):
+            return bulk_enroll(user_ids, course_ids, chunk_size=2)
+
+    def test_enroll_is_idempotent(self):
+        users = [User.objects.create_user(f'u{i}') for i in range(3)]
+        other = self.create_course('django')
+        self.course.students.add(users[0])
+        user_ids = [user.pk for user in users]
+        result = self.enroll(user_ids + [0], [self.course.pk, other.pk, 0])
+        self.assertEqual(result, {
+            'requested': 12,
+            'created': 5,
+            'existing': 1,
+            'missing_users': [0],
+            'missing_courses': [0],
+        })
+        self.assertCounters(total_students=3)
+        self.assertCounters(other, total_students=3)
+        # Повторный вызов ничего не создает и не меняет счетчики
+        result = self.enroll(user_ids, [self.course.pk, other.pk])
+        self.assertEqual((result['created'], result['existing']), (0, 6))
+        self.assertCounters(total_students=3)
+
+    def test_enroll_invalidates_caches(self):
+        user = User.objects.create_user('student')
+        get_enrolled_course_ids(user.pk)
+        popularity = get_popularity_version()
+        self.enroll([user.pk], [self.course.pk])
+        self.assertEqual(get_enrolled_course_ids(user.pk), {self.course.pk})
+        self.assertGreater(get_popularity_version(), popularity)
+
+    @override_settings(BULK_ENROLL_MAX_PAIRS=4)
+    def test_api_limits_pairs(self):
+        admin = User.objects.create_superuser('admin', password='x')
+        self.client.force_login(admin)
+        users = [User.objects.create_user(f'u{i}').pk for i in range(3)]
+        other = self.create_course('django')
+        url = '/api/courses/bulk-enroll/'
+        response = self.client.post(
+            url, {'users': users, 'courses': [self.course.pk, other.pk]},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertCounters(total_students=0)
+        response = self.client.post(
+            url, {'users': users[:2], 'courses': [self.course.pk, other.pk]},
+            content_type='application/json',
+        )
+        self.assertEqual(response.json()['created'], 4)
+
+
+@override_settings(**TEST_SETTINGS)
+class FragmentTests(CourseTestCase):
+    """
+    Хранилище отрендеренных фрагментов элементов.
+    """
+
+    def test_key_changes_on_save(self):
+        text = Text.objects.create(owner=self.owner, title='a', content='first')
+        key = fragment_key(text)
+        self.assertIn('first', cache.get(key))
+        text.content = 'second'
+        text.save()
+        self.assertNotEqual(fragment_key(text), key)
+        # Новый HTML сохранен при сохранении и читается без рендеринга
+        fresh = Text.objects.get(pk=text.pk)
+        self.assertIn('second', cache.get(fragment_key(fresh)))
+        with mock.patch.object(Text, 'render_template') as render:
+            self.assertIn('second', fresh.render())
+        render.assert_not_called()
+
+    def test_preload_renders_missing_once(self):
+        texts = [
+            Text.objects.create(owner=self.owner, title=str(i), content=str(i)) for i in range(3)
+        ]
+        cache.clear()
+        items = [Text.objects.get(pk=text.pk) for text in texts]
+        preload_fragments(items)
+        self.assertEqual(len(cache.get_many([fragment_key(item) for item in items])), 3)
+        self.assertIn('2', items[2].render())
+
+    def test_deleted_item_fragment_removed(self):
+        text = Text.objects.create(owner=self.owner, title='a', content='a')
+        key = fragment_key(text)
+        text.delete()
+        self.assertIsNone(cache.get(key))
+
+
+@override_settings(ALLOWED_HOSTS=['.example.com'], **TEST_SETTINGS)
+class SubdomainTests(CourseTestCase):
+    """
+    Перенаправление с поддомена курса на страницу курса.
+    """
+
+    def setUp(self):
+        super().setUp()
+        _subdomain_cache.clear()
+
+    def get(self, slug):
+        return self.client.get('/', HTTP_HOST=f'{slug}.example.com')
+
+    def test_redirect_without_queries(self):
+        self.get('python')
+        with self.assertNumQueries(0):
+            response = self.get('python')
+        self.assertRedirects(
+            response, 'http://example.com/course/python/', fetch_redirect_response=False
+        )
+
+    def test_unknown_subdomain_cached(self):
+        self.assertEqual(self.get('missing').status_code, 404)
+        # Отрицательный результат читается из локального, затем из общего кэша
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get('missing').status_code, 404)
+        _subdomain_cache.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get('missing').status_code, 404)
+        # Новый курс с этим слагом сбрасывает отрицательный результат
+        self.create_course('missing')
+        self.assertEqual(self.get('missing').status_code, 302)
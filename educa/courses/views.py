@@ -5,17 +5,27 @@ from django.contrib.auth.mixins import (
     LoginRequiredMixin,
     PermissionRequiredMixin,
 )
-from django.core.cache import cache
-from django.db.models import Count
 from django.forms.models import modelform_factory
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from django.views.generic.base import TemplateResponseMixin, View
 from django.views.generic.detail import DetailView
 from django.views.generic.edit import CreateView, DeleteView, UpdateView
 from django.views.generic.list import ListView
 from students.forms import CourseEnrollForm
 
+from .cache import (
+    bump_catalog_version,
+    bump_module_version,
+    get_catalog,
+    touch_course_content,
+)
+from .conditional import catalog_page_etag, course_page_etag, course_page_last_modified
 from .forms import ModuleFormSet
 from .models import Content, Course, Module, Subject
 
@@ -138,7 +148,10 @@ class CourseModuleUpdateView(TemplateResponseMixin, View):
         # Обработка отправленной формы и сохранение изменений
         formset = self.get_formset(data=request.POST)
         if formset.is_valid():
-            formset.save()
+            # Сохранение в транзакции: порядковые номера новых модулей
+            # назначаются под блокировкой курса
+            with transaction.atomic():
+                formset.save()
             return redirect('manage_course_list')
         return self.render_to_response({'course': self.course, 'formset': formset})
 
@@ -202,10 +215,12 @@ class ContentCreateUpdateView(TemplateResponseMixin, View):
         if form.is_valid():
             obj = form.save(commit=False)
             obj.owner = request.user
-            obj.save()
-            if not id:
-                # Создание нового содержимого
-                Content.objects.create(module=self.module, item=obj)
+            with transaction.atomic():
+                obj.save()
+                if not id:
+                    # Создание нового содержимого (порядковый номер назначается
+                    # под блокировкой модуля)
+                    Content.objects.create(module=self.module, item=obj)
             return redirect('module_content_list', self.module.id)
         return self.render_to_response({'form': form, 'object': self.obj})
 
@@ -239,80 +254,146 @@ class ModuleContentListView(TemplateResponseMixin, View):
         Метод для отображения списка содержимого модуля.
         """
         # Получаем модуль по идентификатору и проверяем, что он принадлежит курсу текущего пользователя
+        # Содержимое модуля загружается вместе с элементами (по запросу на тип)
         module = get_object_or_404(
-            Module, id=module_id, course__owner=request.user)
+            Module.objects.with_contents(), id=module_id, course__owner=request.user)
         # Возвращаем ответ с модулем для отображения содержимого
         return self.render_to_response({'module': module})
 
 
-class ModuleOrderView(CsrfExemptMixin, JsonRequestResponseMixin, View):
+class OrderUpdateMixin(CsrfExemptMixin, JsonRequestResponseMixin):
     """
-    Представление для изменения порядка модулей с использованием AJAX.
-    Получает данные в формате JSON и обновляет порядок модулей.
+    Миксин для массового изменения порядка объектов с использованием AJAX.
+    Проверяет владение всеми объектами одним запросом и обновляет порядок
+    запросами UPDATE ... CASE внутри транзакции.
     """
+    model = None  # Модель с полем order
+    owner_lookup = None  # Путь к владельцу курса для проверки прав
+    course_lookup = None  # Путь к идентификатору курса для сброса версии содержимого
+    module_lookup = None  # Путь к идентификатору модуля для сброса версии содержимого модуля
+    bump_catalog = False  # Порядок объектов выводится в каталоге API
+    # Сдвиг, на который изменяемые объекты временно выводятся из занятых номеров
+    ORDER_SHIFT = 1_000_000_000
+    # Наибольший номер, который после сдвига помещается в PositiveIntegerField (int32)
+    MAX_ORDER = 2_147_483_647 - ORDER_SHIFT
 
     def post(self, request):
         """
-        Метод для обработки AJAX-запроса на изменение порядка модулей.
+        Метод для обработки AJAX-запроса на изменение порядка объектов.
+        """
+        try:
+            # Приведение идентификаторов и порядковых номеров к целым числам
+            new_order = {
+                int(id): int(order) for id, order in self.request_json.items()
+            }
+        except (AttributeError, TypeError, ValueError):
+            return self.render_bad_request_response({'error': 'Invalid order data'})
+        if not all(0 <= order <= self.MAX_ORDER for order in new_order.values()):
+            # Номер вне диапазона поля вызвал бы DataError в базе данных
+            return self.render_bad_request_response({'error': 'Order out of range'})
+
+        try:
+            changed = self.update_order(request, new_order)
+        except IntegrityError:
+            # Новый номер совпал с номером другого объекта той же области
+            return self.render_bad_request_response({'error': 'Duplicate order'})
+        # Возвращаем ответ с количеством измененных объектов
+        return self.render_json_response({'saved': 'OK', 'updated': len(changed)})
+
+    def update_order(self, request, new_order):
         """
-        # Обновляем порядок модулей на основе переданных данных JSON
-        for id, order in self.request_json.items():
-            Module.objects.filter(
-                id=id, course__owner=request.user).update(order=order)
-        # Возвращаем ответ с подтверждением успешного сохранения
-        return self.render_json_response({'saved': 'OK'})
+        Сохраняет новые порядковые номера объектов текущего пользователя.
+
+        Номера уникальны в пределах области нумерации, поэтому изменяемые
+        объекты сначала сдвигаются за пределы занятых номеров, и перестановка
+        местами не нарушает ограничение в середине UPDATE.
+
+        :return: Словарь {id: номер} действительно измененных объектов.
+        """
+        with transaction.atomic():
+            # Одна проверка владения: выбираем только объекты текущего пользователя
+            lookups = [self.course_lookup]
+            if self.module_lookup:
+                lookups.append(self.module_lookup)
+            rows = list(
+                self.model.objects.select_for_update(of=('self',))
+                .filter(id__in=new_order, **{self.owner_lookup: request.user})
+                .values_list('id', 'order', *lookups)
+            )
+            current = {row[0]: row[1] for row in rows}
+            course_ids = {row[2] for row in rows}
+            module_ids = {row[3] for row in rows} if self.module_lookup else set()
+            # Обновляем только объекты, порядок которых действительно изменился
+            changed = {
+                id: order for id, order in new_order.items()
+                if id in current and current[id] != order
+            }
+            if changed:
+                self.model.objects.filter(id__in=changed).update(
+                    order=F('order') + self.ORDER_SHIFT
+                )
+                self.model.objects.filter(id__in=changed).update(
+                    order=Case(
+                        *[When(id=id, then=Value(order))
+                          for id, order in changed.items()],
+                        output_field=PositiveIntegerField(),
+                    )
+                )
+                # Массовое обновление не вызывает сигналов: отмечаем изменение курсов.
+                # Версии сдвигаются после фиксации, иначе параллельный запрос
+                # закэширует прежний порядок под новой версией
+                transaction.on_commit(lambda: touch_course_content(*course_ids))
+                transaction.on_commit(lambda: bump_module_version(*module_ids))
+                if self.bump_catalog:
+                    transaction.on_commit(bump_catalog_version)
+        return changed
+
+
+class ModuleOrderView(OrderUpdateMixin, View):
+    """
+    Представление для изменения порядка модулей с использованием AJAX.
+    Получает данные в формате JSON и обновляет порядок модулей.
+    """
+    model = Module  # Модель модуля
+    owner_lookup = 'course__owner'  # Владелец курса модуля
+    course_lookup = 'course_id'  # Курс модуля
+    bump_catalog = True  # Порядок модулей выводится в списке курсов API
 
 
-class ContentOrderView(CsrfExemptMixin, JsonRequestResponseMixin, View):
+class ContentOrderView(OrderUpdateMixin, View):
     """
     Представление для изменения порядка содержимого с использованием AJAX.
     Получает данные в формате JSON и обновляет порядок элементов содержимого.
     """
-
-    def post(self, request):
-        """
-        Метод для обработки AJAX-запроса на изменение порядка содержимого.
-        """
-        # Обновляем порядок элементов содержимого на основе переданных данных JSON
-        for id, order in self.request_json.items():
-            Content.objects.filter(
-                id=id, module__course__owner=request.user).update(order=order)
-        # Возвращаем ответ с подтверждением успешного сохранения
-        return self.render_json_response({'saved': 'OK'})
+    model = Content  # Модель содержимого
+    owner_lookup = 'module__course__owner'  # Владелец курса содержимого
+    course_lookup = 'module__course_id'  # Курс содержимого
+    module_lookup = 'module_id'  # Модуль содержимого
 
 
 class CourseListView(TemplateResponseMixin, View):
     """
     Представление для отображения списка курсов.
-    Фильтрует курсы по предмету, если указан, и использует кэширование для улучшения производительности.
+    Фильтрует курсы по предмету, если указан, и использует версионированный кэш каталога.
     """
     model = Course  # Модель курса
     # Шаблон для отображения списка курсов
     template_name = 'courses/course/list.html'
 
+    @method_decorator(condition(etag_func=catalog_page_etag))
     def get(self, request, subject=None):
         """
         Метод для отображения списка курсов, с возможностью фильтрации по предмету.
+        Если каталог не изменился, возвращает 304 без обращения к кэшу каталога.
         """
-        # Кэширование списка всех предметов
-        subjects = cache.get('all_subjects')
-        if not subjects:
-            # Если предметы не закэшированы, выполняем запрос и сохраняем в кэш
-            subjects = Subject.objects.annotate(total_courses=Count('courses'))
-            cache.set('all_subjects', subjects)
-
-        # Если указан предмет, фильтруем курсы по этому предмету
-        all_courses = Course.objects.annotate(total_modules=Count('modules'))
-        if subject:
-            subject = get_object_or_404(Subject, slug=subject)
-            all_courses = all_courses.filter(subject=subject)
-
-        # Кэширование списка курсов
-        cache.set(f'all_courses_{
-                  subject.slug if subject else "all"}', all_courses)
+        # Получение предметов и курсов из кэша каталога (при теплом кэше без SQL)
+        try:
+            subjects, subject, courses = get_catalog(subject)
+        except Subject.DoesNotExist:
+            raise Http404('Subject not found')
 
         # Возвращаем ответ с курсами и предметами для отображения
-        return self.render_to_response({'subjects': subjects, 'subject': subject, 'courses': all_courses})
+        return self.render_to_response({'subjects': subjects, 'subject': subject, 'courses': courses})
 
 
 class CourseDetailView(DetailView):
@@ -323,6 +404,14 @@ class CourseDetailView(DetailView):
     # Шаблон для отображения деталей курса
     template_name = 'courses/course/detail.html'
 
+    @method_decorator(condition(
+        etag_func=course_page_etag, last_modified_func=course_page_last_modified))
+    def get(self, request, *args, **kwargs):
+        """
+        Метод для отображения курса; если курс не изменился, возвращает 304 без рендеринга.
+        """
+        return super().get(request, *args, **kwargs)
+
     def get_context_data(self, **kwargs):
         """
         Метод для получения дополнительных данных для шаблона.
@@ -136,6 +136,31 @@ CACHE_MIDDLEWARE_ALIAS = 'default'
 CACHE_MIDDLEWARE_SECONDS = 60 * 15  # 15 minutes
 CACHE_MIDDLEWARE_KEY_PREFIX = 'educa'
 
+# Время жизни закэшированного каталога курсов (инвалидируется сигналами)
+CATALOG_CACHE_TIMEOUT = 60 * 60 * 24  # 24 hours
+
+# Время жизни отрендеренных фрагментов содержимого (ключ включает время обновления)
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24 * 7  # 7 days
+
+# Кэш соответствия поддомена курса и URL страницы курса
+SUBDOMAIN_CACHE_TIMEOUT = 60 * 60 * 24  # 24 hours
+SUBDOMAIN_NEGATIVE_CACHE_TIMEOUT = 60 * 5  # 5 minutes
+SUBDOMAIN_LOCAL_CACHE_SIZE = 1024
+SUBDOMAIN_LOCAL_CACHE_TIMEOUT = 30  # 30 seconds
+
+# Кэш множеств курсов, на которые записаны пользователи (сбрасывается сигналами)
+ENROLLMENT_CACHE_TIMEOUT = 60 * 60 * 24  # 24 hours
+
+# Наибольшее количество пар «пользователь — курс» в одном запросе массовой
+# записи через API; большие наборы записываются командой bulk_enroll
+BULK_ENROLL_MAX_PAIRS = 10000
+
+# Кэш ответа API с содержимым курса (ключ включает версию содержимого)
+COURSE_CONTENTS_CACHE_TIMEOUT = 60 * 60 * 24  # 24 hours
+
+# Кэш отрендеренного содержимого модуля (ключ включает версию содержимого модуля)
+MODULE_CONTENTS_CACHE_TIMEOUT = 60 * 60 * 12  # 12 hours
+
 
 INTERNAL_IPS = [
     '127.0.0.1',
@@ -161,4 +186,40 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Размер страницы истории чата по умолчанию и максимальный
+CHAT_HISTORY_PAGE_SIZE = 50
+CHAT_HISTORY_MAX_PAGE_SIZE = 200
+
+# Отложенная запись сообщений чата: размер пакета, интервал сброса (сек)
+# и предел буфера при ошибках записи
+CHAT_BUFFER_SIZE = 100
+CHAT_BUFFER_INTERVAL = 1.0
+CHAT_BUFFER_MAX_PENDING = 10000
+# Интервал (сек) записи метрик буфера (глубина, сбросы) в журнал
+CHAT_BUFFER_STATS_INTERVAL = 60
+
+# Сообщения чата старше этого количества дней переносятся в архив
+# командой archive_messages
+CHAT_ARCHIVE_AFTER_DAYS = 90
+
+# Присутствие в комнатах чата: время жизни записи участника и интервал сигналов
+CHAT_PRESENCE_TTL = 60  # seconds
+CHAT_PRESENCE_HEARTBEAT = 20  # seconds
+# Время жизни отметки набора текста
+CHAT_TYPING_TTL = 5  # seconds
+# Не более одной рассылки присутствия комнаты за интервал
+CHAT_PRESENCE_INTERVAL = 1.0  # seconds
+# Максимальное количество имен участников в рассылке присутствия
+CHAT_PRESENCE_MAX_LIST = 50
+
+# Ограничение частоты чата (token bucket): (токенов в секунду, размер ведра)
+# для входящих кадров пользователя и для сообщений комнаты
+CHAT_RATE_LIMIT_USER = (2, 10)
+CHAT_RATE_LIMIT_ROOM = (20, 60)
+# Что делать с кадром сверх лимита: 'drop' — отбросить, 'close' — закрыть соединение
+CHAT_RATE_LIMIT_POLICY = 'drop'
+# Максимальное количество исходящих кадров, отправленных клиенту, но еще не
+# подтвержденных им кадром `ack`; медленный клиент, превысивший окно, отключается
+CHAT_SEND_WINDOW = 200
+
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
@@ -0,0 +1,90 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.enrollment import DEFAULT_CHUNK_SIZE, bulk_enroll
+
+
+class Command(BaseCommand):
+    """
+    Команда для массовой записи пользователей на курсы.
+
+    Каждый указанный пользователь записывается на каждый указанный курс.
+    Пользователи задаются идентификаторами (`--users`) и/или файлом
+    (`--users-file`), в котором каждая строка содержит идентификатор или
+    имя пользователя. Уже существующие записи пропускаются, поэтому
+    команду можно безопасно запускать повторно.
+    """
+    help = 'Записывает пользователей на курсы пакетными запросами'
+
+    def add_arguments(self, parser):
+        """
+        Добавляет аргументы командной строки в парсер.
+
+        :param parser: Экземпляр парсера аргументов.
+        """
+        # Идентификаторы курсов
+        parser.add_argument('--courses', dest='courses', type=int, nargs='+', required=True)
+        # Идентификаторы пользователей
+        parser.add_argument('--users', dest='users', type=int, nargs='+', default=[])
+        # Файл с идентификаторами или именами пользователей (по одному в строке)
+        parser.add_argument('--users-file', dest='users_file')
+        # Количество связей в одном INSERT
+        parser.add_argument('--chunk-size', dest='chunk_size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def read_users_file(self, path):
+        """
+        Читает пользователей из файла.
+
+        :param path: Путь к файлу.
+        :return: Список идентификаторов пользователей.
+        """
+        ids, usernames = [], []
+        try:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    value = line.strip()
+                    if not value:
+                        continue
+                    if value.isdigit():
+                        ids.append(int(value))
+                    else:
+                        usernames.append(value)
+        except OSError as exc:
+            raise CommandError(f'Не удалось прочитать файл {path}: {exc}') from exc
+        if usernames:
+            found = dict(
+                User.objects.filter(username__in=usernames).values_list('username', 'id')
+            )
+            unknown = [name for name in usernames if name not in found]
+            if unknown:
+                self.stderr.write(f'Неизвестные пользователи: {", ".join(unknown[:20])}')
+            ids.extend(found.values())
+        return ids
+
+    def handle(self, *args, **options):
+        """
+        Основной метод, выполняемый при вызове команды.
+        """
+        user_ids = list(options['users'])
+        if options['users_file']:
+            user_ids.extend(self.read_users_file(options['users_file']))
+        if not user_ids:
+            raise CommandError('Не указаны пользователи (--users или --users-file)')
+
+        started = time.monotonic()
+        result = bulk_enroll(user_ids, options['courses'], options['chunk_size'])
+        elapsed = time.monotonic() - started
+
+        if result['missing_users']:
+            self.stderr.write(f'Не найдено пользователей: {len(result["missing_users"])}')
+        if result['missing_courses']:
+            self.stderr.write(
+                f'Не найдены курсы: {", ".join(map(str, result["missing_courses"]))}'
+            )
+        # Выводим количество созданных и уже существующих записей
+        self.stdout.write(
+            f'Создано {result["created"]} записей, уже существовало {result["existing"]} '
+            f'(запрошено {result["requested"]}) за {elapsed:.1f} с'
+        )
@@ -1,20 +1,59 @@
 from django.utils import timezone
-from django.db.models import Count
-from django.core.management.base import BaseCommand
-from django.core.mail import send_mass_mail
+from django.db.models import Exists, OuterRef
+from django.core.management.base import BaseCommand, CommandError
+from django.core.mail import EmailMessage, get_connection
 from django.contrib.auth.models import User
 from django.conf import settings
+from courses.models import Course
+from students.models import ReminderCheckpoint
 import datetime
+import logging
+import smtplib
+import time
+
+logger = logging.getLogger(__name__)
+
+# Ошибки доставки конкретному адресату: письмо пропускается, рассылка продолжается
+RECIPIENT_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError)
+
+
+class ReminderMessage(EmailMessage):
+    """
+    Письмо-напоминание, запоминающее получателя и попытку отправки.
+
+    Почтовые бэкенды отправляют письма пакета по порядку и вызывают
+    `message()` непосредственно перед отправкой каждого, поэтому по
+    отметке попытки определяется письмо, на котором произошла ошибка.
+    """
+
+    attempted = False
+
+    def __init__(self, user_id, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user_id = user_id
+
+    def message(self):
+        self.attempted = True
+        return super().message()
 
 
 class Command(BaseCommand):
     """
-    Команда для отправки напоминаний по электронной почте пользователям, 
+    Команда для отправки напоминаний по электронной почте пользователям,
     которые зарегистрировались более N дней назад, но не записались ни на один курс.
 
-    Команда принимает необязательный аргумент `--days`, чтобы указать количество дней 
-    с момента регистрации. Если аргумент не указан, по умолчанию используется 0, 
+    Команда принимает необязательный аргумент `--days`, чтобы указать количество дней
+    с момента регистрации. Если аргумент не указан, по умолчанию используется 0,
     что включает всех пользователей, которые не записались на курсы.
+
+    Пользователи читаются потоком пакетами (`--chunk-size`), письма
+    отправляются через одно SMTP-соединение пакетами по `--batch-size`
+    (один вызов send_messages на пакет). После каждого пакета в базе данных
+    сохраняется идентификатор последнего обработанного пользователя
+    (отдельно для каждого значения `--days`), поэтому повторный запуск после
+    сбоя соединения продолжает со следующего получателя и никому не отправляет
+    письмо повторно (`--restart` начинает заново). Адреса, отклоненные
+    почтовым сервером, записываются в журнал и пропускаются.
     """
     help = 'Отправляет напоминание по электронной почте пользователям, зарегистрированным более N дней назад и не записавшимся на курсы'
 
@@ -26,47 +65,153 @@ class Command(BaseCommand):
         """
         # Добавление необязательного аргумента '--days' для указания количества дней с момента регистрации
         parser.add_argument('--days', dest='days', type=int)
+        # Количество пользователей, читаемых из базы данных за один запрос
+        parser.add_argument('--chunk-size', dest='chunk_size', type=int, default=2000)
+        # Количество писем в одном вызове send_messages (и между сохранениями контрольной точки)
+        parser.add_argument('--batch-size', dest='batch_size', type=int, default=100)
+        # Начать рассылку заново, игнорируя сохраненную контрольную точку
+        parser.add_argument('--restart', dest='restart', action='store_true')
+
+    @staticmethod
+    def failed_index(messages):
+        """
+        Возвращает номер письма, на котором прервалась отправка пакета.
+
+        :param messages: Отправлявшиеся письма в порядке отправки.
+        :return: Номер последнего письма с попыткой отправки (0, если попыток не было).
+        """
+        attempted = [i for i, message in enumerate(messages) if message.attempted]
+        return attempted[-1] if attempted else 0
+
+    def send_batch(self, connection, batch):
+        """
+        Отправляет пакет писем одним вызовом send_messages.
+
+        Письмо на отклоненный адрес записывается в журнал и пропускается,
+        остаток пакета отправляется дальше. При ошибке соединения выполняется
+        одно переподключение, и повторяются только неотправленные письма.
+        Количество обработанных (отправленных или отклоненных) писем пакета
+        сохраняется в `self.done`, в том числе при исключении.
+
+        :param connection: Открытое почтовое соединение.
+        :param batch: Список объектов ReminderMessage.
+        :return: Почтовое соединение (новое, если пришлось переподключиться).
+        """
+        self.done = 0
+        reconnected = False
+        while self.done < len(batch):
+            pending = batch[self.done:]
+            try:
+                connection.send_messages(pending)
+            except RECIPIENT_ERRORS as exc:
+                failed = pending[self.failed_index(pending)]
+                logger.warning('Reminder to %s refused: %s', failed.to[0], exc)
+                self.refused += 1
+                self.done = batch.index(failed) + 1
+            except Exception:
+                self.done += self.failed_index(pending)
+                if reconnected:
+                    raise
+                reconnected = True
+                connection.close()
+                connection = get_connection()
+                connection.open()
+            else:
+                self.done = len(batch)
+        return connection
+
+    def deliver(self, connection, batch, checkpoint):
+        """
+        Отправляет пакет и продвигает контрольную точку до последнего обработанного письма.
+
+        :return: Почтовое соединение.
+        """
+        refused = self.refused
+        try:
+            connection = self.send_batch(connection, batch)
+        finally:
+            if self.done:
+                self.last_user_id = batch[self.done - 1].user_id
+                ReminderCheckpoint.objects.filter(pk=checkpoint.pk).update(
+                    last_user_id=self.last_user_id
+                )
+                self.sent += self.done - (self.refused - refused)
+        if self.verbosity >= 2:
+            self.stdout.write(f'Отправлено {self.sent} писем (пользователь {self.last_user_id})')
+        return connection
 
     def handle(self, *args, **options):
         """
         Основной метод, выполняемый при вызове команды.
 
-        Выбирает пользователей, которые зарегистрировались более N дней назад 
+        Выбирает пользователей, которые зарегистрировались более N дней назад
         и не записались ни на один курс, и отправляет им напоминания по электронной почте.
         """
-        emails = []
         subject = 'Запишитесь на курс'
+        self.verbosity = options['verbosity']
 
         # Определяем дату регистрации, до которой будут выбраны пользователи
         date_joined = timezone.now().today() - datetime.timedelta(
             days=options['days'] or 0
         )
 
-        # Выбираем пользователей, у которых нет записей на курсы и которые зарегистрировались до указанной даты
-        users = User.objects.annotate(
-            course_count=Count('courses_joined')
-        ).filter(course_count=0, date_joined__date__lte=date_joined)
+        # Контрольная точка своя для каждого набора параметров рассылки
+        key = f'enroll_reminder:days={options["days"] or 0}'
+        if options['restart']:
+            ReminderCheckpoint.objects.filter(key=key).delete()
+        checkpoint, _ = ReminderCheckpoint.objects.get_or_create(key=key)
+        self.last_user_id = checkpoint.last_user_id
+
+        # Выбираем пользователей, у которых нет записей на курсы (NOT EXISTS вместо GROUP BY)
+        # и которые зарегистрировались до указанной даты
+        enrollments = Course.students.through.objects.filter(user_id=OuterRef('pk'))
+        users = (
+            User.objects.filter(
+                ~Exists(enrollments),
+                date_joined__date__lte=date_joined,
+                pk__gt=self.last_user_id,
+            )
+            .exclude(email='')
+            .order_by('pk')
+            .only('id', 'first_name', 'email')
+        )
 
-        for user in users:
-            # Формируем сообщение для каждого пользователя
-            message = f"""Здравствуйте, {user.first_name}!
+        self.sent = self.refused = 0
+        started = time.monotonic()
+        connection = get_connection()
+        connection.open()
+        try:
+            batch = []
+            for user in users.iterator(chunk_size=options['chunk_size']):
+                # Формируем сообщение для каждого пользователя
+                message = f"""Здравствуйте, {user.first_name}!
             Мы заметили, что вы пока не записались на наши курсы.
             Возможно, вам будет интересно узнать больше о том, что мы предлагаем.
             Не упустите возможность начать учиться прямо сейчас!
  """
+                batch.append(ReminderMessage(
+                    user.pk, subject, message, settings.DEFAULT_FROM_EMAIL, [user.email]
+                ))
+                if len(batch) >= options['batch_size']:
+                    connection = self.deliver(connection, batch, checkpoint)
+                    batch = []
+            if batch:
+                connection = self.deliver(connection, batch, checkpoint)
+        except Exception as exc:
+            raise CommandError(
+                f'Ошибка отправки после {self.sent} напоминаний '
+                f'(контрольная точка: пользователь {self.last_user_id}): {exc}'
+            ) from exc
+        finally:
+            connection.close()
 
-            # Добавляем письмо в список для массовой отправки
-            emails.append(
-                (
-                    subject,
-                    message,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [user.email],
-                )
-            )
+        # Рассылка завершена: следующий запуск начнется с начала
+        checkpoint.delete()
 
-        # Отправляем все собранные письма
-        send_mass_mail(emails)
-
-        # Выводим сообщение о количестве отправленных напоминаний
-        self.stdout.write(f'Отправлено {len(emails)} напоминаний')
+        # Выводим сообщение о количестве отправленных напоминаний и скорости отправки
+        elapsed = time.monotonic() - started
+        rate = self.sent / elapsed if elapsed else self.sent
+        self.stdout.write(
+            f'Отправлено {self.sent} напоминаний за {elapsed:.1f} с ({rate:.1f} писем/с), '
+            f'отклонено адресов: {self.refused}'
+        )
@@ -1,2 +1,22 @@
+from django.db import models
 
-# Create your models here.
+
+class ReminderCheckpoint(models.Model):
+    """
+    Контрольная точка рассылки напоминаний (команда enroll_reminder).
+
+    Хранится в базе данных, чтобы прерванная рассылка продолжилась
+    с последнего получателя, а не началась заново.
+
+    Атрибуты:
+        key (str): Ключ рассылки, включающий ее параметры.
+        last_user_id (int): Идентификатор последнего пользователя, получившего письмо.
+        updated (datetime): Время последнего обновления.
+    """
+
+    key = models.CharField(max_length=100, unique=True)
+    last_user_id = models.PositiveBigIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.key}: {self.last_user_id}'
@@ -1,2 +1,229 @@
+from io import StringIO
+from smtplib import SMTPRecipientsRefused
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse, reverse_lazy
+
+from courses.cache import get_enrolled_course_ids
+from courses.models import Content, Course, Module, Subject, Text
+from courses.tests import TEST_SETTINGS
+from students.models import ReminderCheckpoint
+
+
+class FlakyEmailBackend(EmailBackend):
+    """
+    Почтовый бэкенд, не доставляющий письма адресатам из `failing`.
+
+    Письма отправляются по одному, как в SMTP-бэкенде: письма до ошибки
+    доставлены. Адресаты из `failing_once` не получают письмо только с первой
+    попытки (ошибка соединения), адреса из `refused` отклоняются сервером.
+    """
+
+    failing = set()
+    failing_once = set()
+    refused = set()
+    calls = 0
+
+    def send_messages(self, messages):
+        FlakyEmailBackend.calls += 1
+        for message in messages:
+            recipient = message.to[0]
+            message.message()
+            if recipient in self.failing:
+                raise ConnectionError(recipient)
+            if recipient in self.failing_once:
+                self.failing_once.discard(recipient)
+                raise ConnectionError(recipient)
+            if recipient in self.refused:
+                raise SMTPRecipientsRefused({recipient: (550, b'No such user')})
+            super().send_messages([message])
+        return len(messages)
+
+
+@override_settings(EMAIL_BACKEND='students.tests.FlakyEmailBackend', **TEST_SETTINGS)
+class EnrollReminderTests(TestCase):
+    """
+    Рассылка напоминаний с контрольной точкой.
+    """
+
+    def setUp(self):
+        cache.clear()
+        FlakyEmailBackend.failing = set()
+        FlakyEmailBackend.failing_once = set()
+        FlakyEmailBackend.refused = set()
+        FlakyEmailBackend.calls = 0
+        self.users = [
+            User.objects.create_user(f'user{i}', email=f'user{i}@example.com')
+            for i in range(5)
+        ]
+
+    def recipients(self):
+        return [message.to[0] for message in mail.outbox]
+
+    def run_command(self, **options):
+        call_command('enroll_reminder', stdout=StringIO(), **options)
+
+    def test_sends_once_to_each_user(self):
+        self.run_command()
+        self.assertEqual(sorted(self.recipients()), sorted(u.email for u in self.users))
+        self.assertFalse(ReminderCheckpoint.objects.exists())
+
+    def test_transient_failure_retries_only_failed_message(self):
+        FlakyEmailBackend.failing_once = {'user2@example.com'}
+        self.run_command()
+        self.assertEqual(len(self.recipients()), 5)
+        self.assertEqual(len(set(self.recipients())), 5)
+
+    def test_resume_after_failure_without_duplicates(self):
+        FlakyEmailBackend.failing = {'user3@example.com'}
+        with self.assertRaises(CommandError):
+            self.run_command()
+        self.assertEqual(self.recipients(), [f'user{i}@example.com' for i in range(3)])
+        checkpoint = ReminderCheckpoint.objects.get()
+        self.assertEqual(checkpoint.last_user_id, self.users[2].pk)
+
+        FlakyEmailBackend.failing = set()
+        self.run_command()
+        self.assertEqual(sorted(self.recipients()), sorted(u.email for u in self.users))
+
+    def test_checkpoint_is_per_parameters(self):
+        FlakyEmailBackend.failing = {'user1@example.com'}
+        with self.assertRaises(CommandError):
+            self.run_command(days=0)
+        FlakyEmailBackend.failing = set()
+        mail.outbox = []
+        # Рассылка с другими параметрами не продолжает чужую контрольную точку
+        self.run_command(days=-1)
+        self.assertEqual(len(self.recipients()), 5)
+        self.assertTrue(ReminderCheckpoint.objects.filter(key='enroll_reminder:days=0').exists())
+
+    def test_refused_recipient_is_skipped(self):
+        FlakyEmailBackend.refused = {'user1@example.com', 'user3@example.com'}
+        with self.assertLogs('students.management.commands.enroll_reminder', 'WARNING') as logs:
+            self.run_command(batch_size=2)
+        self.assertEqual(
+            self.recipients(), [f'user{i}@example.com' for i in (0, 2, 4)]
+        )
+        self.assertEqual(len(logs.records), 2)
+        self.assertFalse(ReminderCheckpoint.objects.exists())
+
+    def test_messages_sent_in_batches(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.run_command(batch_size=2)
+        self.assertEqual(FlakyEmailBackend.calls, 3)
+        self.assertEqual(len(self.recipients()), 5)
+        # Контрольная точка сохраняется один раз на пакет
+        updates = [
+            q for q in queries
+            if q['sql'].startswith('UPDATE "students_remindercheckpoint"')
+        ]
+        self.assertEqual(len(updates), 3)
+
+
+class StudentTestCase(TestCase):
+    """
+    Общие данные тестов страниц студента: преподаватель, студент и курс.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('owner')
+        self.student = User.objects.create_user('student')
+        self.subject = Subject.objects.create(title='Programming', slug='programming')
+        self.course = self.create_course('python')
+        self.client.force_login(self.student)
+
+    def create_course(self, slug, modules=0, contents=0):
+        course = Course.objects.create(
+            owner=self.owner, subject=self.subject, title=slug.title(), slug=slug,
+        )
+        course.students.add(self.student)
+        for i in range(modules):
+            module = Module.objects.create(course=course, title=f'Module {i}', description='')
+            for j in range(contents):
+                text = Text.objects.create(owner=self.owner, title='Text', content=f'text {i}.{j}')
+                Content.objects.create(module=module, item=text)
+        return course
+
+
+@override_settings(**TEST_SETTINGS)
+class StudentCoursePageTests(StudentTestCase):
+    """
+    Страница курса студента: количество запросов не зависит от размера курса.
+    """
+
+    def get(self, course, module=None):
+        if module is None:
+            return self.client.get(reverse('student_course_detail', args=[course.pk]))
+        return self.client.get(
+            reverse('student_course_detail_module', args=[course.pk, module.pk])
+        )
+
+    def test_detail_query_count(self):
+        small = self.create_course('small', modules=2, contents=1)
+        large = self.create_course('large', modules=5, contents=4)
+        get_enrolled_course_ids(self.student.pk)  # Множество курсов студента уже в кэше
+        for course in (small, large):
+            module = course.modules.last()
+            # Сессия, пользователь, курс, модули, содержимое модуля и тексты
+            with self.assertNumQueries(6):
+                response = self.get(course)
+            self.assertContains(response, 'text 0.0')
+            # Содержимое другого модуля; список модулей уже в кэше
+            with self.assertNumQueries(5):
+                response = self.get(course, module)
+            self.assertContains(response, f'text {course.modules.count() - 1}.0')
+            # Теплый кэш: сессия, пользователь и курс
+            with self.assertNumQueries(3):
+                self.get(course, module)
+
+    def test_detail_edge_cases(self):
+        # Курс без модулей отображается без содержимого
+        self.assertContains(self.get(self.course), 'No modules yet.')
+        other = self.create_course('other', modules=1)
+        response = self.get(self.course, other.modules.get())
+        self.assertEqual(response.status_code, 404)
+        # Курс, на который студент не записан
+        self.course.students.remove(self.student)
+        self.assertEqual(self.get(self.course).status_code, 404)
+
+
+@override_settings(**TEST_SETTINGS)
+class StudentCourseListTests(StudentTestCase):
+    """
+    Список курсов студента из кэша пользователя.
+    """
+
+    url = reverse_lazy('student_course_list')
+
+    def test_list_query_count(self):
+        for i in range(3):
+            self.create_course(f'course-{i}', modules=i)
+        # Сессия, пользователь, множество курсов студента и строки курсов
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Programming. 2 modules.')
+        # Теплый кэш: только сессия и пользователь при любом числе курсов
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+
+    def test_list_follows_changes(self):
+        self.client.get(self.url)
+        other = User.objects.create_user('other')
+        # Запись другого студента не сбрасывает чужой список
+        self.course.students.add(other)
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Module.objects.create(course=self.course, title='Intro', description='')
+        self.assertContains(self.client.get(self.url), 'Programming. 1 modules.')
+        self.course.students.remove(self.student)
+        self.assertContains(self.client.get(self.url), 'You are not enrolled')
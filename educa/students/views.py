@@ -1,7 +1,19 @@
-from courses.models import Course
+from courses.cache import (
+    get_course_modules,
+    get_enrolled_course_ids,
+    get_module_version,
+    get_student_courses,
+    module_contents_key,
+)
+from courses.fragments import preload_fragments
+from courses.models import Content, Course
+from django.conf import settings
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.cache import cache
+from django.http import Http404
+from django.template.loader import render_to_string
 from django.urls import reverse_lazy
 from django.views.generic.detail import DetailView
 from django.views.generic.edit import CreateView, FormView
@@ -84,12 +96,13 @@ class StudentCourseListView(LoginRequiredMixin, ListView):
 
     def get_queryset(self):
         """
-        Метод возвращает queryset курсов, на которые записан текущий пользователь.
+        Метод возвращает курсы, на которые записан текущий пользователь.
 
-        :return: QuerySet с курсами, на которые записан текущий пользователь.
+        Краткие сведения о курсах берутся из кэша пользователя одним обращением.
+
+        :return: Список словарей с данными курсов текущего пользователя.
         """
-        qs = super().get_queryset()
-        return qs.filter(students__in=[self.request.user])
+        return get_student_courses(self.request.user.id)
 
 
 class StudentCourseDetailView(LoginRequiredMixin, DetailView):
@@ -106,10 +119,37 @@ class StudentCourseDetailView(LoginRequiredMixin, DetailView):
         """
         Метод возвращает queryset курсов, на которые записан текущий пользователь.
 
+        Множество курсов пользователя берется из кэша, без соединения с таблицей студентов.
+
         :return: QuerySet с курсами, на которые записан текущий пользователь.
         """
         qs = super().get_queryset()
-        return qs.filter(students__in=[self.request.user])
+        return qs.filter(id__in=get_enrolled_course_ids(self.request.user.id))
+
+    def get_module_contents(self, module):
+        """
+        Возвращает отрендеренное содержимое модуля.
+
+        HTML кэшируется по идентификатору модуля и версии его содержимого,
+        которая увеличивается при создании, изменении, перестановке и удалении
+        содержимого и его элементов. При попадании в кэш содержимое модуля
+        не загружается из базы данных.
+
+        :param module: Словарь модуля из боковой панели (id, order, title).
+        :return: HTML содержимого модуля.
+        """
+        key = module_contents_key(module['id'], get_module_version(module['id']))
+        html = cache.get(key)
+        if html is None:
+            # Содержимое модуля загружается вместе с элементами (по запросу на тип)
+            contents = list(Content.objects.filter(module_id=module['id']).with_items())
+            # Загрузка отрендеренных элементов модуля одним обращением к кэшу
+            preload_fragments(content.item for content in contents)
+            html = render_to_string(
+                'students/course/module_contents.html', {'contents': contents}
+            )
+            cache.set(key, html, settings.MODULE_CONTENTS_CACHE_TIMEOUT)
+        return html
 
     def get_context_data(self, **kwargs):
         """
@@ -117,19 +157,32 @@ class StudentCourseDetailView(LoginRequiredMixin, DetailView):
 
         Если в URL указан параметр `module_id`, добавляет текущий модуль в контекст.
         В противном случае, добавляет первый модуль курса в контекст.
+        Список модулей для боковой панели и содержимое текущего модуля
+        берутся из кэша.
 
         :param kwargs: Дополнительные параметры контекста.
         :return: Обновленный словарь контекста.
         """
         context = super().get_context_data(**kwargs)
-        # Получаем объект курса
-        course = self.get_object()
+        # Курс уже получен в get(), повторный запрос не нужен
+        course = self.object
+        # Модули курса для боковой панели (из кэша по версии содержимого)
+        modules = get_course_modules(course.id)
+        context['modules'] = modules
         if 'module_id' in self.kwargs:
             # Получаем текущий модуль
-            context['module'] = course.modules.get(
-                id=self.kwargs['module_id']
+            module = next(
+                (m for m in modules if m['id'] == self.kwargs['module_id']), None
             )
-        else:
+            if module is None:
+                raise Http404('Module not found')
+        elif modules:
             # Получаем первый модуль
-            context['module'] = course.modules.all()[0]
+            module = modules[0]
+        else:
+            # В курсе пока нет модулей
+            context['module'] = None
+            return context
+        context['module'] = module
+        context['module_contents'] = self.get_module_contents(module)
         return context